@@ -0,0 +1,165 @@
+"""
+Benchmarks for the overhead of viashpy itself. They use a stand-in for viash and
+synthetic configs and archives, so neither a JVM nor docker is required.
+
+Run them with 'tox -e benchmarks' or 'pytest tests/benchmarks'. Use '--bench-json'
+to store the results and '--bench-baseline' to compare them against earlier results.
+"""
+
+from pathlib import Path
+import json
+import platform
+import statistics
+import stat
+import sys
+import time
+import pytest
+
+FAKE_VIASH = """\
+#!{python}
+import sys
+
+args = sys.argv[1:]
+if args == ["--version"]:
+    print("viash 0.9.0 (c) 2024 Data Intuitive")
+elif args[0] == "run":
+    print("viash run ran with " + " ".join(args[args.index("--") + 1 :]))
+"""
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("viashpy benchmarks")
+    group.addoption(
+        "--bench-json",
+        metavar="PATH",
+        default=None,
+        help="Write the results of the benchmarks to PATH as json.",
+    )
+    group.addoption(
+        "--bench-baseline",
+        metavar="PATH",
+        default=None,
+        help="Compare the results against the results in PATH (as written by "
+        "--bench-json) and fail when a benchmark became slower.",
+    )
+    group.addoption(
+        "--bench-max-regression",
+        type=float,
+        default=0.25,
+        help="Allowed increase of the median time of a benchmark compared to the "
+        "baseline, as a fraction (default: 0.25).",
+    )
+
+
+def summarize(times):
+    quartiles = statistics.quantiles(times, n=4) if len(times) > 1 else times * 3
+    return {
+        "rounds": len(times),
+        "median": statistics.median(times),
+        "iqr": quartiles[2] - quartiles[0],
+        "min": min(times),
+        "max": max(times),
+    }
+
+
+class BenchmarkSession:
+    def __init__(self, config):
+        self.config = config
+        self.results = {}
+        self.regressions_found = []
+
+    def add(self, name, times, extra_info):
+        self.results[name] = {**summarize(times), "extra_info": extra_info}
+
+    def regressions(self, baseline):
+        max_regression = self.config.getoption("bench_max_regression")
+        for name, result in sorted(self.results.items()):
+            baseline_result = baseline.get("benchmarks", {}).get(name)
+            if baseline_result is None:
+                continue
+            allowed = baseline_result["median"] * (1 + max_regression)
+            if result["median"] > allowed:
+                yield name, baseline_result["median"], result["median"]
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if not self.results:
+            return
+        terminalreporter.section("viashpy benchmarks")
+        for name, result in sorted(self.results.items()):
+            terminalreporter.write_line(
+                f"{name}: median {result['median'] * 1000:.3f} ms, "
+                f"IQR {result['iqr'] * 1000:.3f} ms ({result['rounds']} rounds)"
+            )
+        for name, baseline_median, median in self.regressions_found:
+            terminalreporter.write_line(
+                f"REGRESSION {name}: median {median * 1000:.3f} ms, "
+                f"baseline {baseline_median * 1000:.3f} ms",
+                red=True,
+            )
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_sessionfinish(self, session):
+        json_file = self.config.getoption("bench_json")
+        if json_file:
+            Path(json_file).write_text(
+                json.dumps(
+                    {
+                        "machine": {
+                            "python": platform.python_version(),
+                            "platform": platform.platform(),
+                            "processor": platform.processor(),
+                        },
+                        "benchmarks": self.results,
+                    },
+                    indent=2,
+                )
+            )
+        baseline_file = self.config.getoption("bench_baseline")
+        if baseline_file:
+            baseline = json.loads(Path(baseline_file).read_text())
+            self.regressions_found = list(self.regressions(baseline))
+            if self.regressions_found and session.exitstatus == 0:
+                session.exitstatus = 1
+
+
+def pytest_configure(config):
+    config.pluginmanager.register(BenchmarkSession(config), "viashpy-benchmarks")
+
+
+@pytest.fixture(autouse=True)
+def isolated_viashpy_cache(tmp_path_factory, monkeypatch):
+    monkeypatch.setenv("VIASHPY_CACHE_DIR", str(tmp_path_factory.mktemp("cache")))
+
+
+@pytest.fixture
+def bench(request):
+    """
+    Returns a function that calls 'function' 'rounds' times (after 'warmup' calls)
+    and records the time of each call. When 'setup' is provided, it is called
+    before each call (and not timed); its result is passed to 'function'.
+    'extra_info' is stored with the results. Returns the result of the last call.
+    """
+    session = request.config.pluginmanager.get_plugin("viashpy-benchmarks")
+
+    def run(function, *, rounds=20, warmup=1, setup=None, extra_info=None):
+        result = None
+        times = []
+        for round_number in range(warmup + rounds):
+            args = (setup(),) if setup is not None else ()
+            start = time.perf_counter()
+            result = function(*args)
+            elapsed = time.perf_counter() - start
+            if round_number >= warmup:
+                times.append(elapsed)
+        session.add(request.node.name, times, extra_info or {})
+        return result
+
+    return run
+
+
+@pytest.fixture(scope="session")
+def fake_viash(tmp_path_factory):
+    viash = tmp_path_factory.mktemp("fake_viash") / "viash"
+    viash.write_text(FAKE_VIASH.format(python=sys.executable))
+    viash.chmod(viash.stat().st_mode | stat.S_IEXEC)
+    return viash
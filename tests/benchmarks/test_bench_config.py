@@ -0,0 +1,87 @@
+from viashpy.config import read_viash_config, read_viash_config_cached
+from viashpy.index import ConfigIndex
+from itertools import count
+import yaml
+import pytest
+
+
+def large_config(name, number_of_arguments, parsed=False):
+    """
+    A config with many arguments. Parsed configs (as written by 'viash build')
+    also contain information about the build.
+    """
+    config = {
+        "name": name,
+        "namespace": "benchmarks",
+        "description": "A large config. " * 100,
+        "argument_groups": [
+            {
+                "name": f"Group {group}",
+                "arguments": [
+                    {
+                        "name": f"--argument_{group}_{argument}",
+                        "type": "file",
+                        "description": "An argument. " * 10,
+                        "example": [f"file_{argument}.txt"],
+                        "required": False,
+                    }
+                    for argument in range(number_of_arguments // 10)
+                ],
+            }
+            for group in range(10)
+        ],
+        "resources": [{"type": "python_script", "path": "script.py"}],
+        "engines": [{"type": "docker", "image": "python:3.12"}],
+    }
+    if parsed:
+        config["build_info"] = {"config": f"/src/{name}/config.vsh.yaml"}
+        config["info"] = {"config": f"/src/{name}/config.vsh.yaml"}
+    return config
+
+
+@pytest.fixture
+def large_config_file(tmp_path):
+    config_file = tmp_path / "config.vsh.yaml"
+    config_file.write_text(yaml.safe_dump(large_config("foo", 2000, parsed=True)))
+    return config_file
+
+
+def test_read_viash_config_large(bench, large_config_file):
+    config = bench(
+        lambda: read_viash_config(large_config_file),
+        extra_info={"size_bytes": large_config_file.stat().st_size},
+    )
+    assert config["name"] == "foo"
+
+
+def test_read_viash_config_cached_large(bench, large_config_file):
+    config = bench(lambda: read_viash_config_cached(large_config_file), rounds=1000)
+    assert config["name"] == "foo"
+
+
+@pytest.fixture
+def source_tree(tmp_path):
+    for i in range(50):
+        component_dir = tmp_path / "src" / f"component_{i}"
+        component_dir.mkdir(parents=True)
+        (component_dir / "config.vsh.yaml").write_text(
+            yaml.safe_dump(large_config(f"component_{i}", 200))
+        )
+    return tmp_path / "src"
+
+
+def test_config_index_build(bench, source_tree, tmp_path):
+    sidecars = (tmp_path / f"index_{i}.json" for i in count())
+    index = bench(
+        lambda sidecar: ConfigIndex.build(source_tree, sidecar=sidecar),
+        setup=lambda: next(sidecars),
+        rounds=5,
+        extra_info={"components": 50},
+    )
+    assert len(index) == 50
+
+
+def test_config_index_reuse(bench, source_tree, tmp_path):
+    sidecar = tmp_path / "index.json"
+    index = bench(lambda: ConfigIndex.build(source_tree, sidecar=sidecar))
+    assert len(index) == 50
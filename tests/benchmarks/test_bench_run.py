@@ -0,0 +1,65 @@
+import pytest
+from viashpy import _run
+from viashpy._run import viash_run
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    config_file = tmp_path / "config.vsh.yaml"
+    config_file.write_text("name: foo\nengines:\n  - type: native\n")
+    return config_file
+
+
+def test_fixture_chain(bench, pytester, fake_viash):
+    """
+    Collect and run tests that only request the fixtures that 'run_component'
+    depends on, to measure the overhead of the fixture chain per test.
+    """
+    number_of_tests = 100
+    config_file = pytester.makefile(".vsh.yaml", config="name: foo\n")
+    pytester.makepyfile(f"""
+        import pytest
+
+        meta = {{
+            "config": "{config_file}",
+            "executable": "foo",
+            "cpus": 2,
+            "memory_gb": 4,
+            "memory_mb": 4096,
+        }}
+
+        @pytest.mark.parametrize("test", range({number_of_tests}))
+        def test_fixtures(test, cpus, memory_bytes, viash_source_config_path, meta_config):
+            assert memory_bytes == "4294967296B"
+        """)
+
+    def run_session():
+        result = pytester.inline_run("-q", "-p", "no:cacheprovider")
+        assert result.ret == 0
+
+    bench(run_session, rounds=5, extra_info={"tests_per_round": number_of_tests})
+
+
+def test_viash_run_command_assembly(bench, monkeypatch, fake_viash, config_file):
+    monkeypatch.setattr(_run, "_run_command", lambda command, **kwargs: command)
+    command = bench(
+        lambda: viash_run(
+            config_file,
+            ["--input", "foo.txt", "--output", "bar.txt"],
+            cpus=2,
+            memory="4GB",
+            engine="native",
+            viash_location=fake_viash,
+        ),
+        rounds=1000,
+    )
+    assert command[-4:] == ["--input", "foo.txt", "--output", "bar.txt"]
+
+
+def test_viash_run_fake_viash(bench, fake_viash, config_file):
+    output = bench(
+        lambda: viash_run(
+            config_file, ["bar"], engine="native", viash_location=fake_viash
+        )
+    )
+    assert output == b"viash run ran with bar\n"
@@ -0,0 +1,68 @@
+from viashpy.utils import extract_tar, pack_tar
+from itertools import count
+import os
+import shutil
+import pytest
+
+SMALL_FILES = 500
+SMALL_FILE_SIZE = 16 * 1024
+LARGE_FILES = 4
+LARGE_FILE_SIZE = 8 * 1024 * 1024
+
+
+@pytest.fixture(scope="module")
+def source_dir(tmp_path_factory):
+    """
+    Many small files and a few large ones, with compressible contents.
+    """
+    source = tmp_path_factory.mktemp("source") / "data"
+    (source / "small").mkdir(parents=True)
+    block = os.urandom(1024)
+    for i in range(SMALL_FILES):
+        (source / "small" / f"{i}.txt").write_bytes(block * (SMALL_FILE_SIZE // 1024))
+    for i in range(LARGE_FILES):
+        (source / f"large_{i}.bin").write_bytes(block * (LARGE_FILE_SIZE // 1024))
+    return source
+
+
+@pytest.fixture(scope="module")
+def archives(source_dir, tmp_path_factory):
+    archive_dir = tmp_path_factory.mktemp("archives")
+    return {
+        suffix: pack_tar(source_dir, archive_dir / f"data{suffix}")
+        for suffix in (".tar", ".tar.gz")
+    }
+
+
+TOTAL_SIZE = SMALL_FILES * SMALL_FILE_SIZE + LARGE_FILES * LARGE_FILE_SIZE
+
+
+@pytest.mark.parametrize("stream", [False, True], ids=["default", "stream"])
+@pytest.mark.parametrize("suffix", [".tar", ".tar.gz"])
+def test_extract_tar(bench, archives, tmp_path, suffix, stream):
+    output_dirs = (tmp_path / str(i) for i in count())
+
+    def new_output_dir():
+        output_dir = next(output_dirs)
+        output_dir.mkdir()
+        return output_dir
+
+    result = bench(
+        lambda output_dir: extract_tar(archives[suffix], output_dir, stream=stream),
+        setup=new_output_dir,
+        rounds=5,
+        extra_info={"uncompressed_bytes": TOTAL_SIZE},
+    )
+    assert len(list((result / "small").iterdir())) == SMALL_FILES
+    shutil.rmtree(tmp_path)
+
+
+@pytest.mark.parametrize("suffix", [".tar", ".tar.gz"])
+def test_pack_tar(bench, source_dir, tmp_path, suffix):
+    destinations = (tmp_path / f"{i}{suffix}" for i in count())
+    bench(
+        lambda destination: pack_tar(source_dir, destination),
+        setup=lambda: next(destinations),
+        rounds=5,
+        extra_info={"uncompressed_bytes": TOTAL_SIZE},
+    )
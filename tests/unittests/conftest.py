@@ -3,9 +3,20 @@ import ast
 from textwrap import dedent
 from pathlib import Path
 import tarfile
+import json
+import os
+import stat
+import sys
 from itertools import islice
 
 
+@pytest.fixture(autouse=True)
+def isolated_viashpy_cache(tmp_path_factory, monkeypatch):
+    cache_dir = tmp_path_factory.mktemp("viashpy_cache")
+    monkeypatch.setenv("VIASHPY_CACHE_DIR", str(cache_dir))
+    return cache_dir
+
+
 @pytest.fixture
 def makepyfile_and_add_meta(pytester, write_config):
 
@@ -172,3 +183,116 @@ def tarfile_mixed_contents(tmp_path, compression_extension):
             arcname=folder_to_add.relative_to(tmp_path),
         )
     return tar_path
+
+
+FAKE_VIASH = """\
+#!{python}
+# A stand-in for viash that records how it was called.
+import json
+import os
+import sys
+from pathlib import Path
+
+args = sys.argv[1:]
+with open({calls_file!r}, "a") as open_calls_file:
+    open_calls_file.write(json.dumps(args) + "\\n")
+if args == ["--version"]:
+    print("viash 0.9.0 (c) 2024 Data Intuitive")
+elif args[0] == "build":
+    import yaml
+
+    config = yaml.safe_load(Path(args[1]).read_text())
+    output_dir = Path(args[args.index("-o") + 1])
+    output_dir.mkdir(parents=True, exist_ok=True)
+    executable = output_dir / config["name"]
+    executable.write_text('#!/bin/sh\\necho "built component ran with $@"\\n')
+    executable.chmod(0o755)
+elif args[0] == "run":
+    print("viash run ran with " + " ".join(args[args.index("--") + 1 :]))
+"""
+
+
+@pytest.fixture
+def fake_viash_cli(tmp_path_factory):
+    """
+    Path to an executable that mimics viash. The arguments of each call
+    are available through the 'calls' attribute of the returned object.
+    """
+    directory = tmp_path_factory.mktemp("fake_viash")
+    calls_file = directory / "calls.jsonl"
+    viash = directory / "viash"
+    viash.write_text(
+        FAKE_VIASH.format(python=sys.executable, calls_file=str(calls_file))
+    )
+    viash.chmod(viash.stat().st_mode | stat.S_IEXEC)
+
+    class FakeViash:
+        location = viash
+
+        @staticmethod
+        def calls():
+            if not calls_file.exists():
+                return []
+            return [json.loads(line) for line in calls_file.read_text().splitlines()]
+
+    return FakeViash
+
+
+FAKE_DOCKER = """\
+#!{python}
+# A stand-in for docker that records how it was called. Commands
+# passed to 'docker exec' are run on the host.
+import json
+import os
+import subprocess
+import sys
+
+args = sys.argv[1:]
+with open({calls_file!r}, "a") as open_calls_file:
+    open_calls_file.write(json.dumps(args) + "\\n")
+if args[0] == "run":
+    print("fake_container_id")
+elif args[0] == "exec":
+    env, cwd, index = dict(os.environ), None, 1
+    while args[index].startswith("--"):
+        if args[index] == "--workdir":
+            cwd = args[index + 1]
+        elif args[index] == "--env":
+            key, value = args[index + 1].split("=", 1)
+            env[key] = value
+        index += 2
+    sys.exit(subprocess.run(args[index + 1 :], cwd=cwd, env=env).returncode)
+elif args[:2] == ["image", "inspect"]:
+    print("sha256:fake_image_id")
+elif args[0] == "ps":
+    print("fake_container_id")
+elif args[0] == "stats":
+    print("150.00%\t512MiB / 2GiB")
+"""
+
+
+@pytest.fixture
+def fake_docker_cli(tmp_path_factory, monkeypatch):
+    """
+    Put an executable that mimics docker on the PATH. The arguments of each call
+    are available through the 'calls' attribute of the returned object.
+    """
+    directory = tmp_path_factory.mktemp("fake_docker")
+    calls_file = directory / "calls.jsonl"
+    docker = directory / "docker"
+    docker.write_text(
+        FAKE_DOCKER.format(python=sys.executable, calls_file=str(calls_file))
+    )
+    docker.chmod(docker.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{directory}:{os.environ['PATH']}")
+
+    class FakeDocker:
+        location = docker
+
+        @staticmethod
+        def calls():
+            if not calls_file.exists():
+                return []
+            return [json.loads(line) for line in calls_file.read_text().splitlines()]
+
+    return FakeDocker
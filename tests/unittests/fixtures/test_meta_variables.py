@@ -137,3 +137,126 @@ def test_viash_source_config(pytester, dummy_config, makepyfile_and_add_meta):
         ]
     )
     assert result.ret == 0
+
+
+def test_module_scoped_meta_fixtures(pytester, dummy_config, makepyfile_and_add_meta):
+    makepyfile_and_add_meta(
+        """
+        import pytest
+        from pathlib import Path
+
+        resolved = []
+
+        @pytest.mark.parametrize("test", range(3))
+        def test_module_fixtures(
+            test,
+            module_meta,
+            module_cpus,
+            module_memory_bytes,
+            module_meta_config_path,
+            module_meta_config,
+            module_viash_source_config_path,
+            module_viash_source_config,
+            memory_bytes,
+        ):
+            assert module_meta is meta
+            assert module_cpus == 2
+            assert module_memory_bytes == memory_bytes == "1048576B"
+            assert module_meta_config_path == Path(meta["config"])
+            assert module_viash_source_config_path == module_meta_config_path
+            assert module_viash_source_config["functionality"]["name"] == "foo"
+            resolved.append(module_meta_config)
+            assert all(config is resolved[0] for config in resolved)
+        """,
+        dummy_config,
+        "foo",
+        cpu=2,
+        memory_mb=1,
+        memory_kb=1024,
+    )
+    result = pytester.runpytest("-v")
+    result.assert_outcomes(passed=3)
+
+
+def test_module_scoped_memory_bytes_warns_once(
+    pytester, dummy_config, makepyfile_and_add_meta
+):
+    makepyfile_and_add_meta(
+        """
+        import pytest
+
+        @pytest.mark.parametrize("test", range(3))
+        def test_module_memory_bytes(test, module_memory_bytes):
+            assert module_memory_bytes == "1024B"
+        """,
+        dummy_config,
+        "foo",
+        memory_mb=1,
+        memory_kb=1,
+    )
+    result = pytester.runpytest("-v")
+    result.assert_outcomes(passed=3, warnings=1)
+
+
+def test_module_scoped_meta_ignores_function_overrides(
+    pytester, dummy_config, makepyfile_and_add_meta
+):
+    makepyfile_and_add_meta(
+        """
+        import pytest
+
+        @pytest.fixture
+        def memory_bytes():
+            return "1B"
+
+        def test_overridden(memory_bytes, module_memory_bytes, cpus, module_cpus):
+            assert memory_bytes == "1B"
+            assert module_memory_bytes == "2048B"
+            assert cpus == module_cpus == 4
+        """,
+        dummy_config,
+        "foo",
+        cpu=4,
+        memory_kb=2,
+    )
+    result = pytester.runpytest("-v")
+    result.assert_outcomes(passed=1)
+
+
+def test_meta_resolver_shares_equal_meta(pytester):
+    pytester.makeconftest("""
+        import pytest
+
+        @pytest.fixture(scope="session")
+        def resolved():
+            return []
+        """)
+    for name in ("test_first", "test_second"):
+        pytester.makepyfile(**{name: """
+            meta = {"cpus": 3}
+
+            def test_resolved(request, resolved, module_resolved_meta, module_cpus):
+                resolved.append(module_resolved_meta)
+                assert module_cpus == 3
+                assert module_resolved_meta.test_module is request.module
+                assert all(other._values is resolved[0]._values for other in resolved)
+            """})
+    result = pytester.runpytest("-v")
+    result.assert_outcomes(passed=2)
+
+
+def test_meta_resolver_shared_meta_reports_own_module(pytester):
+    for name in ("test_first", "test_second"):
+        pytester.makepyfile(**{name: f"""
+            import pytest
+
+            meta = {{"cpus": 3}}
+
+            def test_missing_config(module_resolved_meta):
+                with pytest.raises(KeyError, match="{name}") as excinfo:
+                    module_resolved_meta.meta_config_path
+                other = "test_second" if "{name}" == "test_first" else "test_first"
+                assert other not in str(excinfo.value)
+            """})
+    result = pytester.runpytest("-v")
+    result.assert_outcomes(passed=2)
@@ -1,5 +1,9 @@
+import json
+import os
 import stat
+import sys
 import pytest
+import time
 
 
 def test_run_component_fixture(pytester, makepyfile_and_add_meta, dummy_config):
@@ -599,3 +603,722 @@ def test_run_component_fails_capturing(
     # Check if stack traces are hidden
     result.stdout.no_fnmatch_line("*def wrapper*")
     result.stdout.no_fnmatch_line("*def run_component*")
+
+
+def test_run_component_builds_docker_image_once(
+    pytester, makepyfile_and_add_meta, dummy_config
+):
+    makepyfile_and_add_meta(
+        """
+        import pytest
+
+        @pytest.fixture(scope="module")
+        def mocked_check_output(module_mocker):
+            module_mocker.patch('viashpy._run._get_viash_version', return_value=(0, 9, 0))
+            return module_mocker.patch('viashpy._run.check_output', return_value=b"Some dummy output")
+
+        @pytest.mark.parametrize("run", range(3))
+        def test_loading_run_component(mocked_check_output, run_component, run):
+            run_component(["bar"])
+
+        def test_only_one_build(mocked_check_output):
+            calls = [call.args[0] for call in mocked_check_output.call_args_list]
+            build_calls = [call for call in calls if call[-2:] == ["---setup", "cachedbuild"]]
+            assert len(build_calls) == 1
+            assert len(calls) == 4
+        """,
+        dummy_config,
+        "foo",
+    )
+    result = pytester.runpytest("-v")
+    result.assert_outcomes(passed=4)
+
+
+def test_run_component_stream_and_tee(
+    pytester, makepyfile_and_add_meta, dummy_config_with_info
+):
+    executable = pytester.makefile(
+        "",
+        foo="#!/bin/sh\npython -c 'for i in range(100): print(i)'",
+    )
+    executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+
+    makepyfile_and_add_meta(
+        """
+        from pathlib import Path
+
+        def test_stream(mocker, run_component):
+            mocker.patch('viashpy.testing.Path.is_file', return_value=True)
+            lines = list(run_component(["bar"], stream=True))
+            assert lines == [f"{i}\\n".encode() for i in range(100)]
+
+        def test_tee(mocker, run_component, tmp_path):
+            mocker.patch('viashpy.testing.Path.is_file', return_value=True)
+            output = run_component(["bar"], tee=tmp_path / "log.txt", max_output_bytes=3)
+            assert output == b"99\\n"
+            assert len((tmp_path / "log.txt").read_text().splitlines()) == 100
+        """,
+        dummy_config_with_info,
+        executable,
+    )
+    result = pytester.runpytest("-v")
+    result.assert_outcomes(passed=2)
+
+
+def test_run_component_stream_fails_logging(
+    pytester, makepyfile_and_add_meta, dummy_config_with_info
+):
+    executable = pytester.makefile(
+        "",
+        foo="#!/bin/sh\npython -c 'import sys; raise RuntimeError(\"This script should fail\")'",
+    )
+    executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+
+    makepyfile_and_add_meta(
+        """
+        def test_loading_run_component(mocker, run_component, tmp_path):
+            mocker.patch('viashpy.testing.Path.is_file', return_value=True)
+            for line in run_component(["bar"], stream=True, tee=tmp_path / "log.txt"):
+                pass
+        """,
+        dummy_config_with_info,
+        executable,
+    )
+    result = pytester.runpytest()
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(
+        [
+            "*Full component output was written to *log.txt, last part was:*",
+            "*This script should fail*",
+        ]
+    )
+
+
+def test_run_component_run_async(
+    pytester, makepyfile_and_add_meta, dummy_config_with_info
+):
+    executable = pytester.makefile(
+        "",
+        foo='#!/bin/sh\necho "$@"',
+    )
+    executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+
+    makepyfile_and_add_meta(
+        """
+        import asyncio
+
+        def test_run_async(mocker, run_component):
+            mocker.patch('viashpy.testing.Path.is_file', return_value=True)
+
+            async def run_all():
+                return await asyncio.gather(
+                    *(run_component.run_async([str(i)]) for i in range(10))
+                )
+
+            outputs = asyncio.run(run_all())
+            assert outputs == [f"{i}\\n".encode() for i in range(10)]
+        """,
+        dummy_config_with_info,
+        executable,
+    )
+    result = pytester.runpytest("-v")
+    result.assert_outcomes(passed=1)
+
+
+def test_run_component_run_async_more_runs_than_threads(pytester, fake_viash_cli):
+    # Waiting for resources must not occupy the threads of the default executor,
+    # which the runs that hold a reservation need to finish.
+    config = pytester.makefile(".vsh.yaml", config="name: foo\n")
+    pytester.makepyfile(f"""
+        import asyncio
+        import os
+        import pytest
+
+        meta = {{"config": "{config}", "executable": "foo"}}
+
+        @pytest.fixture
+        def viash_executable():
+            return "{fake_viash_cli.location}"
+
+        def test_run_async(run_component):
+            number_of_runs = min(32, (os.cpu_count() or 1) + 4) + 8
+
+            async def run_all():
+                return await asyncio.gather(
+                    *(
+                        run_component.run_async([str(i)], engine="native")
+                        for i in range(number_of_runs)
+                    )
+                )
+
+            outputs = asyncio.run(run_all())
+            assert outputs == [
+                f"viash run ran with {{i}}\\n".encode() for i in range(number_of_runs)
+            ]
+        """)
+    result = pytester.runpytest_subprocess("--viash-host-cpus=1", timeout=120)
+    result.assert_outcomes(passed=1)
+
+
+def test_run_component_map(pytester, makepyfile_and_add_meta, dummy_config_with_info):
+    executable = pytester.makefile(
+        "",
+        foo='#!/bin/sh\nif [ "$1" = fail ]; then echo "failed $2"; exit 1; fi\necho "$1"',
+    )
+    executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+
+    makepyfile_and_add_meta(
+        """
+        import subprocess
+        import pytest
+
+        def test_map(mocker, run_component):
+            mocker.patch('viashpy.testing.Path.is_file', return_value=True)
+            outputs = run_component.map([[str(i)] for i in range(10)], max_workers=4)
+            assert outputs == [f"{i}\\n".encode() for i in range(10)]
+
+        def test_map_errors(mocker, run_component):
+            mocker.patch('viashpy.testing.Path.is_file', return_value=True)
+            outputs = run_component.map(
+                [["0"], ["fail", "1"], ["2"]], return_exceptions=True
+            )
+            assert outputs[0] == b"0\\n"
+            assert isinstance(outputs[1], subprocess.CalledProcessError)
+            assert outputs[1].stdout == b"failed 1\\n"
+            assert outputs[2] == b"2\\n"
+        """,
+        dummy_config_with_info,
+        executable,
+        cpu=2,
+        memory_gb=1,
+    )
+    result = pytester.runpytest("-v")
+    result.assert_outcomes(passed=2)
+
+
+@pytest.mark.parametrize("use_ini", [True, False])
+def test_run_component_reserves_resources(
+    pytester, makepyfile_and_add_meta, dummy_config_with_info, use_ini
+):
+    executable = pytester.makefile("", foo="#!/bin/sh\necho first\necho second")
+    executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+
+    makepyfile_and_add_meta(
+        """
+        def test_reserve(mocker, run_component, viash_resource_pool):
+            mocker.patch('viashpy.testing.Path.is_file', return_value=True)
+            assert viash_resource_pool.cpus == 3
+            assert viash_resource_pool.memory_bytes == 2 * 1024**3
+            for line in run_component(["bar"], stream=True):
+                (reservation,) = viash_resource_pool.reservations().values()
+                assert reservation["cpus"] == 2
+                assert reservation["memory_bytes"] == 1024**3
+            assert viash_resource_pool.reservations() == {}
+            assert run_component(["bar"]) == b"first\\nsecond\\n"
+            assert viash_resource_pool.reservations() == {}
+        """,
+        dummy_config_with_info,
+        executable,
+        cpu=2,
+        memory_gb=1,
+    )
+    if use_ini:
+        pytester.makeini("[pytest]\nviash_host_cpus = 3\nviash_host_memory = 2 gb\n")
+        result = pytester.runpytest("-v")
+    else:
+        result = pytester.runpytest(
+            "-v", "--viash-host-cpus=3", "--viash-host-memory=2gb"
+        )
+    result.assert_outcomes(passed=1)
+
+
+@pytest.mark.parametrize("use_ini", [True, False])
+def test_run_component_docker_pool(pytester, fake_viash_cli, fake_docker_cli, use_ini):
+    config = pytester.makefile(
+        ".vsh.yaml",
+        config="name: foo\nengines:\n  - type: docker\n    image: python\n"
+        "  - type: native\n",
+    )
+    pytester.makepyfile(f"""
+        import pytest
+
+        meta = {{"config": "{config}", "executable": "foo"}}
+
+        @pytest.fixture
+        def viash_executable():
+            return "{fake_viash_cli.location}"
+
+        @pytest.mark.parametrize("run", range(3))
+        def test_run_component(run_component, run):
+            output = run_component(["bar", str(run)])
+            assert output == f"built component ran with bar {{run}}\\n".encode()
+
+        def test_stream(run_component):
+            lines = list(run_component(["baz"], stream=True))
+            assert lines == [b"built component ran with baz\\n"]
+
+        def test_native_engine(run_component):
+            output = run_component(["bar"], engine="native")
+            assert output == b"viash run ran with bar\\n"
+        """)
+    if use_ini:
+        pytester.makeini("[pytest]\nviash_docker_pool = true\n")
+        result = pytester.runpytest("-v")
+    else:
+        result = pytester.runpytest("-v", "--viash-docker-pool")
+    result.assert_outcomes(passed=5)
+    docker_commands = [call[0] for call in fake_docker_cli.calls()]
+    assert docker_commands.count("run") == 1
+    assert docker_commands.count("exec") == 4
+    assert fake_docker_cli.calls()[-1] == ["rm", "--force", "fake_container_id"]
+    exec_call = next(call for call in fake_docker_cli.calls() if call[0] == "exec")
+    assert exec_call[1:5] == [
+        "--workdir",
+        str(pytester.path),
+        "--user",
+        f"{os.getuid()}:{os.getgid()}",
+    ]
+    viash_calls = fake_viash_cli.calls()
+    builds = [call for call in viash_calls if call[0] == "build"]
+    assert len(builds) == 1
+    assert builds[0][builds[0].index("--engine") + 1] == "native"
+    setups = [call for call in viash_calls if "---setup" in call]
+    assert len(setups) == 1
+
+
+def test_run_component_docker_pool_without_native_engine(
+    pytester, fake_viash_cli, fake_docker_cli
+):
+    config = pytester.makefile(
+        ".vsh.yaml", config="name: foo\nengines:\n  - type: docker\n    image: python\n"
+    )
+    pytester.makepyfile(f"""
+        import pytest
+
+        meta = {{"config": "{config}", "executable": "foo"}}
+
+        @pytest.fixture
+        def viash_executable():
+            return "{fake_viash_cli.location}"
+
+        def test_run_component(run_component):
+            assert run_component(["bar"]) == b"viash run ran with bar\\n"
+        """)
+    result = pytester.runpytest("-v", "--viash-docker-pool")
+    result.assert_outcomes(passed=1)
+    # The component can not be built for the native engine, so it is not run in the pool
+    assert "exec" not in [call[0] for call in fake_docker_cli.calls()]
+    assert "build" not in [call[0] for call in fake_viash_cli.calls()]
+
+
+def test_benchmark_component(pytester, fake_viash_cli):
+    config = pytester.makefile(".vsh.yaml", config="name: foo\n")
+    pytester.makepyfile(f"""
+        import pytest
+
+        meta = {{"config": "{config}", "executable": "foo"}}
+
+        @pytest.fixture
+        def viash_executable():
+            return "{fake_viash_cli.location}"
+
+        def test_benchmark(benchmark_component):
+            result = benchmark_component(["bar"], engine="native", rounds=3, warmup=1)
+            assert len(result.runs) == 3
+            assert set(result.statistics) == {{"wall_time", "cpu_time", "max_rss_bytes"}}
+        """)
+    baseline_file = pytester.path / "benchmark_baseline.json"
+    pytester.runpytest("-v").assert_outcomes(passed=1)
+    assert not baseline_file.exists()
+    # The built executable is benchmarked, not 'viash run'
+    viash_commands = [call[0] for call in fake_viash_cli.calls()]
+    assert viash_commands.count("build") == 1
+    assert "run" not in viash_commands
+
+    pytester.runpytest("-v", "--viash-benchmark-update").assert_outcomes(passed=1)
+    baseline = json.loads(baseline_file.read_text())
+    assert baseline["test_benchmark"]["rounds"] == 3
+    pytester.runpytest("-v", "--viash-benchmark-threshold=10").assert_outcomes(passed=1)
+
+    # A baseline that is much faster than the component
+    for statistics in baseline["test_benchmark"]["statistics"].values():
+        statistics["median"] /= 100
+        statistics["iqr"] = 0
+    baseline_file.write_text(json.dumps(baseline))
+    result = pytester.runpytest("-v")
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(
+        ["*Benchmark 'test_benchmark' regressed compared to*", "*wall (s): median*"]
+    )
+
+
+FAKE_VIASH_ALLOCATING = """\
+#!{python}
+import sys
+from pathlib import Path
+
+args = sys.argv[1:]
+if args == ["--version"]:
+    print("viash 0.9.0 (c) 2024 Data Intuitive")
+elif args[0] == "build":
+    output_dir = Path(args[args.index("-o") + 1])
+    output_dir.mkdir(parents=True, exist_ok=True)
+    executable = output_dir / "foo"
+    executable.write_text(
+        "#!{python}\\n"
+        "from pathlib import Path\\n"
+        "data = b'x' * int(Path({memory_file!r}).read_text()) * 1024**2\\n"
+    )
+    executable.chmod(0o755)
+else:
+    sys.exit("viash run should not be used")
+"""
+
+
+def test_benchmark_component_detects_memory_growth(pytester):
+    memory_file = pytester.path / "memory_mb"
+    memory_file.write_text("1")
+    viash = pytester.path / "viash"
+    viash.write_text(
+        FAKE_VIASH_ALLOCATING.format(
+            python=sys.executable, memory_file=str(memory_file)
+        )
+    )
+    viash.chmod(0o755)
+    config = pytester.makefile(".vsh.yaml", config="name: foo\n")
+    pytester.makepyfile(f"""
+        import pytest
+
+        meta = {{"config": "{config}", "executable": "foo"}}
+
+        @pytest.fixture
+        def viash_executable():
+            return "{viash}"
+
+        def test_benchmark(benchmark_component):
+            benchmark_component([], engine="native", rounds=3, warmup=0)
+        """)
+    pytester.runpytest("-v", "--viash-benchmark-update").assert_outcomes(passed=1)
+    memory_file.write_text("200")
+    result = pytester.runpytest("-v", "--viash-benchmark-threshold=1")
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(["*max RSS (MiB): median*exceeds*"])
+
+
+@pytest.mark.parametrize(
+    "memory_mb, expected_warning",
+    [
+        (1, "*ResourceUsageWarning*more than the 1.0 MiB that it declared*"),
+        (100000, "*ResourceUsageWarning*used only*"),
+    ],
+)
+def test_run_component_resource_report(
+    pytester, fake_viash_cli, memory_mb, expected_warning
+):
+    config = pytester.makefile(".vsh.yaml", config="name: foo\n")
+    pytester.makepyfile(f"""
+        import pytest
+
+        meta = {{"config": "{config}", "executable": "foo", "memory_mb": {memory_mb}}}
+
+        @pytest.fixture
+        def viash_executable():
+            return "{fake_viash_cli.location}"
+
+        def test_run_component(run_component, viash_resource_usage):
+            output = run_component(["bar"], engine="native")
+            # The built executable is measured, not the JVM of 'viash run'.
+            assert output.startswith(b"built component ran with bar")
+            [(args, usage, cpus, memory_bytes)] = viash_resource_usage.runs
+            assert args == ["bar"]
+            assert memory_bytes == {memory_mb} * 1024**2
+            assert usage.peak_memory_bytes > 0
+
+        def test_run_component_viash_run(run_component, viash_resource_usage):
+            output = run_component(["bar"], engine="native", build=False)
+            assert output == b"viash run ran with bar\\n"
+            [(args, usage, cpus, memory_bytes)] = viash_resource_usage.runs
+            assert usage.source == "not measured"
+        """)
+    result = pytester.runpytest("-v", "-rA", "--viash-resource-report")
+    result.assert_outcomes(passed=2, warnings=1)
+    result.stdout.fnmatch_lines(
+        [
+            expected_warning,
+            "*viash resource usage*",
+            "*declared CPUs*used CPUs*declared memory*peak memory*",
+        ],
+        consecutive=False,
+    )
+
+
+def test_run_component_resource_report_short_docker_run(
+    pytester, fake_viash_cli, fake_docker_cli
+):
+    config = pytester.makefile(
+        ".vsh.yaml", config="name: foo\nengines:\n  - type: docker\n    image: python\n"
+    )
+    pytester.makepyfile(f"""
+        import pytest
+
+        meta = {{"config": "{config}", "executable": "foo", "memory_mb": 1024}}
+
+        @pytest.fixture
+        def viash_executable():
+            return "{fake_viash_cli.location}"
+
+        def test_run_component(run_component, viash_resource_usage):
+            run_component(["bar"])
+            [(args, usage, cpus, memory_bytes)] = viash_resource_usage.runs
+            assert usage.source == "not measured"
+            assert usage.peak_memory_bytes is None
+        """)
+    result = pytester.runpytest("-v", "--viash-resource-report")
+    # The usage of the docker client is not reported as the usage of the container.
+    result.assert_outcomes(passed=1, warnings=0)
+    [run_call] = [
+        call
+        for call in fake_viash_cli.calls()
+        if call[0] == "run" and "---setup" not in call
+    ]
+    assert any(
+        argument.startswith(
+            ".engines[.type == 'docker'].run_args += '--label viashpy.run="
+        )
+        for argument in run_call
+    )
+
+
+@pytest.fixture
+def hanging_viash(tmp_path):
+    viash = tmp_path / "viash"
+    viash.write_text(
+        "#!/bin/sh\n"
+        'if [ "$1" = "--version" ]; then\n'
+        '  echo "viash 0.9.0 (c) 2024 Data Intuitive"\n'
+        "  exit 0\n"
+        "fi\n"
+        "echo started\n"
+        "sleep 30\n"
+    )
+    viash.chmod(viash.stat().st_mode | stat.S_IEXEC)
+    return viash
+
+
+@pytest.mark.parametrize(
+    "options, call_kwargs",
+    [(["--viash-timeout=0.5"], ""), ([], ", timeout=0.5")],
+)
+def test_run_component_timeout(pytester, hanging_viash, options, call_kwargs):
+    config = pytester.makefile(".vsh.yaml", config="name: foo\n")
+    pytester.makepyfile(f"""
+        import pytest
+
+        meta = {{"config": "{config}", "executable": "foo"}}
+
+        @pytest.fixture
+        def viash_executable():
+            return "{hanging_viash}"
+
+        def test_run_component(run_component):
+            run_component(["bar"], engine="native"{call_kwargs})
+        """)
+    start = time.perf_counter()
+    result = pytester.runpytest(*options)
+    assert time.perf_counter() - start < 20
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(
+        [
+            "*TimeoutExpired*timed out after 0.5 seconds*",
+            "*Captured component output was:",
+            "started",
+        ],
+        consecutive=False,
+    )
+
+
+def test_run_component_session_timeout(pytester, hanging_viash):
+    config = pytester.makefile(".vsh.yaml", config="name: foo\n")
+    pytester.makepyfile(f"""
+        import pytest
+
+        meta = {{"config": "{config}", "executable": "foo"}}
+
+        @pytest.fixture
+        def viash_executable():
+            return "{hanging_viash}"
+
+        @pytest.mark.parametrize("test", range(2))
+        def test_run_component(run_component, test):
+            run_component(["bar"], engine="native")
+        """)
+    result = pytester.runpytest("--viash-session-timeout=0.5")
+    result.assert_outcomes(failed=2)
+    result.stdout.fnmatch_lines(
+        [
+            "*TimeoutExpired*",
+            "*The session timeout of 0.5 seconds for running components has expired.",
+        ],
+        consecutive=False,
+    )
+
+
+@pytest.mark.parametrize(
+    "use_ini, call_kwargs",
+    [(True, ""), (False, ", abort_on=['^start']")],
+)
+def test_run_component_abort_on(pytester, hanging_viash, use_ini, call_kwargs):
+    config = pytester.makefile(".vsh.yaml", config="name: foo\n")
+    if use_ini:
+        pytester.makeini("""
+            [pytest]
+            viash_abort_on =
+                Traceback
+                ^start
+            """)
+    pytester.makepyfile(f"""
+        import pytest
+
+        meta = {{"config": "{config}", "executable": "foo"}}
+
+        @pytest.fixture
+        def viash_executable():
+            return "{hanging_viash}"
+
+        def test_run_component(run_component):
+            run_component(["bar"], engine="native"{call_kwargs})
+        """)
+    start = time.perf_counter()
+    result = pytester.runpytest()
+    assert time.perf_counter() - start < 20
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(
+        [
+            "*OutputPatternMatched*was aborted because its output matched '^start':",
+            "*started",
+        ],
+        consecutive=False,
+    )
+
+
+@pytest.mark.parametrize("use_ini", [True, False])
+def test_run_component_build_cache(pytester, fake_viash_cli, use_ini):
+    config = pytester.makefile(".vsh.yaml", config="name: foo\n")
+    pytester.makepyfile(f"""
+        import pytest
+
+        meta = {{"config": "{config}", "executable": "foo"}}
+
+        @pytest.fixture
+        def viash_executable():
+            return "{fake_viash_cli.location}"
+
+        @pytest.mark.parametrize("run", range(3))
+        def test_run_component(run_component, run):
+            output = run_component(["bar", str(run)], engine="native")
+            assert output == f"built component ran with bar {{run}}\\n".encode()
+        """)
+    if use_ini:
+        pytester.makeini("[pytest]\nviash_build_cache = true\n")
+        result = pytester.runpytest("-v")
+    else:
+        result = pytester.runpytest("-v", "--viash-build-cache")
+    result.assert_outcomes(passed=3)
+    commands = [call[0] for call in fake_viash_cli.calls()]
+    assert commands.count("build") == 1
+    assert "run" not in commands
+
+
+@pytest.mark.parametrize("bypass", ["", "marker", "argument"])
+def test_run_component_result_cache(
+    pytester, makepyfile_and_add_meta, dummy_config_with_info, bypass
+):
+    runs_file = pytester.path / "runs.txt"
+    executable = pytester.makefile(
+        "",
+        foo=f'#!/bin/sh\necho run >> {runs_file}\necho "$2" > "$4"\necho "done"',
+    )
+    executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+    marker = "@pytest.mark.viash_no_result_cache" if bypass == "marker" else ""
+    use_cache = ", use_cache=False" if bypass == "argument" else ""
+
+    makepyfile_and_add_meta(
+        f"""
+        import os
+        import pytest
+
+        {marker}
+        @pytest.mark.parametrize("run", range(3))
+        def test_cached(mocker, run_component, tmp_path, run):
+            mocker.patch('viashpy.testing.Path.is_file', return_value=True)
+            os.chdir(tmp_path)
+            output = run_component(["--input", "foo", "--output", "out.txt"]{use_cache})
+            assert output == b"done\\n"
+            assert (tmp_path / "out.txt").read_text() == "foo\\n"
+        """,
+        dummy_config_with_info,
+        executable,
+    )
+    result = pytester.runpytest("-v", "--viash-result-cache")
+    result.assert_outcomes(passed=3)
+    expected_runs = 3 if bypass else 1
+    assert len(runs_file.read_text().splitlines()) == expected_runs
+
+
+def test_run_component_result_cache_across_sessions(
+    pytester, makepyfile_and_add_meta, dummy_config_with_info
+):
+    runs_file = pytester.path / "runs.txt"
+    executable = pytester.makefile(
+        "",
+        foo=f'#!/bin/sh\necho run >> {runs_file}\ncat "$2" > "$4"\necho "done"',
+    )
+    executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+    makepyfile_and_add_meta(
+        """
+        def test_cached(mocker, run_component, tmp_path):
+            mocker.patch('viashpy.testing.Path.is_file', return_value=True)
+            (tmp_path / "in.txt").write_text("foo")
+            output = run_component(
+                ["--input", str(tmp_path / "in.txt"), "--output", str(tmp_path / "out.txt")]
+            )
+            assert output == b"done\\n"
+            assert (tmp_path / "out.txt").read_text() == "foo"
+        """,
+        dummy_config_with_info,
+        executable,
+    )
+    # The temporary directories of the test differ between the sessions.
+    for session in range(3):
+        result = pytester.runpytest(
+            "-v", "--viash-result-cache", f"--basetemp={pytester.path / str(session)}"
+        )
+        result.assert_outcomes(passed=1)
+    assert len(runs_file.read_text().splitlines()) == 1
+
+
+def test_run_component_timings(
+    pytester, makepyfile_and_add_meta, dummy_config_with_info
+):
+    executable = pytester.makefile("", foo="#!/bin/sh\necho 'foo'")
+    executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+    makepyfile_and_add_meta(
+        """
+        def test_timings(mocker, run_component):
+            mocker.patch('viashpy.testing.Path.is_file', return_value=True)
+            run_component(["bar"])
+            run_component(["baz"])
+        """,
+        dummy_config_with_info,
+        executable,
+    )
+    result = pytester.runpytest("-rA", "--viash-timings=timings.json")
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(
+        ["*viash timings*", "phase*wall (s)*", "run *", "run *"]
+    )
+    timings = json.loads((pytester.path / "timings.json").read_text())
+    [test_timings] = timings["tests"]
+    assert test_timings["nodeid"].endswith("::test_timings")
+    assert [phase["phase"] for phase in test_timings["phases"]] == ["run", "run"]
+    assert all(phase["max_rss_bytes"] for phase in test_timings["phases"])
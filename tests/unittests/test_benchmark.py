@@ -0,0 +1,73 @@
+from viashpy._benchmark import BenchmarkBaseline, BenchmarkResult, summarize
+import pytest
+
+
+def test_summarize():
+    assert summarize([1.0, 2.0, 3.0, 4.0, 100.0]) == {
+        "median": 3.0,
+        "iqr": pytest.approx(50.5),
+        "min": 1.0,
+        "max": 100.0,
+    }
+    assert summarize([2.0]) == {"median": 2.0, "iqr": 0.0, "min": 2.0, "max": 2.0}
+
+
+def make_result(wall_times, max_rss=100 * 1024**2):
+    return BenchmarkResult(
+        "test",
+        [
+            {
+                "wall_time": wall_time,
+                "cpu_time": wall_time / 2,
+                "max_rss_bytes": max_rss,
+            }
+            for wall_time in wall_times
+        ],
+    )
+
+
+def test_benchmark_result_metrics_missing():
+    result = BenchmarkResult("test", [{"wall_time": 1.0}, {"wall_time": 2.0}])
+    assert list(result.statistics) == ["wall_time"]
+    assert "wall (s)" in result.format()
+
+
+@pytest.mark.parametrize(
+    "wall_times, expected_regressions",
+    [
+        ([1.0, 1.0, 1.1], []),
+        # Slower than the threshold allows
+        ([1.5, 1.5, 1.5], ["wall (s)", "CPU (s)"]),
+    ],
+)
+def test_benchmark_result_regressions(wall_times, expected_regressions):
+    baseline = make_result([1.0, 1.0, 1.0]).to_json()
+    regressions = make_result(wall_times).regressions(baseline, threshold=0.2)
+    assert [regression.split(":")[0] for regression in regressions] == (
+        expected_regressions
+    )
+
+
+def test_benchmark_result_regressions_noisy_baseline():
+    # Exceeds the threshold, but not the interquartile range of the baseline
+    baseline = make_result([0.5, 1.0, 1.0, 1.5, 2.0]).to_json()
+    assert make_result([1.5, 1.5, 1.5]).regressions(baseline, threshold=0.2) == []
+
+
+def test_benchmark_result_memory_regression():
+    baseline = make_result([1.0], max_rss=100 * 1024**2).to_json()
+    [regression] = make_result([1.0], max_rss=200 * 1024**2).regressions(
+        baseline, threshold=0.2
+    )
+    assert regression.startswith("max RSS (MiB): median 200.0 exceeds 120.0")
+
+
+def test_benchmark_baseline_update(tmp_path):
+    baseline = BenchmarkBaseline(tmp_path / "benchmark_baseline.json")
+    assert baseline.get("test") is None
+    result = make_result([1.0, 2.0])
+    baseline.update(result)
+    baseline.update(BenchmarkResult("other", result.runs))
+    assert baseline.get("test") == result.to_json()
+    assert baseline.get("other")["rounds"] == 2
+    assert [path.name for path in tmp_path.iterdir()] == ["benchmark_baseline.json"]
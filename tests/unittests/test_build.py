@@ -0,0 +1,123 @@
+import shutil
+from subprocess import CalledProcessError
+from viashpy._build import DockerBuildRegistry, ExecutableCache
+import pytest
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    config = tmp_path / "config.vsh.yaml"
+    config.write_text("name: foo\nresources:\n  - path: script.py\n")
+    (tmp_path / "script.py").write_text("print('foo')")
+    return config
+
+
+def test_docker_build_registry_builds_once(tmp_path, config_file, mocker):
+    build = mocker.Mock()
+    registry = DockerBuildRegistry(tmp_path / "registry")
+    key = registry.key(config_file, "docker")
+    registry.ensure_built(key, build)
+    registry.ensure_built(key, build)
+    # Another process (or xdist worker) sharing the same registry directory
+    DockerBuildRegistry(tmp_path / "registry").ensure_built(key, build)
+    build.assert_called_once_with()
+
+
+def test_docker_build_registry_remembers_failure(tmp_path, config_file, mocker):
+    build = mocker.Mock(
+        side_effect=CalledProcessError(1, ["viash", "run"], output=b"build failed")
+    )
+    registry = DockerBuildRegistry(tmp_path / "registry")
+    key = registry.key(config_file, "docker")
+    with pytest.raises(CalledProcessError):
+        registry.ensure_built(key, build)
+    with pytest.raises(CalledProcessError) as e:
+        DockerBuildRegistry(tmp_path / "registry").ensure_built(key, build)
+    assert e.value.output == b"build failed"
+    assert e.value.cmd == ["viash", "run"]
+    build.assert_called_once_with()
+
+
+def test_docker_build_registry_key_changes_with_resources(config_file):
+    key = DockerBuildRegistry.key(config_file, "docker")
+    assert key == DockerBuildRegistry.key(config_file, "docker")
+    (config_file.parent / "script.py").write_text("print('bar')")
+    assert key != DockerBuildRegistry.key(config_file, "docker")
+
+
+def test_executable_cache_builds_once(tmp_path, config_file, fake_viash_cli):
+    cache = ExecutableCache(tmp_path / "cache")
+    executable = cache.get(
+        config_file, engine="native", viash_location=fake_viash_cli.location
+    )
+    assert executable.name == "foo"
+    assert executable.is_file()
+    # Another process (or session) using the same cache directory
+    assert (
+        ExecutableCache(tmp_path / "cache").get(
+            config_file, engine="native", viash_location=fake_viash_cli.location
+        )
+        == executable
+    )
+    build_calls = [call for call in fake_viash_cli.calls() if call[0] == "build"]
+    assert len(build_calls) == 1
+    assert build_calls[0][:4] == ["build", str(config_file), "--engine", "native"]
+
+
+def test_executable_cache_rebuilds_on_change(tmp_path, config_file, fake_viash_cli):
+    cache = ExecutableCache(tmp_path / "cache")
+    first_build = cache.get(
+        config_file, engine="native", viash_location=fake_viash_cli.location
+    )
+    (config_file.parent / "script.py").write_text("print('bar')")
+    second_build = cache.get(
+        config_file, engine="native", viash_location=fake_viash_cli.location
+    )
+    assert first_build != second_build
+    assert second_build.is_file()
+    assert not first_build.parent.exists(), "Outdated build should have been removed"
+
+
+def test_executable_cache_keeps_builds_for_other_engines(
+    tmp_path, config_file, fake_viash_cli
+):
+    cache = ExecutableCache(tmp_path / "cache")
+    other_cache = ExecutableCache(tmp_path / "cache")
+    docker_build = cache.get(
+        config_file, engine="docker", viash_location=fake_viash_cli.location
+    )
+    native_build = other_cache.get(
+        config_file, engine="native", viash_location=fake_viash_cli.location
+    )
+    assert docker_build != native_build
+    for _ in range(2):
+        assert (
+            cache.get(
+                config_file, engine="docker", viash_location=fake_viash_cli.location
+            )
+            == docker_build
+        )
+        assert (
+            other_cache.get(
+                config_file, engine="native", viash_location=fake_viash_cli.location
+            )
+            == native_build
+        )
+    assert docker_build.is_file()
+    assert native_build.is_file()
+    build_calls = [call for call in fake_viash_cli.calls() if call[0] == "build"]
+    assert len(build_calls) == 2
+
+
+def test_executable_cache_rebuilds_removed_build(tmp_path, config_file, fake_viash_cli):
+    cache = ExecutableCache(tmp_path / "cache")
+    first_build = cache.get(
+        config_file, engine="native", viash_location=fake_viash_cli.location
+    )
+    # E.g. removed by another process
+    shutil.rmtree(first_build.parent)
+    second_build = cache.get(
+        config_file, engine="native", viash_location=fake_viash_cli.location
+    )
+    assert second_build == first_build
+    assert second_build.is_file()
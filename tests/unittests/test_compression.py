@@ -0,0 +1,76 @@
+from viashpy import _compression
+from viashpy._compression import detect_compression, open_decompressed
+from viashpy.utils import extract_tar
+import shutil
+import subprocess
+import tarfile
+import pytest
+
+
+@pytest.fixture
+def plain_tarfile(tmp_path):
+    source = tmp_path / "source" / "root"
+    source.mkdir(parents=True)
+    (source / "foo.txt").write_text("This is a test file.")
+    tar_path = tmp_path / "plain.tar"
+    with tarfile.open(tar_path, "w") as open_tarfile:
+        open_tarfile.add(source, arcname="root")
+    return tar_path
+
+
+def compress_with_tool(tool, source, destination):
+    if not shutil.which(tool[0]):
+        pytest.skip(f"{tool[0]} is not available.")
+    with source.open("rb") as open_source, destination.open("wb") as open_dest:
+        subprocess.run(tool, stdin=open_source, stdout=open_dest, check=True)
+    return destination
+
+
+@pytest.mark.parametrize(
+    "tool, suffix, compression",
+    [
+        (["zstd", "-q", "-c"], ".tar.zst", "zst"),
+        (["zstd", "-q", "-c"], ".tzst", "zst"),
+        (["lz4", "-q", "-c"], ".tar.lz4", "lz4"),
+        (["xz", "-c", "-T0"], ".txz", "xz"),
+        (["gzip", "-c"], ".tgz", "gz"),
+    ],
+)
+def test_extract_tar_compression_formats(
+    tmp_path, plain_tarfile, tool, suffix, compression
+):
+    archive = compress_with_tool(tool, plain_tarfile, tmp_path / f"dummy{suffix}")
+    assert detect_compression(archive) == compression
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    extracted = extract_tar(archive, output_dir)
+    assert extracted == output_dir / "dummy"
+    assert (extracted / "foo.txt").read_text() == "This is a test file."
+
+
+def test_open_decompressed_without_tools(tmp_path, plain_tarfile):
+    archive = compress_with_tool(["xz", "-c"], plain_tarfile, tmp_path / "dummy.tar.xz")
+    with open_decompressed(archive, use_tools=False) as decompressed:
+        assert decompressed.read() == plain_tarfile.read_bytes()
+
+
+def test_open_decompressed_tool_fails(tmp_path, plain_tarfile):
+    archive = compress_with_tool(["xz", "-c"], plain_tarfile, tmp_path / "dummy.tar.xz")
+    data = archive.read_bytes()
+    archive.write_bytes(data[: len(data) // 2])
+    with pytest.raises(tarfile.ReadError, match="Could not decompress"):
+        with open_decompressed(archive) as decompressed:
+            decompressed.read()
+
+
+def test_extract_tar_zstd_unavailable(tmp_path, plain_tarfile, mocker):
+    archive = compress_with_tool(
+        ["zstd", "-q", "-c"], plain_tarfile, tmp_path / "dummy.tar.zst"
+    )
+    mocker.patch.object(_compression, "zstd", None)
+    mocker.patch("viashpy._compression.shutil.which", return_value=None)
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    with pytest.raises(ValueError, match="requires the 'zstandard' python package"):
+        extract_tar(archive, output_dir)
+    assert list(output_dir.iterdir()) == []
@@ -0,0 +1,79 @@
+from viashpy._container_pool import DockerContainerPool
+from subprocess import CalledProcessError, TimeoutExpired
+import os
+import pytest
+
+
+@pytest.fixture
+def pool(tmp_path, fake_docker_cli):
+    pool = DockerContainerPool(
+        mounts=[tmp_path, tmp_path / "nested"], work_dir=tmp_path / "work"
+    )
+    yield pool
+    pool.close()
+
+
+def test_container_pool_reuses_container(pool, tmp_path, fake_docker_cli):
+    assert pool.mounts == [tmp_path.resolve()]
+    outputs = [pool.run("image:test", ["echo", str(i)]) for i in range(3)]
+    assert outputs == [b"0\n", b"1\n", b"2\n"]
+    calls = fake_docker_cli.calls()
+    assert [call[0] for call in calls] == ["run", "exec", "exec", "exec"]
+    assert calls[0] == [
+        "run",
+        "--detach",
+        "--rm",
+        "--entrypoint",
+        "sleep",
+        "--volume",
+        f"{tmp_path.resolve()}:{tmp_path.resolve()}",
+        "image:test",
+        "infinity",
+    ]
+    assert calls[1][3:5] == ["--user", f"{os.getuid()}:{os.getgid()}"]
+    assert calls[1][-3:] == ["fake_container_id", "echo", "0"]
+    pool.close()
+    assert fake_docker_cli.calls()[-1] == ["rm", "--force", "fake_container_id"]
+    assert not (tmp_path / "work").exists()
+
+
+def test_container_pool_uses_clean_temporary_directory(pool, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    command = ["sh", "-c", 'ls -A "$VIASH_TEMP"; touch "$VIASH_TEMP/file"; pwd']
+    first = pool.run("image:test", command)
+    second = pool.run("image:test", command)
+    assert first == second == f"{tmp_path}\n".encode()
+    assert list((tmp_path / "work").iterdir()) == []
+
+
+def test_container_pool_unmounted_working_directory(
+    pool, tmp_path_factory, monkeypatch
+):
+    monkeypatch.chdir(tmp_path_factory.mktemp("not_mounted"))
+    output = pool.run("image:test", ["sh", "-c", 'test "$PWD" = "$VIASH_TEMP"'])
+    assert output == b""
+
+
+def test_container_pool_stream(pool, tmp_path):
+    lines = pool.run("image:test", ["sh", "-c", "echo a; echo b"], stream=True)
+    assert list(lines) == [b"a\n", b"b\n"]
+    assert list((tmp_path / "work").iterdir()) == []
+
+
+def test_container_pool_command_fails(pool, tmp_path):
+    with pytest.raises(CalledProcessError) as e:
+        pool.run("image:test", ["sh", "-c", "echo failed; exit 3"])
+    assert e.value.returncode == 3
+    assert e.value.output == b"failed\n"
+    assert list((tmp_path / "work").iterdir()) == []
+
+
+def test_container_pool_timeout_removes_container(pool, tmp_path, fake_docker_cli):
+    with pytest.raises(TimeoutExpired) as e:
+        pool.run("image:test", ["sh", "-c", "echo started; sleep 30"], timeout=0.5)
+    assert e.value.output == b"started\n"
+    assert ["rm", "--force", "fake_container_id"] in fake_docker_cli.calls()
+    assert list((tmp_path / "work").iterdir()) == []
+    # A new container is started for the next command
+    assert pool.run("image:test", ["echo", "foo"]) == b"foo\n"
+    assert [call[0] for call in fake_docker_cli.calls()].count("run") == 2
@@ -0,0 +1,113 @@
+from viashpy._extraction_cache import ExtractionCache
+from viashpy.utils import extract_tar
+import errno
+import os
+import tarfile
+import pytest
+
+
+@pytest.fixture
+def output_dirs(tmp_path):
+    def wrapper(number, start=0):
+        result = []
+        for i in range(start, start + number):
+            output_dir = tmp_path / f"output_{i}"
+            output_dir.mkdir()
+            result.append(output_dir)
+        return result
+
+    return wrapper
+
+
+def make_archive(path, contents):
+    source = path.parent / f"{path.name}_source" / "root"
+    source.mkdir(parents=True)
+    for name, content in contents.items():
+        (source / name).parent.mkdir(parents=True, exist_ok=True)
+        (source / name).write_bytes(content)
+    with tarfile.open(path, "w:gz") as open_tarfile:
+        open_tarfile.add(source, arcname="root")
+    return path
+
+
+def test_extract_tar_cache_extracts_once(
+    tmp_path, output_dirs, tarfile_mixed_contents, mocker
+):
+    cache = ExtractionCache(tmp_path / "cache")
+    extract = mocker.spy(tarfile, "open")
+    first, second = output_dirs(2)
+    first_extracted = extract_tar(tarfile_mixed_contents, first, cache=cache)
+    second_extracted = extract_tar(tarfile_mixed_contents, second, cache=cache)
+    assert extract.call_count == 1
+    for extracted, output_dir in ((first_extracted, first), (second_extracted, second)):
+        assert extracted == output_dir / "dummy"
+        assert (extracted / "bar" / "foo.txt").read_text() == "This is a test file."
+        assert (extracted / "lorem.txt").read_text() == "ipsum"
+        assert [path.name for path in output_dir.iterdir()] == ["dummy"]
+    # Modifying an extracted file does not change the store
+    first_file = first_extracted / "lorem.txt"
+    assert not os.path.samefile(first_file, second_extracted / "lorem.txt")
+    first_file.write_text("changed")
+    [third] = output_dirs(1, start=2)
+    third_extracted = extract_tar(tarfile_mixed_contents, third, cache=cache)
+    assert (third_extracted / "lorem.txt").read_text() == "ipsum"
+
+
+def test_extract_tar_cache_hardlink(tmp_path, output_dirs, tarfile_mixed_contents):
+    cache = ExtractionCache(tmp_path / "cache", hardlink=True)
+    first, second = output_dirs(2)
+    first_extracted = extract_tar(tarfile_mixed_contents, first, cache=cache)
+    second_extracted = extract_tar(tarfile_mixed_contents, second, cache=cache)
+    # Files are hardlinked and can not be modified
+    first_file = first_extracted / "lorem.txt"
+    assert os.path.samefile(first_file, second_extracted / "lorem.txt")
+    assert not os.access(first_file, os.W_OK) or os.geteuid() == 0
+
+
+def test_extract_tar_cache_target_exists_raises(
+    tmp_path, output_dirs, tarfile_mixed_contents
+):
+    [output_dir] = output_dirs(1)
+    (output_dir / "dummy").mkdir()
+    with pytest.raises(FileExistsError):
+        extract_tar(
+            tarfile_mixed_contents, output_dir, cache=ExtractionCache(tmp_path / "c")
+        )
+
+
+def test_extract_tar_cache_falls_back_to_copy(
+    tmp_path, output_dirs, tarfile_mixed_contents, mocker
+):
+    def cross_device(*args):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    link = mocker.patch("viashpy._extraction_cache.os.link", side_effect=cross_device)
+    reflink = mocker.patch(
+        "viashpy._extraction_cache._reflink", side_effect=cross_device
+    )
+    cache = ExtractionCache(tmp_path / "cache", hardlink=True)
+    [output_dir] = output_dirs(1)
+    extracted = extract_tar(tarfile_mixed_contents, output_dir, cache=cache)
+    assert (extracted / "bar" / "foo.txt").read_text() == "This is a test file."
+    assert (extracted / "lorem.txt").read_text() == "ipsum"
+    # Unsupported strategies are only tried once
+    assert link.call_count == 1
+    assert reflink.call_count == 1
+
+
+def test_extract_tar_cache_lru_eviction(tmp_path, output_dirs):
+    cache = ExtractionCache(tmp_path / "cache", max_size_bytes=2500)
+    archives = [
+        make_archive(tmp_path / f"archive_{i}.tar.gz", {"data.bin": bytes([i]) * 1000})
+        for i in range(3)
+    ]
+    first, second, third, fourth = output_dirs(4)
+    extract_tar(archives[0], first, cache=cache)
+    extract_tar(archives[1], second, cache=cache)
+    # Use the first archive again, so the second one is the least recently used.
+    extract_tar(archives[0], third, cache=cache)
+    extract_tar(archives[2], fourth, cache=cache)
+    stored = {path.name for path in (tmp_path / "cache" / "store").iterdir()}
+    assert stored == {cache.archive_key(archives[0]), cache.archive_key(archives[2])}
+    # Extracted archives are not affected by eviction
+    assert (second / "archive_1" / "data.bin").read_bytes() == bytes([1]) * 1000
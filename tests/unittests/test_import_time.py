@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+import pytest
+import viashpy.testing
+
+# Cumulative time (in microseconds) that importing the pytest plugin may take,
+# after pytest itself has been imported.
+IMPORT_TIME_BUDGET_US = 20_000
+
+# Modules that the pytest plugin must not import when it is loaded.
+HEAVY_MODULES = ("yaml", "asyncio", "tarfile", "concurrent.futures", "multiprocessing")
+
+
+def plugin_import_times(pycache_dir):
+    """
+    Import the plugin with '-X importtime' in a new interpreter and return the
+    cumulative import time of each module that was imported by the plugin.
+    """
+    env = {
+        key: value
+        for key, value in os.environ.items()
+        if key != "PYTHONDONTWRITEBYTECODE"
+    }
+    env["PYTHONPYCACHEPREFIX"] = str(pycache_dir)
+    # Import pytest first, so that only the imports of the plugin are measured.
+    command = [
+        sys.executable,
+        "-X",
+        "importtime",
+        "-c",
+        "import pytest; import viashpy.testing",
+    ]
+    # The first run writes the bytecode, so that compiling is not measured.
+    for _ in range(2):
+        result = subprocess.run(
+            command, env=env, stderr=subprocess.PIPE, check=True, text=True
+        )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if name.strip() == "pytest":
+            # The modules above are imported by pytest.
+            times.clear()
+            continue
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.fixture(scope="module")
+def import_times(tmp_path_factory):
+    return plugin_import_times(tmp_path_factory.mktemp("pycache"))
+
+
+def test_plugin_does_not_import_heavy_modules(import_times):
+    imported = [
+        module
+        for module in import_times
+        if any(
+            module == heavy or module.startswith(f"{heavy}.") for heavy in HEAVY_MODULES
+        )
+    ]
+    assert imported == []
+    assert [module for module in import_times if module.startswith("viashpy.")] == [
+        "viashpy.testing"
+    ]
+
+
+def test_plugin_import_time_budget(import_times):
+    assert import_times["viashpy.testing"] < IMPORT_TIME_BUDGET_US
+
+
+def test_lazy_attributes():
+    assert viashpy.testing.viash_run.__module__ == "viashpy._run"
+    with pytest.raises(AttributeError, match="has no attribute 'does_not_exist'"):
+        viashpy.testing.does_not_exist
@@ -0,0 +1,122 @@
+from textwrap import dedent
+from pathlib import Path
+from viashpy.index import ConfigIndex, ComponentInfo
+import viashpy.index
+import pytest
+
+
+@pytest.fixture
+def source_tree(tmp_path):
+    (tmp_path / "_viash.yaml").touch()
+    configs = {
+        "src/foo/config.vsh.yaml": """
+            name: foo
+            namespace: ns1
+            resources:
+                - type: python_script
+                  path: script.py
+            engines:
+                - type: docker
+                  image: python:3.12
+                - type: native
+            """,
+        "src/bar/config.vsh.yaml": """
+            functionality:
+                name: bar
+                namespace: ns2
+                resources:
+                    - path: /resources/bar.txt
+            platforms:
+                - type: native
+            """,
+        "src/duplicate/config.vsh.yaml": """
+            name: foo
+            namespace: ns2
+            """,
+        # Parsed configs, as written by 'viash build', must be ignored
+        "target/foo/build.vsh.yaml": """
+            name: foo
+            build_info:
+                config: /src/foo/config.vsh.yaml
+            """,
+    }
+    for config_path, contents in configs.items():
+        config_path = tmp_path / config_path
+        config_path.parent.mkdir(parents=True, exist_ok=True)
+        config_path.write_text(dedent(contents))
+    return tmp_path
+
+
+def test_config_index_lookup(source_tree):
+    index = ConfigIndex.build(source_tree / "src")
+    assert len(index) == 3
+    assert index["bar"] == ComponentInfo(
+        name="bar",
+        namespace="ns2",
+        config=source_tree / "src" / "bar" / "config.vsh.yaml",
+        engines=("native",),
+        resources=(source_tree / "resources" / "bar.txt",),
+    )
+    assert index["ns1/foo"].engines == ("docker", "native")
+    assert index["ns1/foo"].resources == (source_tree / "src" / "foo" / "script.py",)
+    assert "ns2/foo" in index
+    with pytest.raises(KeyError, match=r"Multiple components are named 'foo'"):
+        index["foo"]
+    with pytest.raises(KeyError, match=r"Could not find a component named 'baz'"):
+        index["baz"]
+    assert (
+        index.by_config(source_tree / "src" / "bar" / "config.vsh.yaml").name == "bar"
+    )
+
+
+def test_config_index_sidecar_reused(source_tree, tmp_path, mocker):
+    sidecar = tmp_path / "index.json"
+    ConfigIndex.build(source_tree / "src", sidecar=sidecar)
+    assert sidecar.is_file()
+    spy = mocker.spy(viashpy.index, "_read_component_info")
+    index = ConfigIndex.build(source_tree / "src", sidecar=sidecar)
+    assert len(index) == 3
+    assert spy.call_count == 0
+
+
+def test_config_index_sidecar_invalidated(source_tree, tmp_path, mocker):
+    sidecar = tmp_path / "index.json"
+    ConfigIndex.build(source_tree / "src", sidecar=sidecar)
+    new_config = source_tree / "src" / "baz" / "config.vsh.yaml"
+    new_config.parent.mkdir()
+    new_config.write_text("name: baz\n")
+    spy = mocker.spy(viashpy.index, "_read_component_info")
+    index = ConfigIndex.build(source_tree / "src", sidecar=sidecar)
+    assert index["baz"].config == new_config
+    # Only the new config was parsed
+    spy.assert_called_once_with(str(new_config))
+
+
+def test_config_index_parallel(tmp_path):
+    for i in range(40):
+        config = tmp_path / f"comp{i}" / "config.vsh.yaml"
+        config.parent.mkdir()
+        config.write_text(f"name: comp{i}\n")
+    index = ConfigIndex.build(tmp_path, max_workers=2)
+    assert sorted(comp.name for comp in index) == sorted(f"comp{i}" for i in range(40))
+
+
+def test_viash_config_index_fixture(pytester):
+    pytester.makefile(".yaml", _viash="viash_version: 0.9.0")
+    config = pytester.path / "src" / "foo" / "config.vsh.yaml"
+    config.parent.mkdir(parents=True)
+    config.write_text("name: foo\n")
+    pytester.makepyfile(f"""
+        from pathlib import Path
+
+        def test_index(viash_config_index):
+            assert viash_config_index["foo"].config == Path("{config}")
+        """)
+    result = pytester.runpytest("-v")
+    result.assert_outcomes(passed=1)
+
+
+def test_component_info_json_roundtrip():
+    info = ComponentInfo("foo", None, Path("/foo.vsh.yaml"), ("native",), ())
+    assert ComponentInfo.from_json(info.to_json()) == info
+    assert info.full_name == "foo"
@@ -0,0 +1,277 @@
+import subprocess
+import sys
+from pathlib import Path
+from textwrap import dedent
+from xml.etree import ElementTree
+import pytest
+from viashpy.__main__ import main
+from viashpy.index import ComponentInfo
+from viashpy._namespace_test import (
+    ComponentResult,
+    ComponentTests,
+    NamespaceTester,
+    render_test_script,
+    write_junit_xml,
+    _error_suite,
+)
+
+TEST_SCRIPT = """\
+import pytest
+import sys
+
+## VIASH START
+meta = {{"config": "placeholder"}}
+## VIASH END
+
+
+def test_run(run_component):
+    output = run_component(["--input", "foo"])
+    assert {assertion}
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
+"""
+
+
+def write_component(root, namespace, name, assertion="True", requirements=""):
+    component_dir = root / namespace / name
+    component_dir.mkdir(parents=True)
+    (component_dir / "config.vsh.yaml").write_text(dedent(f"""\
+        name: {name}
+        namespace: {namespace}
+        test_resources:
+          - type: python_script
+            path: test.py
+          - type: file
+            path: data.txt
+            dest: resources/input.txt
+        """) + requirements)
+    (component_dir / "test.py").write_text(TEST_SCRIPT.format(assertion=assertion))
+    (component_dir / "data.txt").write_text("foo")
+    return component_dir / "config.vsh.yaml"
+
+
+def component_info(config_path, name="foo", namespace="ns"):
+    return ComponentInfo(
+        name=name,
+        namespace=namespace,
+        config=config_path,
+        engines=(),
+        resources=(),
+    )
+
+
+def test_render_test_script_replaces_viash_block():
+    rendered = render_test_script(
+        TEST_SCRIPT.format(assertion="True"), {"config": "/built/.config.vsh.yaml"}
+    )
+    assert "placeholder" not in rendered
+    assert "VIASH" not in rendered
+    assert "par = {}\nmeta = {'config': '/built/.config.vsh.yaml'}\n" in rendered
+    assert rendered.startswith("import pytest\n")
+
+
+def test_render_test_script_without_viash_block():
+    rendered = render_test_script("def test_foo():\n    pass\n", {"cpus": 2})
+    assert rendered == "par = {}\nmeta = {'cpus': 2}\ndef test_foo():\n    pass\n"
+
+
+@pytest.mark.parametrize("viash_0_9", [True, False])
+def test_component_tests_from_config(tmp_path, viash_0_9):
+    config_path = tmp_path / "config.vsh.yaml"
+    config = dedent("""\
+        name: foo
+        test_resources:
+          - type: python_script
+            path: test.py
+          - type: file
+            path: /resources/data
+            dest: data
+          - type: file
+            path: https://example.com/data.txt
+        requirements:
+          cpus: 2
+          memory: 3 gb
+        """)
+    if not viash_0_9:
+        config = "functionality:\n" + "".join(
+            f"  {line}\n" for line in config.splitlines()
+        )
+    config_path.write_text(config)
+    (tmp_path / "_viash.yaml").touch()
+    tests = ComponentTests.from_component(component_info(config_path))
+    assert tests.resources == (
+        (tmp_path / "test.py", "test.py"),
+        (tmp_path / "resources/data", "data"),
+    )
+    assert tests.scripts == ("test.py",)
+    assert tests.cpus == 2
+    assert tests.memory_bytes == 3 * 1024**3
+
+
+def test_write_junit_xml(tmp_path):
+    component = component_info(tmp_path / "config.vsh.yaml")
+    passed = ElementTree.fromstring(
+        '<testsuite name="pytest" tests="2" failures="1" errors="0" skipped="1" time="1.5">'
+        '<testcase classname="test" name="test_foo"/></testsuite>'
+    )
+    results = [
+        ComponentResult(component, [passed]),
+        ComponentResult(component, [_error_suite(component, "build", "Build failed")]),
+    ]
+    assert results[0].failed
+    output = tmp_path / "reports" / "results.xml"
+    write_junit_xml(results, output, duration=3.0)
+    root = ElementTree.parse(output).getroot()
+    assert root.tag == "testsuites"
+    assert {
+        key: root.get(key) for key in ("tests", "failures", "errors", "skipped")
+    } == {
+        "tests": "3",
+        "failures": "1",
+        "errors": "1",
+        "skipped": "1",
+    }
+    assert root.get("time") == "3.000"
+    assert len(root.findall("testsuite")) == 2
+    error = root.find("testsuite/testcase[@name='build']/error")
+    assert error.get("message") == "Build failed"
+
+
+def test_namespace_test(tmp_path, fake_viash_cli):
+    src = tmp_path / "src"
+    write_component(
+        src,
+        "ns",
+        "passing",
+        assertion='output == b"built component ran with --input foo ---cpus 2\\n"',
+        requirements="requirements:\n  cpus: 2",
+    )
+    write_component(src, "ns", "failing", assertion="False")
+    work_dir = tmp_path / "work"
+    junit_xml = tmp_path / "results.xml"
+    exit_code = main(
+        [
+            "test",
+            str(src),
+            "--viash",
+            str(fake_viash_cli.location),
+            "--junitxml",
+            str(junit_xml),
+            "--work-dir",
+            str(work_dir),
+            "--host-cpus",
+            "2",
+        ]
+    )
+    assert exit_code == 1
+    build_calls = [call for call in fake_viash_cli.calls() if call[0] == "build"]
+    assert len(build_calls) == 2
+    assert all(call[call.index("--engine") + 1] == "native" for call in build_calls)
+    root = ElementTree.parse(junit_xml).getroot()
+    suites = {suite.get("name"): suite for suite in root.findall("testsuite")}
+    assert suites.keys() == {"ns/failing", "ns/passing"}
+    assert suites["ns/passing"].get("tests") == "1"
+    assert suites["ns/passing"].get("failures") == "0"
+    assert suites["ns/failing"].get("failures") == "1"
+    assert (root.get("tests"), root.get("failures")) == ("2", "1")
+    assert (work_dir / "ns/passing/resources/input.txt").read_text() == "foo"
+    test_script = (work_dir / "ns/passing/test.py").read_text()
+    assert "'resources_dir': " + repr(str(work_dir / "ns/passing")) in test_script
+
+
+def test_namespace_test_query(tmp_path, fake_viash_cli):
+    src = tmp_path / "src"
+    write_component(src, "ns", "passing")
+    write_component(src, "ns", "failing", assertion="False")
+    junit_xml = tmp_path / "results.xml"
+    exit_code = main(
+        [
+            "test",
+            str(src),
+            "--query",
+            "^ns/pass",
+            "--viash",
+            str(fake_viash_cli.location),
+            "--junitxml",
+            str(junit_xml),
+        ]
+    )
+    assert exit_code == 0
+    root = ElementTree.parse(junit_xml).getroot()
+    assert [suite.get("name") for suite in root.findall("testsuite")] == ["ns/passing"]
+
+
+def test_namespace_test_build_failure(tmp_path):
+    src = tmp_path / "src"
+    write_component(src, "ns", "foo")
+    junit_xml = tmp_path / "results.xml"
+    exit_code = main(
+        [
+            "test",
+            str(src),
+            "--viash",
+            str(tmp_path / "does_not_exist"),
+            "--junitxml",
+            str(junit_xml),
+        ]
+    )
+    assert exit_code == 1
+    root = ElementTree.parse(junit_xml).getroot()
+    assert (root.get("tests"), root.get("errors")) == ("1", "1")
+    testcase = root.find("testsuite[@name='ns/foo']/testcase")
+    assert testcase.get("name") == "build"
+    assert "does_not_exist" in testcase.find("error").get("message")
+
+
+def test_namespace_test_error_while_testing(tmp_path, fake_viash_cli, monkeypatch):
+    src = tmp_path / "src"
+    write_component(src, "ns", "passing")
+    write_component(src, "ns", "broken")
+    run_tests = NamespaceTester._run_tests
+
+    def break_run_tests(self, tests, executable):
+        if tests.component.name == "broken":
+            raise ElementTree.ParseError("no element found: line 1, column 0")
+        return run_tests(self, tests, executable)
+
+    monkeypatch.setattr(NamespaceTester, "_run_tests", break_run_tests)
+    junit_xml = tmp_path / "results.xml"
+    exit_code = main(
+        [
+            "test",
+            str(src),
+            "--viash",
+            str(fake_viash_cli.location),
+            "--junitxml",
+            str(junit_xml),
+            "--host-memory",
+            "16 gb",
+        ]
+    )
+    assert exit_code == 1
+    root = ElementTree.parse(junit_xml).getroot()
+    suites = {suite.get("name"): suite for suite in root.findall("testsuite")}
+    assert suites["ns/passing"].get("failures") == "0"
+    testcase = suites["ns/broken"].find("testcase")
+    assert testcase.get("name") == "pytest"
+    assert "no element found" in testcase.find("error").get("message")
+
+
+def test_namespace_test_invalid_host_memory(tmp_path, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main(["test", str(tmp_path), "--host-memory", "lots"])
+    assert exit_info.value.code == 2
+    assert "Could not parse memory specifier 'lots'" in capsys.readouterr().err
+
+
+def test_python_m_viashpy_help():
+    result = subprocess.run(
+        [sys.executable, "-m", "viashpy", "test", "--help"],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=Path(__file__).parent,
+    )
+    assert "JUnit XML" in result.stdout
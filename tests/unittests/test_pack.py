@@ -0,0 +1,100 @@
+from concurrent.futures import Future
+from viashpy.utils import TarArchive, extract_tar, pack_tar
+from viashpy import _pack
+from viashpy._cache import hash_file
+import os
+import pytest
+
+
+@pytest.fixture
+def source_dir(tmp_path):
+    source = tmp_path / "source" / "data"
+    (source / "sub").mkdir(parents=True)
+    (source / "foo.txt").write_text("This is a test file.")
+    (source / "sub" / "bar.txt").write_text("Another file.")
+    (source / "link.txt").symlink_to("foo.txt")
+    return source
+
+
+@pytest.fixture
+def output_dir(tmp_path):
+    output = tmp_path / "output"
+    output.mkdir()
+    return output
+
+
+@pytest.mark.parametrize("suffix", [".tar", ".tar.gz", ".tgz", ".tar.xz", ".tar.zst"])
+def test_pack_tar_round_trip(tmp_path, source_dir, output_dir, suffix):
+    archive = pack_tar(source_dir, tmp_path / f"archive{suffix}")
+    assert archive == tmp_path / f"archive{suffix}"
+    extracted = extract_tar(archive, output_dir)
+    assert (extracted / "foo.txt").read_text() == "This is a test file."
+    assert (extracted / "sub" / "bar.txt").read_text() == "Another file."
+    assert os.readlink(extracted / "link.txt") == "foo.txt"
+
+
+def test_pack_tar_zstd_tool(tmp_path, source_dir, output_dir, mocker):
+    mocker.patch("viashpy._pack.block_compressor", return_value=None)
+    archive = pack_tar(source_dir, tmp_path / "archive.tar.zst")
+    extracted = extract_tar(archive, output_dir)
+    assert (extracted / "foo.txt").read_text() == "This is a test file."
+
+
+@pytest.mark.parametrize("suffix", [".tar", ".tar.gz", ".tar.zst"])
+def test_pack_tar_is_deterministic(tmp_path, source_dir, suffix):
+    os.utime(source_dir / "foo.txt", (1000, 1000))
+    first = pack_tar(source_dir, tmp_path / f"first{suffix}", max_workers=1)
+    # Different modification times and creation order
+    (source_dir / "foo.txt").unlink()
+    (source_dir / "foo.txt").write_text("This is a test file.")
+    second = pack_tar(source_dir, tmp_path / f"second{suffix}", max_workers=4, mtime=0)
+    third = pack_tar(source_dir, tmp_path / f"third{suffix}", max_workers=1, mtime=0)
+    assert hash_file(second) == hash_file(third)
+    assert first.read_bytes() != second.read_bytes()
+
+
+def test_pack_tar_blocks_can_be_read_independently(tmp_path, source_dir, mocker):
+    mocker.patch.object(_pack, "_BLOCK_SIZE", 16 * 1024)
+    for i in range(20):
+        (source_dir / f"{i}.bin").write_bytes(os.urandom(8 * 1024))
+    archive = pack_tar(source_dir, tmp_path / "archive.tar.gz", max_workers=3)
+    tar_archive = TarArchive(archive, index_dir=tmp_path / "index")
+    assert len(tar_archive._seek_points) > 5
+    assert tar_archive.read("data/19.bin") == (source_dir / "19.bin").read_bytes()
+    assert tar_archive.read("data/foo.txt") == b"This is a test file."
+
+
+def test_pack_tar_background(tmp_path, source_dir, output_dir):
+    future = pack_tar(source_dir, tmp_path / "archive.tar.gz", background=True)
+    assert isinstance(future, Future)
+    archive = future.result(timeout=60)
+    extracted = extract_tar(archive, output_dir)
+    assert (extracted / "foo.txt").read_text() == "This is a test file."
+
+
+def test_pack_tar_explicit_compression(tmp_path, source_dir, output_dir):
+    archive = pack_tar(source_dir, tmp_path / "archive.tar", compression="gz")
+    assert archive.read_bytes().startswith(b"\x1f\x8b")
+
+
+def test_pack_tar_destination_exists(tmp_path, source_dir):
+    (tmp_path / "archive.tar").touch()
+    with pytest.raises(FileExistsError, match="already exists"):
+        pack_tar(source_dir, tmp_path / "archive.tar")
+
+
+def test_pack_tar_unknown_suffix(tmp_path, source_dir):
+    with pytest.raises(ValueError, match="Could not determine the compression"):
+        pack_tar(source_dir, tmp_path / "archive.zip")
+
+
+def test_pack_tar_source_does_not_exist(tmp_path):
+    with pytest.raises(FileNotFoundError, match="does not exist"):
+        pack_tar(tmp_path / "missing", tmp_path / "archive.tar")
+
+
+def test_pack_tar_failure_removes_temporary_file(tmp_path, source_dir, mocker):
+    mocker.patch("viashpy._pack._add_tree", side_effect=OSError("Disk full"))
+    with pytest.raises(OSError, match="Disk full"):
+        pack_tar(source_dir, tmp_path / "archive.tar.gz")
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["source"]
@@ -0,0 +1,202 @@
+from subprocess import CalledProcessError, PIPE, TimeoutExpired
+from viashpy._process import (
+    OutputPatternMatched,
+    OutputScanner,
+    OutputTail,
+    RunTimeouts,
+    StreamedProcess,
+)
+from pathlib import Path
+import re
+import sys
+import time
+import pytest
+
+
+def python_command(code):
+    return [sys.executable, "-c", code]
+
+
+def test_output_tail_keeps_last_bytes():
+    tail = OutputTail(max_bytes=10)
+    for chunk in [b"0123456789", b"abcdef", b"ghij"]:
+        tail.append(chunk)
+    assert tail.getvalue() == b"abcdefghij"
+    assert tail.truncated
+    assert tail.total_bytes == 20
+
+
+def test_streamed_process_yields_lines():
+    process = StreamedProcess(python_command("print('foo'); print('bar')"))
+    assert list(process) == [b"foo\n", b"bar\n"]
+    assert process.returncode == 0
+
+
+def test_streamed_process_chunks():
+    process = StreamedProcess(
+        python_command("import sys; sys.stdout.write('x' * 100)"), chunk_size=8
+    )
+    chunks = list(process)
+    assert all(len(chunk) <= 8 for chunk in chunks)
+    assert b"".join(chunks) == b"x" * 100
+
+
+def test_streamed_process_tee_and_bounded_tail(tmp_path):
+    tee = tmp_path / "output.log"
+    process = StreamedProcess(
+        python_command("for i in range(1000): print(i)"),
+        tee=tee,
+        max_output_bytes=4,
+    )
+    assert process.wait() == b"999\n"
+    assert tee.read_text().splitlines() == [str(i) for i in range(1000)]
+
+
+def test_streamed_process_failure_raises_with_tail():
+    process = StreamedProcess(
+        python_command("import sys; print('a' * 100); sys.exit('failed!')"),
+        max_output_bytes=20,
+    )
+    with pytest.raises(CalledProcessError) as e:
+        process.wait()
+    assert e.value.returncode == 1
+    assert e.value.output.endswith(b"failed!\n")
+    assert len(e.value.output) == 20
+
+
+def test_streamed_process_stderr_pipe_raises():
+    with pytest.raises(ValueError, match=r"requires stderr to be redirected"):
+        StreamedProcess(python_command("pass"), stderr=PIPE)
+
+
+def is_running(pid):
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text()
+    except FileNotFoundError:
+        return False
+    # Killed processes can remain a zombie until they are reaped by init.
+    return stat.rsplit(")", 1)[1].split()[0] != "Z"
+
+
+@pytest.mark.skipif(not Path("/proc").is_dir(), reason="requires /proc")
+def test_streamed_process_timeout_kills_process_group(tmp_path):
+    pid_file = tmp_path / "pid"
+    timed_out = []
+    start = time.perf_counter()
+    process = StreamedProcess(
+        ["sh", "-c", f"echo started; sleep 30 & echo $! > {pid_file}; wait"],
+        timeout=0.5,
+        on_kill=lambda: timed_out.append(True),
+    )
+    with pytest.raises(TimeoutExpired) as e:
+        process.wait()
+    assert time.perf_counter() - start < 10
+    assert e.value.output == b"started\n"
+    assert e.value.timeout == 0.5
+    assert process.timed_out and timed_out == [True]
+    grandchild = int(pid_file.read_text())
+    deadline = time.monotonic() + 5
+    while is_running(grandchild) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not is_running(grandchild)
+
+
+def test_streamed_process_timeout_while_streaming():
+    process = StreamedProcess(
+        python_command("import time; print('a', flush=True); time.sleep(30)"),
+        timeout=0.5,
+    )
+    lines = []
+    with pytest.raises(TimeoutExpired):
+        for line in process:
+            lines.append(line)
+    assert lines == [b"a\n"]
+
+
+def test_streamed_process_finishes_within_timeout():
+    process = StreamedProcess(python_command("print('done')"), timeout=30)
+    assert process.wait() == b"done\n"
+    assert not process.timed_out
+
+
+def test_run_timeouts(monkeypatch):
+    now = 100.0
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    assert RunTimeouts().timeout() is None
+    assert RunTimeouts(call_timeout=5).timeout() == 5
+    assert RunTimeouts(call_timeout=5).timeout(2) == 2
+    timeouts = RunTimeouts(call_timeout=5, session_timeout=8)
+    assert timeouts.timeout() == 5
+    now = 105.0
+    assert timeouts.remaining() == 3
+    assert timeouts.timeout() == 3
+    assert timeouts.timeout(10) == 3
+    now = 110.0
+    assert timeouts.timeout() == 0
+
+
+def test_output_scanner_lines_split_over_chunks():
+    scanner = OutputScanner(["Traceback", re.compile("memory", re.IGNORECASE)])
+    assert not scanner.feed(b"line 1\nTrace")
+    assert not scanner.feed(b"ba")
+    assert scanner.feed(b"ck (most recent call last):\nline 3\n")
+    assert scanner.pattern == "Traceback"
+    assert scanner.line == b"Traceback (most recent call last):"
+    assert scanner.context == [b"line 1", b"Traceback (most recent call last):"]
+    # Only the first match is reported
+    assert not scanner.feed(b"MemoryError\n")
+    assert scanner.pattern == "Traceback"
+
+
+def test_output_scanner_last_line_and_context():
+    scanner = OutputScanner([rb"MemoryError$"], context_lines=2)
+    assert not scanner.feed(b"a\nb\nc\nMemoryError")
+    assert scanner.finish()
+    assert scanner.context == [b"c", b"MemoryError"]
+
+
+@pytest.mark.skipif(not Path("/proc").is_dir(), reason="requires /proc")
+def test_streamed_process_abort_on(tmp_path):
+    pid_file = tmp_path / "pid"
+    killed = []
+    start = time.perf_counter()
+    process = StreamedProcess(
+        [
+            "sh",
+            "-c",
+            f"sleep 30 & echo $! > {pid_file}; echo step 1; echo 'FATAL: oops'; wait",
+        ],
+        abort_on=["^FATAL"],
+        on_kill=lambda: killed.append(True),
+    )
+    with pytest.raises(OutputPatternMatched) as e:
+        process.wait()
+    assert time.perf_counter() - start < 10
+    assert process.aborted and killed == [True]
+    assert e.value.pattern == "^FATAL"
+    assert e.value.line == b"FATAL: oops"
+    assert e.value.context == [b"step 1", b"FATAL: oops"]
+    assert e.value.output == b"step 1\nFATAL: oops\n"
+    assert "was aborted because its output matched '^FATAL':\nstep 1\nFATAL" in str(
+        e.value
+    )
+    grandchild = int(pid_file.read_text())
+    deadline = time.monotonic() + 5
+    while is_running(grandchild) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not is_running(grandchild)
+
+
+def test_streamed_process_abort_on_after_successful_exit():
+    process = StreamedProcess(
+        python_command("import sys; sys.stdout.write('Traceback')"),
+        abort_on=["Traceback"],
+    )
+    with pytest.raises(OutputPatternMatched):
+        process.wait()
+
+
+def test_streamed_process_abort_on_no_match():
+    process = StreamedProcess(python_command("print('fine')"), abort_on=["Traceback"])
+    assert process.wait() == b"fine\n"
+    assert not process.aborted
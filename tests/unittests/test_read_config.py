@@ -1,5 +1,12 @@
 from viashpy._run import viash_run
-from viashpy.config import read_viash_config
+from viashpy.config import (
+    read_viash_config,
+    read_viash_config_cached,
+    config_content_hash,
+    config_resource_paths,
+)
+import viashpy.config
+import os
 from textwrap import dedent
 import pytest
 
@@ -31,3 +38,86 @@ def test_read_viash_config_not_map_raises(pytester):
     empty_config = pytester.makefile(".vsh.yaml", foo=dedent(config_contents))
     with pytest.raises(ValueError, match=mesg):
         read_viash_config(empty_config)
+
+
+@pytest.mark.parametrize(
+    "config_contents",
+    [
+        """
+        functionality:
+            name: foo
+            resources:
+                - path: script.py
+                - path: /src/utils
+                - type: python_script
+                  text: print("foo")
+                - path: https://example.com/resource.txt
+        """,
+        """
+        name: foo
+        resources:
+            - path: script.py
+            - path: /src/utils
+            - type: python_script
+              text: print("foo")
+            - path: https://example.com/resource.txt
+        """,
+    ],
+)
+def test_config_resource_paths(tmp_path, config_contents):
+    (tmp_path / "_viash.yaml").touch()
+    config_dir = tmp_path / "src" / "foo"
+    config_dir.mkdir(parents=True)
+    config = config_dir / "config.vsh.yaml"
+    config.write_text(dedent(config_contents))
+    assert list(config_resource_paths(config)) == [
+        config_dir / "script.py",
+        tmp_path / "src" / "utils",
+    ]
+
+
+def test_read_viash_config_cached(tmp_path, mocker):
+    config_path = tmp_path / "config.vsh.yaml"
+    config_path.write_text("name: foo\nresources:\n  - path: script.py\n")
+    spy = mocker.spy(viashpy.config, "read_viash_config")
+    config = read_viash_config_cached(config_path)
+    assert config == {"name": "foo", "resources": ({"path": "script.py"},)}
+    assert read_viash_config_cached(config_path) is config
+    assert spy.call_count == 1
+    # Changing the file invalidates the cache
+    config_path.write_text("name: foobar\n")
+    assert read_viash_config_cached(config_path) == {"name": "foobar"}
+    assert spy.call_count == 2
+
+
+def test_read_viash_config_cached_is_read_only(tmp_path):
+    config_path = tmp_path / "config.vsh.yaml"
+    config_path.write_text("functionality:\n  name: foo\n  resources: []\n")
+    config = read_viash_config_cached(config_path)
+    with pytest.raises(TypeError):
+        config["functionality"]["name"] = "bar"
+    with pytest.raises(AttributeError):
+        config["functionality"]["resources"].append("foo")
+    assert read_viash_config(config_path)["functionality"]["name"] == "foo"
+
+
+def test_config_content_hash_memoized(tmp_path, mocker):
+    config_path = tmp_path / "config.vsh.yaml"
+    config_path.write_text("name: foo\nresources:\n  - path: resources\n")
+    (tmp_path / "resources").mkdir()
+    script = tmp_path / "resources" / "script.py"
+    script.write_text("print('foo')")
+    # Files that were just modified are hashed every time
+    old_mtime = (1_600_000_000, 1_600_000_000)
+    for path in (config_path, script):
+        os.utime(path, old_mtime)
+    content_hash = config_content_hash(config_path)
+    opened = mocker.spy(viashpy.config.Path, "open")
+    assert config_content_hash(config_path) == content_hash
+    assert opened.call_count == 0
+    script.write_text("print('bar')")
+    changed_hash = config_content_hash(config_path)
+    assert changed_hash != content_hash
+    os.utime(script, old_mtime)
+    (tmp_path / "resources" / "other.py").write_text("")
+    assert config_content_hash(config_path) not in (content_hash, changed_hash)
@@ -0,0 +1,107 @@
+from viashpy._resource_usage import (
+    DockerStatsSampler,
+    ResourceUsage,
+    ResourceUsageReport,
+    _parse_docker_memory,
+    check_declared_resources,
+)
+from viashpy._timing import PhaseRecorder
+import time
+import pytest
+
+MiB = 1024**2
+
+
+@pytest.mark.parametrize(
+    "memory, expected",
+    [("512MiB", 512 * MiB), ("1.5GiB ", int(1.5 * 1024**3)), ("100kB", 100_000)],
+)
+def test_parse_docker_memory(memory, expected):
+    assert _parse_docker_memory(memory) == expected
+
+
+def test_parse_docker_memory_invalid():
+    with pytest.raises(ValueError, match="Could not parse memory usage"):
+        _parse_docker_memory("lots")
+
+
+def test_resource_usage_from_phase():
+    phase = PhaseRecorder().start("run")
+    phase.wall_time, phase.cpu_user, phase.cpu_system = 2.0, 3.0, 1.0
+    phase.max_rss_bytes = 100 * MiB
+    usage = ResourceUsage.from_phase(phase)
+    assert usage.cpu_utilization == 2.0
+    assert usage.peak_memory_bytes == 100 * MiB
+    assert usage.source == "rusage"
+
+
+def usage(cpu_utilization, peak_memory_bytes, wall_time=10.0):
+    return ResourceUsage(
+        wall_time=wall_time,
+        peak_memory_bytes=peak_memory_bytes,
+        cpu_utilization=cpu_utilization,
+        source="rusage",
+    )
+
+
+@pytest.mark.parametrize(
+    "measured, cpus, memory_bytes, expected",
+    [
+        (usage(1.8, 800 * MiB), 2, 1024 * MiB, []),
+        (usage(1.8, 800 * MiB), None, None, []),
+        (usage(3.5, 800 * MiB), 2, 1024 * MiB, ["used 3.50 CPUs on average, more"]),
+        (usage(0.2, 800 * MiB), 2, 1024 * MiB, ["used only 0.20 CPUs"]),
+        (usage(1.8, 2048 * MiB), 2, 1024 * MiB, ["used 2048.0 MiB of memory, more"]),
+        (usage(1.8, 100 * MiB), 2, 1024 * MiB, ["used only 100.0 MiB of the 1024.0"]),
+        # CPU utilization of short runs is not checked
+        (usage(0.2, 800 * MiB, wall_time=0.1), 2, 1024 * MiB, []),
+    ],
+)
+def test_check_declared_resources(measured, cpus, memory_bytes, expected):
+    messages = check_declared_resources(measured, cpus, memory_bytes, 0.25)
+    assert len(messages) == len(expected)
+    for message, expected_part in zip(messages, expected):
+        assert expected_part in message
+
+
+def test_resource_usage_report():
+    report = ResourceUsageReport(0.25)
+    messages = report.add(["--input", "foo"], usage(1.5, 200 * MiB), 2, 100 * MiB)
+    assert len(messages) == 1
+    formatted = report.format().splitlines()
+    assert "declared CPUs" in formatted[0]
+    assert formatted[1].split() == [
+        "2",
+        "1.50",
+        "100.0",
+        "MiB",
+        "200.0",
+        "MiB",
+        "rusage",
+        "--input",
+        "foo",
+    ]
+
+
+def test_docker_stats_sampler(fake_docker_cli):
+    with DockerStatsSampler("viashpy.run=abc", interval=0.01) as sampler:
+        deadline = time.monotonic() + 10
+        while not sampler.samples and time.monotonic() < deadline:
+            time.sleep(0.01)
+    measured = sampler.usage(wall_time=1.0)
+    assert measured.cpu_utilization == 1.5
+    assert measured.peak_memory_bytes == 512 * MiB
+    assert measured.source == "docker stats"
+    assert ["ps", "--quiet", "--filter", "label=viashpy.run=abc"] in (
+        fake_docker_cli.calls()
+    )
+
+
+def test_docker_stats_sampler_without_samples():
+    assert DockerStatsSampler("viashpy.run=abc").usage(wall_time=1.0) is None
+
+
+def test_not_measured_usage_is_not_checked():
+    not_measured = ResourceUsage.not_measured(wall_time=10.0)
+    assert not_measured.source == "not measured"
+    assert check_declared_resources(not_measured, 2, 1024 * MiB, 0.25) == []
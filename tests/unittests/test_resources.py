@@ -0,0 +1,161 @@
+from subprocess import CalledProcessError
+from threading import Lock, Thread
+from viashpy._resources import (
+    FileResourcePool,
+    ResourcePool,
+    run_batch,
+    memory_to_bytes,
+)
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import pytest
+
+
+@pytest.mark.parametrize(
+    "memory, expected",
+    [
+        (None, None),
+        ("6442450944B", 6442450944),
+        ("6GB", 6442450944),
+        ("1.5KB", 1536),
+        ("6gb", 6442450944),
+        ("6 Gb", 6442450944),
+    ],
+)
+def test_memory_to_bytes(memory, expected):
+    assert memory_to_bytes(memory) == expected
+
+
+def test_memory_to_bytes_invalid_raises():
+    with pytest.raises(
+        ValueError, match=r"Could not parse memory specifier '6 gigs'\."
+    ):
+        memory_to_bytes("6 gigs")
+
+
+class ConcurrencyTracker:
+    def __init__(self):
+        self._lock = Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def __call__(self, args):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.05)
+        with self._lock:
+            self.running -= 1
+        if args[0] == "fail":
+            raise CalledProcessError(1, args, output=f"output of {args}".encode())
+        return args[0]
+
+
+@pytest.mark.parametrize(
+    "pool_cpus, pool_memory, cpus, memory_bytes, expected_max",
+    [
+        (4, 1000, 1, None, 4),
+        (4, 1000, 2, None, 2),
+        (4, 1000, 1, 500, 2),
+        # Requests larger than the pool still run, one at a time
+        (4, 1000, 8, 5000, 1),
+    ],
+)
+def test_run_batch_does_not_oversubscribe(
+    pool_cpus, pool_memory, cpus, memory_bytes, expected_max
+):
+    tracker = ConcurrencyTracker()
+    results = run_batch(
+        tracker,
+        [[str(i)] for i in range(8)],
+        cpus=cpus,
+        memory_bytes=memory_bytes,
+        max_workers=8,
+        resource_pool=ResourcePool(cpus=pool_cpus, memory_bytes=pool_memory),
+    )
+    assert results == [str(i) for i in range(8)]
+    assert tracker.max_running == expected_max
+
+
+def test_run_batch_errors_in_input_order():
+    arg_lists = [["0"], ["fail", "1"], ["2"], ["fail", "3"]]
+    results = run_batch(ConcurrencyTracker(), arg_lists, return_exceptions=True)
+    assert results[0] == "0"
+    assert results[2] == "2"
+    assert isinstance(results[1], CalledProcessError)
+    assert results[1].output == b"output of ['fail', '1']"
+    assert results[3].output == b"output of ['fail', '3']"
+    with pytest.raises(CalledProcessError) as e:
+        run_batch(ConcurrencyTracker(), arg_lists)
+    assert e.value.output == b"output of ['fail', '1']"
+
+
+def test_file_resource_pool_is_shared(tmp_path):
+    first_worker = FileResourcePool(tmp_path, cpus=4, memory_bytes=1000)
+    second_worker = FileResourcePool(tmp_path, cpus=4, memory_bytes=1000)
+    reservation = first_worker.try_acquire(3, 600)
+    assert reservation is not None
+    assert second_worker.try_acquire(2, None) is None
+    assert second_worker.try_acquire(1, 500) is None
+    other_reservation = second_worker.try_acquire(1, 400)
+    assert other_reservation is not None
+    first_worker.release(reservation)
+    second_worker.release(other_reservation)
+    assert second_worker.reservations() == {}
+
+
+def test_file_resource_pool_waits_for_release(tmp_path):
+    pool = FileResourcePool(tmp_path, cpus=2, max_poll_interval=0.01)
+    reservation = pool.acquire(2, None)
+    acquired = []
+    waiting = Thread(target=lambda: acquired.append(pool.acquire(1, None)))
+    waiting.start()
+    time.sleep(0.1)
+    assert not acquired
+    pool.release(reservation)
+    waiting.join(timeout=10)
+    assert len(acquired) == 1
+
+
+def test_file_resource_pool_acquire_async(tmp_path):
+    pool = FileResourcePool(tmp_path, cpus=2, max_poll_interval=0.01)
+    reservation = pool.acquire(2, None)
+
+    async def acquire_and_release():
+        waiting = asyncio.ensure_future(pool.acquire_async(1, None))
+        await asyncio.sleep(0.1)
+        assert not waiting.done()
+        pool.release(reservation)
+        return await asyncio.wait_for(waiting, timeout=10)
+
+    assert asyncio.run(acquire_and_release()) in pool.reservations()
+
+
+def test_file_resource_pool_removes_reservations_of_dead_processes(tmp_path):
+    crashed_worker = subprocess.Popen([sys.executable, "-c", "pass"])
+    crashed_worker.wait()
+    (tmp_path / "reservations.json").write_text(
+        json.dumps(
+            {"crashed": {"pid": crashed_worker.pid, "cpus": 4, "memory_bytes": 0}}
+        )
+    )
+    pool = FileResourcePool(tmp_path, cpus=4)
+    with pool.reserve(4, None):
+        assert [r["pid"] for r in pool.reservations().values()] == [os.getpid()]
+
+
+def test_run_batch_with_file_resource_pool(tmp_path):
+    tracker = ConcurrencyTracker()
+    results = run_batch(
+        tracker,
+        [[str(i)] for i in range(6)],
+        cpus=2,
+        max_workers=6,
+        resource_pool=FileResourcePool(tmp_path, cpus=4, max_poll_interval=0.01),
+    )
+    assert results == [str(i) for i in range(6)]
+    assert tracker.max_running == 2
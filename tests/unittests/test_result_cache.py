@@ -0,0 +1,121 @@
+from viashpy._result_cache import ResultCache
+import pytest
+import shutil
+
+
+@pytest.fixture
+def workdir(tmp_path):
+    workdir = tmp_path / "workdir"
+    workdir.mkdir()
+    (workdir / "input.txt").write_text("input")
+    return workdir
+
+
+def run_and_store(cache, workdir, args, output_contents, roots=()):
+    (workdir / "output.txt").unlink(missing_ok=True)
+    shutil.rmtree(workdir / "output_dir", ignore_errors=True)
+    snapshot = cache.snapshot(args, workdir)
+    (workdir / "output.txt").write_text(output_contents)
+    (workdir / "output_dir").mkdir()
+    (workdir / "output_dir" / "nested.txt").write_text(output_contents * 2)
+    return cache.store(
+        ["component"], args, workdir, output_contents.encode(), snapshot, roots
+    )
+
+
+def test_result_cache_replay(tmp_path, workdir):
+    cache = ResultCache(tmp_path / "cache")
+    args = ["--input", "input.txt", "--output=output.txt", "--dir", "output_dir"]
+    key = run_and_store(cache, workdir, args, "foo")
+    # The outputs of the earlier run are not inputs
+    assert cache.key(["component"], args, workdir) == key
+
+    new_workdir = tmp_path / "new_workdir"
+    new_workdir.mkdir()
+    (new_workdir / "input.txt").write_text("input")
+    assert cache.key(["component"], args, new_workdir) == key
+    assert cache.replay(key, args, new_workdir) == b"foo"
+    assert (new_workdir / "output.txt").read_text() == "foo"
+    assert (new_workdir / "output_dir" / "nested.txt").read_text() == "foofoo"
+    # The input file is not part of the result
+    assert len(cache.replay(key, args, new_workdir)) == 3
+
+
+def test_result_cache_absolute_paths_in_roots(tmp_path):
+    cache = ResultCache(tmp_path / "cache")
+    keys = []
+    for session in ("pytest-1", "pytest-2"):
+        # Like the tmp_path of the same test in two sessions
+        test_dir = tmp_path / session / "test_foo0"
+        test_dir.mkdir(parents=True)
+        (test_dir / "input.txt").write_text("input")
+        args = [
+            "--input",
+            str(test_dir / "input.txt"),
+            f"--output={test_dir / 'output.txt'}",
+        ]
+        key = cache.key(["component"], args, tmp_path, roots=[test_dir])
+        if session == "pytest-1":
+            snapshot = cache.snapshot(args, tmp_path)
+            (test_dir / "output.txt").write_text("output")
+            assert (
+                cache.store(
+                    ["component"], args, tmp_path, b"foo", snapshot, roots=[test_dir]
+                )
+                == key
+            )
+        else:
+            assert cache.replay(key, args, tmp_path) == b"foo"
+            assert (test_dir / "output.txt").read_text() == "output"
+        keys.append(key)
+    assert keys[0] == keys[1]
+
+
+def test_result_cache_existing_output_is_stored(tmp_path, workdir):
+    cache = ResultCache(tmp_path / "cache")
+    (workdir / "output.txt").write_text("from an earlier run")
+    args = ["--input", "input.txt", "--output", "output.txt"]
+    snapshot = cache.snapshot(args, workdir)
+    (workdir / "output.txt").write_text("new output")
+    key = cache.store(["component"], args, workdir, b"foo", snapshot)
+    (workdir / "output.txt").write_text("from an earlier run")
+    assert cache.key(["component"], args, workdir) == key
+    assert cache.replay(key, args, workdir) == b"foo"
+    assert (workdir / "output.txt").read_text() == "new output"
+
+
+def test_result_cache_key_depends_on_inputs(tmp_path, workdir):
+    cache = ResultCache(tmp_path / "cache")
+    args = ["--input", "input.txt"]
+    key = cache.key(["component"], args, workdir)
+    assert key != cache.key(["other_component"], args, workdir)
+    assert key != cache.key(["component"], args + ["--flag"], workdir)
+    # Inputs are keyed on their contents, not their name
+    (workdir / "renamed.txt").write_text("input")
+    assert key == cache.key(["component"], ["--input", "renamed.txt"], workdir)
+    (workdir / "input.txt").write_text("changed input")
+    assert key != cache.key(["component"], args, workdir)
+
+
+def test_result_cache_miss(tmp_path, workdir):
+    cache = ResultCache(tmp_path / "cache")
+    assert cache.replay(cache.key(["component"], [], workdir), [], workdir) is None
+
+
+def test_result_cache_lru_eviction(tmp_path, workdir):
+    cache = ResultCache(tmp_path / "cache", max_size_bytes=250)
+    args = [
+        ["--output", "output.txt", "--dir", "output_dir", str(run)] for run in range(3)
+    ]
+    first = run_and_store(cache, workdir, args[0], "a" * 40)
+    second = run_and_store(cache, workdir, args[1], "b" * 40)
+    # Use the first result, so that the second one is the least recently used
+    assert cache.replay(first, args[0], workdir) is not None
+    third = run_and_store(cache, workdir, args[2], "c" * 40)
+    assert cache.replay(second, args[1], workdir) is None
+    assert cache.replay(first, args[0], workdir) == b"a" * 40
+    assert cache.replay(third, args[2], workdir) == b"c" * 40
+    total_size = sum(
+        blob.stat().st_size for blob in (tmp_path / "cache" / "blobs").iterdir()
+    )
+    assert total_size <= 250
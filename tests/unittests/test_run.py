@@ -0,0 +1,289 @@
+import asyncio
+import stat
+import subprocess
+import time
+import pytest
+from viashpy import _run
+from viashpy._docker import remove_labeled_containers
+from viashpy._run import (
+    _get_viash_version,
+    run_build_component,
+    run_build_component_async,
+    viash_run,
+    viash_run_async,
+)
+
+
+@pytest.fixture
+def version_calls_file(tmp_path):
+    return tmp_path / "version_calls"
+
+
+@pytest.fixture
+def number_of_version_calls(version_calls_file):
+    def wrapper():
+        if not version_calls_file.exists():
+            return 0
+        return len(version_calls_file.read_text().splitlines())
+
+    return wrapper
+
+
+@pytest.fixture
+def fake_viash(tmp_path, version_calls_file):
+    viash = tmp_path / "viash"
+    viash.write_text(
+        "#!/bin/sh\n"
+        f"echo called >> {version_calls_file}\n"
+        'echo "viash 0.9.0 (c) 2024 Data Intuitive"\n'
+    )
+    viash.chmod(viash.stat().st_mode | stat.S_IEXEC)
+    return viash
+
+
+@pytest.fixture(autouse=True)
+def clear_version_memo():
+    _run._viash_version_cache.clear()
+    yield
+    _run._viash_version_cache.clear()
+
+
+def test_get_viash_version_memoized(fake_viash, number_of_version_calls):
+    assert _get_viash_version(fake_viash) == (0, 9, 0)
+    assert _get_viash_version(fake_viash) == (0, 9, 0)
+    assert number_of_version_calls() == 1
+
+
+def test_get_viash_version_reuses_disk_cache(
+    fake_viash, number_of_version_calls, isolated_viashpy_cache
+):
+    assert _get_viash_version(fake_viash) == (0, 9, 0)
+    # Simulate a new process
+    _run._viash_version_cache.clear()
+    assert _get_viash_version(fake_viash) == (0, 9, 0)
+    assert number_of_version_calls() == 1
+    assert list((isolated_viashpy_cache / "viash_version").glob("*.json"))
+
+
+def test_get_viash_version_executable_changed(fake_viash, number_of_version_calls):
+    assert _get_viash_version(fake_viash) == (0, 9, 0)
+    _run._viash_version_cache.clear()
+    with fake_viash.open("a") as open_viash:
+        open_viash.write("# this changes the size of the executable\n")
+    assert _get_viash_version(fake_viash) == (0, 9, 0)
+    assert number_of_version_calls() == 2
+
+
+def test_get_viash_version_unresolvable_executable_not_cached(mocker):
+    mocked = mocker.patch(
+        "viashpy._run.check_output",
+        return_value=b"viash 0.8.2 (c) 2020 Data Intuitive",
+    )
+    assert _get_viash_version("non_existant_viash") == (0, 8, 2)
+    assert _get_viash_version("non_existant_viash") == (0, 8, 2)
+    assert mocked.call_count == 2
+    assert not _run._viash_version_cache
+
+
+@pytest.fixture
+def sleeping_executable(tmp_path):
+    executable = tmp_path / "component"
+    executable.write_text('#!/bin/sh\necho "start $1"\nsleep "$1"\necho "done $1"\n')
+    executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+    return executable
+
+
+def test_run_build_component_async_gather(sleeping_executable):
+    async def run_all():
+        return await asyncio.gather(
+            *(
+                run_build_component_async(sleeping_executable, ["0.5"], memory=None)
+                for _ in range(5)
+            )
+        )
+
+    start = time.perf_counter()
+    results = asyncio.run(run_all())
+    assert time.perf_counter() - start < 2.5
+    assert results == [b"start 0.5\ndone 0.5\n"] * 5
+
+
+def test_run_build_component_async_timeout(tmp_path):
+    executable = tmp_path / "component"
+    executable.write_text("#!/bin/sh\nexec sleep 10\n")
+    executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+    start = time.perf_counter()
+    with pytest.raises(subprocess.TimeoutExpired):
+        asyncio.run(run_build_component_async(executable, [], memory=None, timeout=0.2))
+    assert time.perf_counter() - start < 5
+
+
+def test_run_build_component_async_timeout_partial_output(tmp_path):
+    executable = tmp_path / "component"
+    executable.write_text("#!/bin/sh\necho started\nsleep 10\n")
+    executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+    start = time.perf_counter()
+    with pytest.raises(subprocess.TimeoutExpired) as e:
+        asyncio.run(run_build_component_async(executable, [], memory=None, timeout=0.5))
+    assert time.perf_counter() - start < 5
+    assert e.value.output == b"started\n"
+
+
+def test_run_build_component_timeout(tmp_path):
+    executable = tmp_path / "component"
+    executable.write_text("#!/bin/sh\necho started\nsleep 10\n")
+    executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+    start = time.perf_counter()
+    with pytest.raises(subprocess.TimeoutExpired) as e:
+        run_build_component(executable, [], memory=None, timeout=0.5)
+    assert time.perf_counter() - start < 5
+    assert e.value.output == b"started\n"
+
+
+def test_viash_run_timeout_labels_docker_container(mocker, tmp_path):
+    config = tmp_path / "config.vsh.yaml"
+    config.write_text("name: foo\n")
+    mocker.patch("viashpy._run._get_viash_version", return_value=(0, 9, 0))
+    mocker.patch("viashpy._run._setup_docker_image")
+    mocked_run = mocker.patch("viashpy._run._run_command", return_value=b"output")
+    assert viash_run(config, ["bar"], timeout=5) == b"output"
+    command = mocked_run.call_args.args[0]
+    label_mod = command[command.index("--") - 1]
+    assert label_mod.startswith(
+        ".engines[.type == 'docker'].run_args += '--label viashpy.run="
+    )
+    label = label_mod.split("--label ", 1)[1].rstrip("'")
+    on_kill = mocked_run.call_args.kwargs["on_kill"]
+    assert on_kill.func is remove_labeled_containers
+    assert on_kill.args == (label,)
+    assert mocked_run.call_args.kwargs["timeout"] == 5
+
+
+def test_viash_run_container_label(mocker, tmp_path):
+    config = tmp_path / "config.vsh.yaml"
+    config.write_text("name: foo\n")
+    mocker.patch("viashpy._run._get_viash_version", return_value=(0, 9, 0))
+    mocker.patch("viashpy._run._setup_docker_image")
+    mocked_run = mocker.patch("viashpy._run._run_command", return_value=b"output")
+    viash_run(config, ["bar"], container_label="viashpy.run=abc")
+    command = mocked_run.call_args.args[0]
+    assert command[command.index("--") - 1] == (
+        ".engines[.type == 'docker'].run_args += '--label viashpy.run=abc'"
+    )
+    assert mocked_run.call_args.kwargs["on_kill"] is None
+    viash_run(config, ["bar"], container_label="viashpy.run=abc", timeout=5)
+    assert mocked_run.call_args.kwargs["on_kill"].args == ("viashpy.run=abc",)
+
+
+@pytest.fixture
+def fake_viash_docker_run(tmp_path):
+    viash = tmp_path / "viash"
+    viash.write_text(
+        "#!/bin/sh\n"
+        'if [ "$1" = "--version" ]; then\n'
+        '  echo "viash 0.9.0 (c) 2024 Data Intuitive"\n'
+        "  exit 0\n"
+        "fi\n"
+        'for arg in "$@"; do [ "$arg" = "---setup" ] && exit 0; done\n'
+        "exec sleep 30\n"
+    )
+    viash.chmod(viash.stat().st_mode | stat.S_IEXEC)
+    return viash
+
+
+def test_viash_run_async_timeout_removes_container(
+    tmp_path, fake_viash_docker_run, fake_docker_cli
+):
+    config = tmp_path / "config.vsh.yaml"
+    config.write_text("name: foo\n")
+    with pytest.raises(subprocess.TimeoutExpired):
+        asyncio.run(
+            viash_run_async(
+                config,
+                ["bar"],
+                engine="docker",
+                viash_location=fake_viash_docker_run,
+                timeout=0.5,
+            )
+        )
+    ps_call, rm_call = fake_docker_cli.calls()
+    assert ps_call[:4] == ["ps", "--all", "--quiet", "--filter"]
+    assert ps_call[4].startswith("label=viashpy.run=")
+    assert rm_call == ["rm", "--force", "fake_container_id"]
+
+
+@pytest.fixture
+def executable_with_container(tmp_path, fake_docker_cli):
+    # Like the script of a built component, stop the container on SIGTERM.
+    executable = tmp_path / "component"
+    executable.write_text(
+        "#!/bin/sh\n"
+        "trap 'docker rm --force fake_container_id; exit 143' TERM\n"
+        "echo started\n"
+        "sleep 30 &\n"
+        "wait\n"
+    )
+    executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+    return executable
+
+
+def test_run_build_component_timeout_stops_container(
+    executable_with_container, fake_docker_cli
+):
+    with pytest.raises(subprocess.TimeoutExpired) as e:
+        run_build_component(executable_with_container, [], memory=None, timeout=0.5)
+    assert e.value.output == b"started\n"
+    assert fake_docker_cli.calls() == [["rm", "--force", "fake_container_id"]]
+
+
+def test_run_build_component_async_timeout_stops_container(
+    executable_with_container, fake_docker_cli
+):
+    with pytest.raises(subprocess.TimeoutExpired):
+        asyncio.run(
+            run_build_component_async(
+                executable_with_container, [], memory=None, timeout=0.5
+            )
+        )
+    assert fake_docker_cli.calls() == [["rm", "--force", "fake_container_id"]]
+
+
+def test_run_build_component_async_failure(tmp_path):
+    executable = tmp_path / "component"
+    executable.write_text("#!/bin/sh\necho 'failing'\nexit 3\n")
+    executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+    with pytest.raises(subprocess.CalledProcessError) as e:
+        asyncio.run(run_build_component_async(executable, [], memory=None))
+    assert e.value.returncode == 3
+    assert e.value.output == b"failing\n"
+
+
+def test_viash_run_async_command(mocker, tmp_path):
+    config = tmp_path / "config.vsh.yaml"
+    config.write_text("name: foo\n")
+    mocker.patch("viashpy._run._get_viash_version", return_value=(0, 9, 0))
+    mocked_run = mocker.patch(
+        "viashpy._run._run_command_async", return_value=b"Some dummy output"
+    )
+    output = asyncio.run(
+        viash_run_async(config, ["bar"], cpus=2, engine="native", timeout=5)
+    )
+    assert output == b"Some dummy output"
+    mocked_run.assert_called_once_with(
+        [
+            "viash",
+            "run",
+            config,
+            "--engine",
+            "native",
+            "-c",
+            ".engines[.type == 'docker'].target_tag := 'test'",
+            "--cpus",
+            "2",
+            "--",
+            "bar",
+        ],
+        stderr=subprocess.STDOUT,
+        timeout=5,
+        on_kill=None,
+    )
@@ -0,0 +1,108 @@
+from viashpy.utils import TarArchive
+from viashpy import _tar_index
+import gzip
+import io
+import tarfile
+import pytest
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    return tmp_path / "index"
+
+
+def add_file(open_tarfile, name, content):
+    member = tarfile.TarInfo(name)
+    member.size = len(content)
+    member.mode = 0o644
+    open_tarfile.addfile(member, io.BytesIO(content))
+
+
+@pytest.fixture
+def many_files_archive(tmp_path, compression_extension):
+    tar_path = tmp_path / f"archive.tar.{compression_extension}"
+    with tarfile.open(tar_path, f"w:{compression_extension}") as open_tarfile:
+        for i in range(300):
+            add_file(open_tarfile, f"data/{i // 100}/{i}.txt", f"content {i}".encode())
+        symlink = tarfile.TarInfo("data/link.txt")
+        symlink.type = tarfile.SYMTYPE
+        symlink.linkname = "0/1.txt"
+        open_tarfile.addfile(symlink)
+    return tar_path
+
+
+@pytest.fixture
+def multi_member_gzip_archive(tmp_path):
+    """
+    A tarfile compressed as one gzip member per tar member, like 'bgzip' does.
+    """
+    tar_bytes = io.BytesIO()
+    with tarfile.open(fileobj=tar_bytes, mode="w") as open_tarfile:
+        for i in range(50):
+            add_file(open_tarfile, f"{i}.bin", bytes([i]) * 5000)
+    tar_bytes = tar_bytes.getvalue()
+    tar_path = tmp_path / "multi_member.tar.gz"
+    with tar_path.open("wb") as open_archive:
+        for start in range(0, len(tar_bytes), 10240):
+            open_archive.write(gzip.compress(tar_bytes[start : start + 10240], mtime=0))
+    return tar_path
+
+
+def test_tar_archive_read(many_files_archive, index_dir):
+    archive = TarArchive(many_files_archive, index_dir=index_dir)
+    assert len(archive) == 301
+    assert "data/2/250.txt" in archive
+    assert archive.read("data/2/250.txt") == b"content 250"
+    assert archive.read("data/0/3.txt") == b"content 3"
+    assert archive.getmember("data/link.txt").issym()
+    with pytest.raises(KeyError, match="nonexistent is not a member of"):
+        archive.read("nonexistent")
+
+
+def test_tar_archive_extract_subset(many_files_archive, index_dir, tmp_path):
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    archive = TarArchive(many_files_archive, index_dir=index_dir)
+    extracted = archive.extract(
+        output_dir, include=["data/1/*", "data/link.txt"], exclude="*/15?.txt"
+    )
+    assert len(extracted) == 91
+    assert (output_dir / "data" / "1" / "100.txt").read_text() == "content 100"
+    assert not (output_dir / "data" / "1" / "150.txt").exists()
+    assert not (output_dir / "data" / "0").exists()
+    assert (output_dir / "data" / "link.txt").is_symlink()
+
+
+def test_tar_archive_reuses_index(many_files_archive, index_dir, mocker):
+    TarArchive(many_files_archive, index_dir=index_dir)
+    build_index = mocker.spy(_tar_index, "_build_index")
+    archive = TarArchive(many_files_archive, index_dir=index_dir)
+    assert build_index.call_count == 0
+    assert archive.read("data/1/199.txt") == b"content 199"
+    # Changing the archive invalidates the index
+    with tarfile.open(many_files_archive, "w") as open_tarfile:
+        add_file(open_tarfile, "other.txt", b"other")
+    archive = TarArchive(many_files_archive, index_dir=index_dir)
+    assert build_index.call_count == 1
+    assert archive.getnames() == ["other.txt"]
+    assert archive.compression is None
+    assert archive.read("other.txt") == b"other"
+
+
+def test_tar_archive_multi_member_gzip_seek_points(
+    multi_member_gzip_archive, index_dir, mocker
+):
+    archive = TarArchive(multi_member_gzip_archive, index_dir=index_dir)
+    assert len(archive._seek_points) > 10
+    skip = mocker.spy(_tar_index._DecompressedStream, "skip")
+    assert archive.read("42.bin") == bytes([42]) * 5000
+    # Decompression starts at the seek point right before the member
+    [(_, skipped)] = [call.args for call in skip.call_args_list]
+    assert skipped < 10240
+
+
+def test_tar_archive_not_a_tarfile(tmp_path, index_dir):
+    not_a_tarfile = tmp_path / "foo.tar.gz"
+    not_a_tarfile.write_bytes(gzip.compress(b"foo" * 1000))
+    with pytest.raises(ValueError, match=r"foo.tar.gz is not a tarfile\."):
+        TarArchive(not_a_tarfile, index_dir=index_dir)
@@ -0,0 +1,87 @@
+import stat
+import sys
+import pytest
+from viashpy import _run
+from viashpy._run import run_build_component, viash_run
+from viashpy._timing import PhaseRecorder
+
+
+@pytest.fixture(autouse=True)
+def clear_version_memo():
+    _run._viash_version_cache.clear()
+    yield
+    _run._viash_version_cache.clear()
+
+
+@pytest.fixture
+def memory_hungry_executable(tmp_path):
+    executable = tmp_path / "component"
+    executable.write_text(
+        f"#!{sys.executable}\n"
+        "data = bytearray(64 * 1024 * 1024)\n"
+        "total = sum(range(2_000_000))\n"
+        "print('done')\n"
+    )
+    executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+    return executable
+
+
+def test_run_build_component_records_phase(memory_hungry_executable):
+    recorder = PhaseRecorder()
+    output = run_build_component(
+        memory_hungry_executable, [], memory=None, recorder=recorder
+    )
+    assert output == b"done\n"
+    [phase] = recorder.phases
+    assert phase.name == "run"
+    assert phase.wall_time > 0
+    assert phase.cpu_user + phase.cpu_system > 0
+    assert phase.max_rss_bytes >= 64 * 1024 * 1024
+
+
+def test_run_build_component_records_failed_and_streamed_runs(tmp_path):
+    executable = tmp_path / "component"
+    executable.write_text("#!/bin/sh\necho 'line 1'\necho 'line 2'\nexit $1\n")
+    executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+    recorder = PhaseRecorder()
+    streamed = run_build_component(
+        executable, ["0"], memory=None, stream=True, recorder=recorder
+    )
+    assert not recorder.phases
+    assert list(streamed) == [b"line 1\n", b"line 2\n"]
+    with pytest.raises(_run.CalledProcessError) as e:
+        run_build_component(executable, ["1"], memory=None, recorder=recorder)
+    assert e.value.output == b"line 1\nline 2\n"
+    assert [phase.name for phase in recorder.phases] == ["run", "run"]
+    assert all(phase.max_rss_bytes for phase in recorder.phases)
+
+
+@pytest.mark.parametrize(
+    "engine, expected_phases",
+    [
+        ("native", ["version_probe", "run"]),
+        ("docker", ["version_probe", "setup", "run"]),
+    ],
+)
+def test_viash_run_records_phases(fake_viash_cli, tmp_path, engine, expected_phases):
+    config = tmp_path / "config.vsh.yaml"
+    config.write_text("name: foo\n")
+    recorder = PhaseRecorder()
+    output = viash_run(
+        config,
+        ["bar"],
+        engine=engine,
+        viash_location=fake_viash_cli.location,
+        recorder=recorder,
+    )
+    assert output == b"viash run ran with bar\n"
+    assert [phase.name for phase in recorder.phases] == expected_phases
+    assert recorder.to_json()[-1]["cpu_user"] is not None
+    report = recorder.format().splitlines()
+    assert report[0].split() == ["phase", "wall", "(s)", "user", "(s)", "sys"] + [
+        "(s)",
+        "max",
+        "RSS",
+        "(MiB)",
+    ]
+    assert [line.split()[0] for line in report[1:]] == expected_phases
@@ -1,5 +1,8 @@
 from viashpy.utils import extract_tar
+import io
+import os
 import shutil
+import tarfile
 import pytest
 from pathlib import Path
 
@@ -96,3 +99,105 @@ def test_extract_tarfile_output_directory_contains_content_raises(
     msg = r"^Tarfile would have been unpacked to .*already_contains_dummy/dummy, but a file or directory already exists at this location\."
     with pytest.raises(FileExistsError, match=msg):
         extract_tar(tarfile_mixed_contents, temp_output_folder)
+
+
+@pytest.mark.parametrize("max_workers", [None, 1])
+def test_extract_tar_stream(tmp_path, tarfile_mixed_contents, max_workers):
+    temp_output_folder = tmp_path / "test_extract_tar_output"
+    temp_output_folder.mkdir()
+    extracted_tar = extract_tar(
+        tarfile_mixed_contents,
+        temp_output_folder,
+        stream=True,
+        max_workers=max_workers,
+    )
+    assert extracted_tar == temp_output_folder / "dummy"
+    assert (extracted_tar / "bar" / "foo.txt").read_text() == "This is a test file."
+    assert (extracted_tar / "lorem.txt").read_text() == "ipsum"
+    # No temporary directories are left behind
+    assert list(temp_output_folder.iterdir()) == [extracted_tar]
+
+
+def test_extract_tar_stream_one_root_file(tmp_path, tarfile_with_one_root_file):
+    temp_output_folder = tmp_path / "test_extract_tar_output"
+    temp_output_folder.mkdir()
+    extracted_tar = extract_tar(
+        tarfile_with_one_root_file, temp_output_folder, stream=True
+    )
+    assert extracted_tar == temp_output_folder / "dummy"
+    assert (extracted_tar / "foo.txt").read_text() == "This is a test file."
+
+
+def test_extract_tar_stream_many_files_and_links(tmp_path):
+    source = tmp_path / "source" / "root"
+    (source / "sub").mkdir(parents=True)
+    for i in range(200):
+        (source / "sub" / f"{i}.txt").write_text(str(i))
+    large_file = source / "large.bin"
+    large_file.write_bytes(os.urandom(3 * 1024 * 1024))
+    large_file.chmod(0o755)
+    (source / "link.txt").symlink_to("sub/1.txt")
+    tar_path = tmp_path / "archive.tar.gz"
+    with tarfile.open(tar_path, "w:gz") as open_tarfile:
+        open_tarfile.add(source, arcname="root")
+        open_tarfile.add(source / "sub" / "2.txt", arcname="root/hardlink.txt")
+        hardlink = open_tarfile.gettarinfo(source / "sub" / "3.txt", "root/hard.txt")
+        hardlink.type = tarfile.LNKTYPE
+        hardlink.linkname = "root/sub/3.txt"
+        open_tarfile.addfile(hardlink)
+    output_folder = tmp_path / "output"
+    output_folder.mkdir()
+
+    extracted_tar = extract_tar(tar_path, output_folder, stream=True, max_workers=4)
+    assert extracted_tar == output_folder / "archive"
+    for i in range(200):
+        assert (extracted_tar / "sub" / f"{i}.txt").read_text() == str(i)
+    assert (extracted_tar / "large.bin").read_bytes() == large_file.read_bytes()
+    assert os.access(extracted_tar / "large.bin", os.X_OK)
+    assert (extracted_tar / "link.txt").is_symlink()
+    assert (extracted_tar / "link.txt").read_text() == "1"
+    assert (extracted_tar / "hard.txt").read_text() == "3"
+    assert (extracted_tar / "hardlink.txt").read_text() == "2"
+
+
+def test_extract_tar_stream_not_a_tarfile_raises(tmp_path):
+    tmp_file = tmp_path / "foo.tar.gz"
+    tmp_file.write_text("foo")
+    output_folder = tmp_path / "output"
+    output_folder.mkdir()
+    with pytest.raises(ValueError, match=r"^.*foo.tar.gz is not a tarfile\."):
+        extract_tar(tmp_file, output_folder, stream=True)
+    assert list(output_folder.iterdir()) == []
+
+
+def test_extract_tar_stream_unsafe_member_raises(tmp_path):
+    tar_path = tmp_path / "unsafe.tar"
+    with tarfile.open(tar_path, "w") as open_tarfile:
+        member = tarfile.TarInfo("../escaped.txt")
+        open_tarfile.addfile(member, io.BytesIO(b""))
+    output_folder = tmp_path / "output"
+    output_folder.mkdir()
+    with pytest.raises(tarfile.TarError):
+        extract_tar(tar_path, output_folder, stream=True)
+    assert not (tmp_path / "escaped.txt").exists()
+    assert list(output_folder.iterdir()) == []
+
+
+@pytest.mark.parametrize(
+    "extract_kwargs", [{}, {"stream": True}, {"cache": True}], ids=str
+)
+def test_extract_tar_dot_prefixed_members(tmp_path, extract_kwargs):
+    # Like 'tar -C source -czf dummy.tar.gz .'
+    source = tmp_path / "source"
+    (source / "data").mkdir(parents=True)
+    (source / "data" / "x.txt").write_text("x")
+    tar_path = tmp_path / "dummy.tar.gz"
+    with tarfile.open(tar_path, "w:gz") as open_tarfile:
+        open_tarfile.add(str(source), arcname=".")
+    with tarfile.open(tar_path) as open_tarfile:
+        assert open_tarfile.getnames() == [".", "./data", "./data/x.txt"]
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    extracted_tar = extract_tar(tar_path, output_dir, **extract_kwargs)
+    assert (extracted_tar / "data" / "x.txt").read_text() == "x"
+    assert [path.name for path in extracted_tar.iterdir()] == ["data"]
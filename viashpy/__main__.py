@@ -0,0 +1,160 @@
+from __future__ import annotations
+from pathlib import Path
+import argparse
+import logging
+import re
+import shutil
+import sys
+import tempfile
+
+
+def _memory_bytes(value: str) -> int:
+    from ._resources import memory_to_bytes
+
+    try:
+        return memory_to_bytes(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from e
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="viashpy",
+        description="Tools to interact with viash components using python.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    test_parser = subparsers.add_parser(
+        "test",
+        help="Build and test all components in a directory.",
+        description="Build all components in a directory once (in parallel) and run "
+        "their python test scripts with pytest, as many at the same time as the CPUs "
+        "and memory declared by the components allow. The results are combined into "
+        "a single JUnit XML file. Arguments after '--' are passed to pytest.",
+    )
+    test_parser.add_argument(
+        "src",
+        nargs="?",
+        default=".",
+        help="Directory to search for viash configs (default: the current directory).",
+    )
+    test_parser.add_argument(
+        "-q",
+        "--query",
+        help="Only test the components of which the name ('namespace/name') "
+        "matches this regular expression.",
+    )
+    test_parser.add_argument(
+        "--engine",
+        help="Engine (or platform, for viash < 0.9) to build the components for "
+        "(default: the first engine of each component).",
+    )
+    test_parser.add_argument(
+        "--viash",
+        default="viash",
+        help="Location of the viash executable (default: 'viash').",
+    )
+    test_parser.add_argument(
+        "--junitxml",
+        default="viashpy-test-results.xml",
+        help="Location of the combined JUnit XML file (default: viashpy-test-results.xml).",
+    )
+    test_parser.add_argument(
+        "--host-cpus",
+        type=int,
+        help="Number of CPUs that the tests may use at the same time "
+        "(default: the CPUs of the host).",
+    )
+    test_parser.add_argument(
+        "--host-memory",
+        type=_memory_bytes,
+        help="Amount of memory (e.g. '16GB') that the tests may use at the same time "
+        "(default: the memory of the host).",
+    )
+    test_parser.add_argument(
+        "--build-workers",
+        type=int,
+        help="Number of components to build at the same time "
+        "(default: the number of CPUs of the host).",
+    )
+    test_parser.add_argument(
+        "--work-dir",
+        help="Directory in which the tests are run. By default, a temporary directory "
+        "is used, which is removed when all tests pass.",
+    )
+    test_parser.add_argument(
+        "--keep-files",
+        action="store_true",
+        help="Do not remove the temporary directory in which the tests are run.",
+    )
+    test_parser.set_defaults(func=_test)
+    return parser
+
+
+def _test(args, pytest_args: list[str]) -> int:
+    from ._build import ExecutableCache
+    from ._cache import user_cache_dir
+    from ._namespace_test import run_namespace_tests
+    from ._resources import ResourcePool
+    from .index import ConfigIndex
+
+    logger = logging.getLogger("viashpy")
+    if not Path(args.src).is_dir():
+        logger.error("%s is not a directory.", args.src)
+        return 2
+    components = list(ConfigIndex.build(args.src))
+    if args.query:
+        query = re.compile(args.query)
+        components = [comp for comp in components if query.search(comp.full_name)]
+    if not components:
+        logger.info("No components found in %s.", args.src)
+        return 0
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="viashpy_test_")
+    results = run_namespace_tests(
+        components,
+        work_dir,
+        args.junitxml,
+        executable_cache=ExecutableCache(user_cache_dir("executables")),
+        viash_location=args.viash,
+        engine=args.engine,
+        resource_pool=ResourcePool(args.host_cpus, args.host_memory),
+        build_workers=args.build_workers,
+        pytest_args=pytest_args,
+    )
+    failed = [result for result in results if result.failed]
+    passed_tests = sum(
+        result.count("tests")
+        - result.count("failures")
+        - result.count("errors")
+        - result.count("skipped")
+        for result in results
+    )
+    logger.info(
+        "%d of %d components failed, %d tests passed. Results were written to %s.",
+        len(failed),
+        len(results),
+        passed_tests,
+        args.junitxml,
+    )
+    if args.work_dir or args.keep_files or failed:
+        logger.info("The tests were run in %s.", work_dir)
+    else:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return 1 if failed else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Entry point of 'python -m viashpy' and the 'viashpy' command.
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    pytest_args = []
+    if "--" in argv:
+        separator = argv.index("--")
+        argv, pytest_args = argv[:separator], argv[separator + 1 :]
+    args = _build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    return args.func(args, pytest_args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
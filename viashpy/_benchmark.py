@@ -0,0 +1,125 @@
+from __future__ import annotations
+from pathlib import Path
+from ._cache import file_lock, read_json, user_cache_dir, write_json_atomic
+from ._timing import Phase
+import hashlib
+import statistics
+
+# The measurements of a run of a component, in the order in which they are reported.
+METRICS = ("wall_time", "cpu_time", "max_rss_bytes")
+
+_METRIC_FORMATS = {
+    "wall_time": ("wall (s)", lambda value: f"{value:.3f}"),
+    "cpu_time": ("CPU (s)", lambda value: f"{value:.3f}"),
+    "max_rss_bytes": ("max RSS (MiB)", lambda value: f"{value / 1024**2:.1f}"),
+}
+
+
+def summarize(values: list[float]) -> dict:
+    """
+    Robust statistics of a list of measurements: the median, the interquartile range,
+    the minimum and the maximum.
+    """
+    if len(values) > 1:
+        first_quartile, _, third_quartile = statistics.quantiles(values, n=4)
+    else:
+        first_quartile = third_quartile = values[0]
+    return {
+        "median": statistics.median(values),
+        "iqr": third_quartile - first_quartile,
+        "min": min(values),
+        "max": max(values),
+    }
+
+
+def measurements_from_phase(phase: Phase) -> dict:
+    """
+    The measurements of a single run of a component, from the phase that ran it.
+    Measurements that are not available (e.g. the CPU time on platforms without
+    'os.wait4') are left out.
+    """
+    measurements = {"wall_time": phase.wall_time}
+    if phase.cpu_user is not None:
+        measurements["cpu_time"] = phase.cpu_user + phase.cpu_system
+    if phase.max_rss_bytes is not None:
+        measurements["max_rss_bytes"] = phase.max_rss_bytes
+    return measurements
+
+
+class BenchmarkResult:
+    """
+    The measurements of repeated runs of a component, see 'benchmark_component'.
+    """
+
+    def __init__(self, name: str, runs: list[dict]):
+        self.name = name
+        self.runs = runs
+        self.statistics = {
+            metric: summarize([run[metric] for run in runs])
+            for metric in METRICS
+            if runs and all(metric in run for run in runs)
+        }
+
+    def to_json(self) -> dict:
+        return {"rounds": len(self.runs), "statistics": self.statistics}
+
+    def regressions(self, baseline: dict, threshold: float) -> list[str]:
+        """
+        Compare the results against a baseline (as returned by 'to_json').
+        A metric regressed when its median exceeds the median of the baseline
+        by more than 'threshold' (a fraction) and by more than the interquartile
+        range of the baseline, so that noisy measurements do not cause failures.
+        """
+        regressions = []
+        for metric, stats in self.statistics.items():
+            baseline_stats = baseline.get("statistics", {}).get(metric)
+            if baseline_stats is None:
+                continue
+            limit = max(
+                baseline_stats["median"] * (1 + threshold),
+                baseline_stats["median"] + baseline_stats["iqr"],
+            )
+            if stats["median"] > limit:
+                label, format_value = _METRIC_FORMATS[metric]
+                regressions.append(
+                    f"{label}: median {format_value(stats['median'])} exceeds "
+                    f"{format_value(limit)} (baseline median "
+                    f"{format_value(baseline_stats['median'])}, "
+                    f"IQR {format_value(baseline_stats['iqr'])})"
+                )
+        return regressions
+
+    def format(self) -> str:
+        lines = [f"{'metric':<16}{'median':>10}{'IQR':>10}{'min':>10}{'max':>10}"]
+        for metric, stats in self.statistics.items():
+            label, format_value = _METRIC_FORMATS[metric]
+            lines.append(
+                f"{label:<16}"
+                + "".join(
+                    f"{format_value(stats[key]):>10}"
+                    for key in ("median", "iqr", "min", "max")
+                )
+            )
+        return "\n".join(lines)
+
+
+class BenchmarkBaseline:
+    """
+    A json file with the results of benchmarks, keyed on the name of the benchmark.
+    Updates are done while holding a lock, so that multiple processes
+    (e.g. pytest-xdist workers) can update the same file.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+
+    def get(self, name: str) -> dict | None:
+        return (read_json(self.path) or {}).get(name)
+
+    def update(self, result: BenchmarkResult) -> None:
+        # Do not leave lock files next to the baseline, which is usually in the source tree.
+        path_hash = hashlib.sha256(str(self.path.resolve()).encode()).hexdigest()
+        with file_lock(user_cache_dir("benchmark_locks") / f"{path_hash}.lock"):
+            baselines = read_json(self.path) or {}
+            baselines[result.name] = result.to_json()
+            write_json_atomic(self.path, dict(sorted(baselines.items())))
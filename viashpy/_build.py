@@ -0,0 +1,175 @@
+from __future__ import annotations
+from subprocess import CalledProcessError
+from pathlib import Path
+from typing import Callable
+from .config import (
+    config_content_hash,
+    config_component_name,
+    read_viash_config_cached,
+)
+from .types import Engine, Platform
+from ._cache import file_lock, read_json, write_json_atomic
+from ._run import viash_build, _get_viash_version
+import hashlib
+import logging
+import shutil
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+# Only keep the end of the output of a failed build, it is replayed for every
+# other run that uses the same config.
+_MAX_STORED_BUILD_OUTPUT = 64 * 1024
+
+
+class DockerBuildRegistry:
+    """
+    Keeps track of the docker images that were built during a test session.
+
+    The registry is stored in a directory that is shared between all
+    processes of a session (e.g. pytest-xdist workers). For each key, exactly
+    one process performs the build while holding a lock; the others wait for
+    the lock to be released and reuse the outcome. A failed build is recorded
+    as well, so that other runs with the same config fail immediately.
+    """
+
+    def __init__(self, registry_dir: str | Path):
+        self.registry_dir = Path(registry_dir)
+        self.registry_dir.mkdir(parents=True, exist_ok=True)
+        self._known_built = set()
+
+    @staticmethod
+    def key(config: str | Path, *identifiers) -> str:
+        hasher = hashlib.sha256(config_content_hash(config).encode())
+        for identifier in identifiers:
+            hasher.update(b"\0" + str(identifier).encode())
+        return hasher.hexdigest()
+
+    def ensure_built(self, key: str, build: Callable[[], object]) -> None:
+        if key in self._known_built:
+            return
+        state_file = self.registry_dir / f"{key}.json"
+        with file_lock(self.registry_dir / f"{key}.lock"):
+            state = read_json(state_file)
+            if state is None:
+                try:
+                    build()
+                except CalledProcessError as e:
+                    output = e.output or b""
+                    write_json_atomic(
+                        state_file,
+                        {
+                            "status": "failed",
+                            "returncode": e.returncode,
+                            "cmd": list(map(str, e.cmd)),
+                            "output": output[-_MAX_STORED_BUILD_OUTPUT:].decode(
+                                "utf-8", errors="replace"
+                            ),
+                        },
+                    )
+                    raise
+                state = {"status": "built"}
+                write_json_atomic(state_file, state)
+        if state["status"] == "failed":
+            logger.debug(
+                "Not building docker image again because the build failed earlier in this session."
+            )
+            raise CalledProcessError(
+                state["returncode"], state["cmd"], output=state["output"].encode()
+            )
+        self._known_built.add(key)
+
+
+class ExecutableCache:
+    """
+    Cache of components that were built with 'viash build', so that
+    running a component does not require 'viash run' (which starts a JVM)
+    for every call.
+
+    Builds are keyed on the contents of the config and its resources, the viash
+    version and the engine (or platform). A component is only rebuilt when one
+    of these changes. When the config or its resources changed, the previous build
+    of the config for the same engine (or platform) is removed.
+    The cache can be shared between processes (e.g. pytest-xdist workers)
+    and sessions.
+    """
+
+    def __init__(self, cache_dir: str | Path):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._known_builds = {}
+
+    def get(
+        self,
+        config: str | Path,
+        *,
+        engine: Engine | None = None,
+        platform: Platform | None = None,
+        viash_location: str | Path = "viash",
+    ) -> Path:
+        """
+        Return the location of the built executable for 'config',
+        building the component first when needed.
+        """
+        config = Path(config)
+        viash_version = _get_viash_version(viash_location)
+        identifiers = (viash_location, viash_version, engine, platform)
+        key = DockerBuildRegistry.key(config, *identifiers)
+        known_build = self._known_builds.get(key)
+        # The build can have been removed by another process since.
+        if known_build is not None and known_build.is_file():
+            return known_build
+        build_dir = self.cache_dir / key
+        executable = build_dir / config_component_name(read_viash_config_cached(config))
+        built = False
+        with file_lock(self.cache_dir / f"{key}.lock"):
+            if not build_dir.is_dir():
+                self._build(config, build_dir, engine, platform, viash_location)
+                built = True
+        if built:
+            # Only after releasing the lock of the new build, so that processes
+            # that remove each other's builds do not wait for each other.
+            self._remove_outdated_build(config, identifiers, key)
+        if not executable.is_file():
+            raise FileNotFoundError(
+                f"Building {config} did not produce the expected executable {executable}."
+            )
+        self._known_builds[key] = executable
+        return executable
+
+    def _build(self, config, build_dir, engine, platform, viash_location):
+        temp_build_dir = Path(
+            tempfile.mkdtemp(dir=self.cache_dir, prefix=f".{build_dir.name}.")
+        )
+        try:
+            viash_build(
+                config,
+                temp_build_dir,
+                engine=engine,
+                platform=platform,
+                viash_location=viash_location,
+            )
+            # Make the build visible to other processes in one step.
+            temp_build_dir.rename(build_dir)
+        except BaseException:
+            shutil.rmtree(temp_build_dir, ignore_errors=True)
+            raise
+
+    def _remove_outdated_build(self, config: Path, identifiers: tuple, key: str):
+        """
+        Remove the previous build of 'config' with the same viash executable,
+        viash version and engine (or platform), if any. Builds for other engines
+        are kept. The build is removed while holding its lock, so that it is not
+        removed while another process is checking whether it exists.
+        """
+        hasher = hashlib.sha256(str(config.resolve()).encode())
+        for identifier in identifiers:
+            hasher.update(b"\0" + str(identifier).encode())
+        latest_build_file = self.cache_dir / f"{hasher.hexdigest()}.latest.json"
+        latest_build = read_json(latest_build_file)
+        write_json_atomic(latest_build_file, {"key": key})
+        if latest_build and latest_build["key"] != key:
+            outdated_key = latest_build["key"]
+            logger.debug("Removing outdated build %s", outdated_key)
+            with file_lock(self.cache_dir / f"{outdated_key}.lock"):
+                shutil.rmtree(self.cache_dir / outdated_key, ignore_errors=True)
@@ -0,0 +1,83 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from pathlib import Path
+import hashlib
+import json
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+    import msvcrt
+
+
+def user_cache_dir(*parts: str) -> Path:
+    """
+    Return (and create) a directory in the persistent viashpy cache.
+    The location can be changed by setting the 'VIASHPY_CACHE_DIR'
+    environment variable, otherwise the XDG cache directory is used.
+    """
+    base = os.environ.get("VIASHPY_CACHE_DIR")
+    if not base:
+        xdg_cache = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+        base = Path(xdg_cache) / "viashpy"
+    result = Path(base).joinpath(*parts)
+    result.mkdir(parents=True, exist_ok=True)
+    return result
+
+
+@contextmanager
+def file_lock(lock_path: str | Path):
+    """
+    Hold an exclusive, cross-process lock on 'lock_path' for the duration
+    of the context. The lock file is created when it does not exist yet.
+    """
+    lock_path = Path(lock_path)
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a+b") as open_lock_file:
+        if fcntl:
+            fcntl.flock(open_lock_file.fileno(), fcntl.LOCK_EX)
+        else:  # pragma: no cover
+            msvcrt.locking(open_lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(open_lock_file.fileno(), fcntl.LOCK_UN)
+            else:  # pragma: no cover
+                open_lock_file.seek(0)
+                msvcrt.locking(open_lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def read_json(path: str | Path):
+    try:
+        with open(path, "r") as open_json:
+            return json.load(open_json)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_json_atomic(path: str | Path, data) -> None:
+    """
+    Write 'data' as json to 'path', making sure that readers in other
+    processes never observe a partially written file.
+    """
+    path = Path(path)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "w") as open_temp_file:
+            json.dump(data, open_temp_file)
+        os.replace(temp_path, path)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+
+
+def hash_file(path: str | Path) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as open_file:
+        for chunk in iter(lambda: open_file.read(1 << 20), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
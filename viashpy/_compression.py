@@ -0,0 +1,226 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from pathlib import Path
+from subprocess import Popen, PIPE
+from typing import BinaryIO, Callable, Iterator
+import bz2
+import gzip
+import lzma
+import shutil
+import sys
+import tarfile
+import tempfile
+import zlib
+
+try:
+    from compression import zstd
+except ImportError:
+    try:
+        import zstandard as zstd
+    except ImportError:
+        zstd = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+# Magic bytes at the start of compressed files
+_COMPRESSION_MAGIC = {
+    "gz": b"\x1f\x8b",
+    "bz2": b"BZh",
+    "xz": b"\xfd7zXZ\x00",
+    "zst": b"\x28\xb5\x2f\xfd",
+    "lz4": b"\x04\x22\x4d\x18",
+}
+
+# Single suffixes that are used instead of '.tar.<compression>'
+TAR_SHORT_SUFFIXES = {
+    ".tgz",
+    ".taz",
+    ".tbz",
+    ".tbz2",
+    ".tb2",
+    ".txz",
+    ".tzst",
+    ".tlz4",
+}
+
+# External tools that decompress to stdout, in order of preference. Tools that
+# are listed first use multiple threads, the others still decompress in parallel
+# with reading the archive.
+_DECOMPRESSION_TOOLS = {
+    "gz": [["pigz", "-dc"]],
+    "bz2": [["lbzip2", "-dc"], ["pbzip2", "-dc"]],
+    "xz": [["xz", "-dc", "-T0"]],
+    "zst": [["zstd", "-dcq"]],
+    "lz4": [["lz4", "-dc"]],
+}
+
+
+# Compression formats that can be written, and the suffixes of the archives that use them
+COMPRESSION_SUFFIXES = {
+    "gz": (".tar.gz", ".tgz"),
+    "bz2": (".tar.bz2", ".tbz2", ".tbz"),
+    "xz": (".tar.xz", ".txz"),
+    "zst": (".tar.zst", ".tzst"),
+}
+
+
+def compression_from_suffix(path: str | Path) -> str | None:
+    """
+    Return the compression that is implied by the suffix of an archive,
+    None for '.tar' files. Raises a ValueError for other suffixes.
+    """
+    name = Path(path).name.lower()
+    for compression, suffixes in COMPRESSION_SUFFIXES.items():
+        if name.endswith(suffixes):
+            return compression
+    if name.endswith(".tar"):
+        return None
+    raise ValueError(
+        f"Could not determine the compression for {path} from its suffix, use one of "
+        f"'.tar', {', '.join(repr(s) for suffixes in COMPRESSION_SUFFIXES.values() for s in suffixes)}."
+    )
+
+
+def block_compressor(compression: str, level: int | None = None) -> Callable | None:
+    """
+    Return a function that compresses a block of data into a complete compressed
+    member. Concatenated members form a valid compressed file, so blocks can be
+    compressed in parallel. Returns None when the required python package is
+    not available.
+    """
+    if compression == "gz":
+        level = 6 if level is None else level
+        return lambda block: gzip.compress(block, compresslevel=level, mtime=0)
+    if compression == "bz2":
+        level = 9 if level is None else level
+        return lambda block: bz2.compress(block, compresslevel=level)
+    if compression == "xz":
+        level = 6 if level is None else level
+        return lambda block: lzma.compress(block, preset=level)
+    if compression == "zst" and zstd is not None:
+        level = 3 if level is None else level
+        if hasattr(zstd.ZstdDecompressor, "decompressobj"):
+            # The 'zstandard' package, compressor objects can not be shared between threads.
+            return lambda block: zstd.ZstdCompressor(level=level).compress(block)
+        return lambda block: zstd.compress(block, level=level)
+    return None
+
+
+def compression_tool(compression: str, level: int | None = None) -> list[str] | None:
+    """
+    Return the command of an executable that compresses stdin to stdout
+    using multiple threads, or None when it is not available.
+    """
+    if compression == "zst" and shutil.which("zstd"):
+        return ["zstd", "-q", "-c", "-T0"] + ([f"-{level}"] if level else [])
+    return None
+
+
+def detect_compression(path: str | Path) -> str | None:
+    """
+    Return the compression of a file ('gz', 'bz2', 'xz', 'zst' or 'lz4'),
+    based on its contents, or None for an uncompressed file.
+    """
+    with open(path, "rb") as open_file:
+        start = open_file.read(max(map(len, _COMPRESSION_MAGIC.values())))
+    for compression, magic in _COMPRESSION_MAGIC.items():
+        if start.startswith(magic):
+            return compression
+    return None
+
+
+def tarfile_supports(compression: str | None) -> bool:
+    """
+    Whether 'tarfile.open' can open files with this compression by itself.
+    """
+    if compression == "zst":
+        return sys.version_info >= (3, 14)
+    return compression in (None, "gz", "bz2", "xz")
+
+
+def decompressor_factory(compression: str) -> Callable | None:
+    """
+    Return a callable that creates an incremental decompressor (with 'decompress',
+    'eof' and 'unused_data') for a single compressed member, or None when
+    the required python package is not available.
+    """
+    if compression == "gz":
+        return lambda: zlib.decompressobj(wbits=31)
+    if compression == "bz2":
+        return bz2.BZ2Decompressor
+    if compression == "xz":
+        return lzma.LZMADecompressor
+    if compression == "zst" and zstd is not None:
+        if hasattr(zstd.ZstdDecompressor, "decompressobj"):
+            # The 'zstandard' package
+            return lambda: zstd.ZstdDecompressor().decompressobj()
+        return zstd.ZstdDecompressor
+    if compression == "lz4" and lz4_frame is not None:
+        return lz4_frame.LZ4FrameDecompressor
+    return None
+
+
+def _open_with_python(path: Path, compression: str | None) -> BinaryIO:
+    if compression is None:
+        return path.open("rb")
+    if compression == "gz":
+        return gzip.open(path, "rb")
+    if compression == "bz2":
+        return bz2.open(path, "rb")
+    if compression == "xz":
+        return lzma.open(path, "rb")
+    if compression == "zst" and zstd is not None:
+        return zstd.open(path, "rb")
+    if compression == "lz4" and lz4_frame is not None:
+        return lz4_frame.open(path, "rb")
+    package = {"zst": "zstandard", "lz4": "lz4"}[compression]
+    raise ValueError(
+        f"Decompressing {path} requires the '{package}' python package "
+        f"or the '{_DECOMPRESSION_TOOLS[compression][0][0]}' executable."
+    )
+
+
+def _decompression_tool(compression: str | None) -> list[str] | None:
+    for command in _DECOMPRESSION_TOOLS.get(compression, []):
+        if shutil.which(command[0]):
+            return command
+    return None
+
+
+@contextmanager
+def open_decompressed(
+    path: str | Path, *, use_tools: bool = True
+) -> Iterator[BinaryIO]:
+    """
+    Open a (compressed) file for reading its decompressed contents as a stream.
+    When an external (multithreaded) decompression tool is available and 'use_tools'
+    is set, decompression happens in a separate process, in parallel with reading.
+    """
+    path = Path(path)
+    compression = detect_compression(path)
+    tool = _decompression_tool(compression) if use_tools else None
+    if tool is None:
+        with _open_with_python(path, compression) as open_file:
+            yield open_file
+        return
+    with (
+        tempfile.TemporaryFile() as error_output,
+        path.open("rb") as compressed,
+        Popen(tool, stdin=compressed, stdout=PIPE, stderr=error_output) as process,
+    ):
+        try:
+            yield process.stdout
+            # Read the remainder (e.g. padding after the end of a tarfile),
+            # the tool fails when the output is not read entirely.
+            while process.stdout.read(1024 * 1024):
+                pass
+        except BaseException:
+            process.kill()
+            raise
+        if process.wait():
+            error_output.seek(0)
+            message = error_output.read().decode(errors="replace").strip()
+            raise tarfile.ReadError(f"Could not decompress {path}: {message}")
@@ -0,0 +1,265 @@
+from __future__ import annotations
+from functools import partial
+from pathlib import Path
+from subprocess import check_output, CalledProcessError, STDOUT, PIPE, DEVNULL
+from typing import Iterable, Iterator
+from ._build import DockerBuildRegistry, ExecutableCache
+from ._process import StreamedProcess
+from ._run import (
+    _build_component_command,
+    _resolve_viash_run,
+    _run_command,
+    _setup_docker_image,
+    _viash_run_base_command,
+)
+from ._timing import PhaseRecorder, record_phase
+from .config import config_docker_image, config_engine_types, read_viash_config_cached
+from .types import Engine, Platform
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def _outermost(paths: Iterable[str | Path]) -> list[Path]:
+    """
+    Resolve 'paths' and remove the ones that are inside of one of the others.
+    """
+    resolved = sorted({Path(path).resolve() for path in paths})
+    result = []
+    for path in resolved:
+        if not any(path.is_relative_to(parent) for parent in result):
+            result.append(path)
+    return result
+
+
+class DockerContainerPool:
+    """
+    Keeps one long-lived container per docker image, so that running a component
+    does not require creating (and removing) a container for every call.
+    Commands are run in the container using 'docker exec'.
+
+    The 'mounts' are mounted into each container at the same location as on
+    the host, so that paths on the host (e.g. the arguments of a component)
+    can be used as is. For each command, a new empty directory is created in
+    'work_dir' (which must be inside of one of the mounts) and used as the
+    temporary directory ('VIASH_TEMP' and 'TMPDIR'); it is removed afterwards.
+    The command runs in the current working directory when it is mounted,
+    or in its temporary directory otherwise. Commands run as the current user,
+    so that the files they create in the mounts are owned by that user.
+
+    Call 'close' to remove the containers.
+    """
+
+    def __init__(
+        self,
+        mounts: Iterable[str | Path],
+        work_dir: str | Path,
+        docker_executable: str = "docker",
+    ):
+        self.mounts = _outermost(mounts)
+        self.work_dir = Path(work_dir)
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self.docker_executable = docker_executable
+        self._containers = {}
+        self._lock = threading.Lock()
+
+    def _is_mounted(self, path: Path) -> bool:
+        path = path.resolve()
+        return any(path.is_relative_to(mount) for mount in self.mounts)
+
+    def container(self, image: str, recorder: PhaseRecorder | None = None) -> str:
+        """
+        Return the ID of the container for 'image', starting it when needed.
+        """
+        with self._lock:
+            try:
+                return self._containers[image]
+            except KeyError:
+                pass
+            command = [
+                self.docker_executable,
+                "run",
+                "--detach",
+                "--rm",
+                "--entrypoint",
+                "sleep",
+            ]
+            for mount in self.mounts:
+                command += ["--volume", f"{mount}:{mount}"]
+            command += [image, "infinity"]
+            logger.debug("Starting container: %s", " ".join(command))
+            with record_phase(recorder, "container_start"):
+                output = check_output(command, stderr=STDOUT)
+            container_id = output.decode().strip().splitlines()[-1]
+            self._containers[image] = container_id
+            return container_id
+
+    def run(
+        self,
+        image: str,
+        command: list,
+        *,
+        stderr: STDOUT | PIPE | DEVNULL | -1 | -2 | -3 = STDOUT,
+        stream: bool = False,
+        tee: str | Path | None = None,
+        max_output_bytes: int | None = None,
+        recorder: PhaseRecorder | None = None,
+        timeout: float | None = None,
+        abort_on: list[str | bytes | re.Pattern] | None = None,
+    ):
+        """
+        Run 'command' in the container for 'image' and return its output.
+        See '_run_command' for the other arguments. Killing 'docker exec' does not
+        stop the command in the container, so when the timeout expires or the output
+        matches 'abort_on', the container is removed (a new one is started for the
+        next command).
+        """
+        container_id = self.container(image, recorder)
+        call_dir = Path(tempfile.mkdtemp(dir=self.work_dir, prefix="call-"))
+        cwd = Path.cwd()
+        exec_command = [
+            self.docker_executable,
+            "exec",
+            "--workdir",
+            str(cwd if self._is_mounted(cwd) else call_dir),
+            *self._user_args(),
+            "--env",
+            f"VIASH_TEMP={call_dir}",
+            "--env",
+            f"TMPDIR={call_dir}",
+            container_id,
+            *map(str, command),
+        ]
+        try:
+            result = _run_command(
+                exec_command,
+                stderr=stderr,
+                stream=stream,
+                tee=tee,
+                max_output_bytes=max_output_bytes,
+                recorder=recorder,
+                timeout=timeout,
+                abort_on=abort_on,
+                on_kill=partial(self.discard, image, container_id),
+            )
+        except BaseException:
+            shutil.rmtree(call_dir, ignore_errors=True)
+            raise
+        if isinstance(result, StreamedProcess):
+            return self._remove_after_stream(result, call_dir)
+        shutil.rmtree(call_dir, ignore_errors=True)
+        return result
+
+    @staticmethod
+    def _user_args() -> list[str]:
+        if not hasattr(os, "getuid"):  # pragma: no cover
+            return []
+        return ["--user", f"{os.getuid()}:{os.getgid()}"]
+
+    @staticmethod
+    def _remove_after_stream(lines: StreamedProcess, call_dir: Path) -> Iterator:
+        try:
+            yield from lines
+        finally:
+            shutil.rmtree(call_dir, ignore_errors=True)
+
+    def discard(self, image: str, container_id: str) -> None:
+        """
+        Remove the container of 'image', when it is still the one with 'container_id'.
+        """
+        with self._lock:
+            if self._containers.get(image) != container_id:
+                return
+            del self._containers[image]
+        self._remove([container_id])
+
+    def _remove(self, container_ids: list[str]) -> None:
+        try:
+            check_output(
+                [self.docker_executable, "rm", "--force", *container_ids],
+                stderr=STDOUT,
+            )
+        except (CalledProcessError, OSError) as e:
+            logger.warning("Could not remove containers %s: %s", container_ids, e)
+
+    def close(self) -> None:
+        with self._lock:
+            container_ids = list(self._containers.values())
+            self._containers.clear()
+        if container_ids:
+            self._remove(container_ids)
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+def viash_run_in_container(
+    config: str | Path,
+    args: list[str],
+    *,
+    pool: DockerContainerPool,
+    executable_cache: ExecutableCache,
+    cpus: int | None = None,
+    memory: str | None = None,
+    engine: Engine | None = None,
+    platform: Platform | None = None,
+    viash_location: str | Path = "viash",
+    build_registry: DockerBuildRegistry | None = None,
+    stream: bool = False,
+    tee: str | Path | None = None,
+    max_output_bytes: int | None = None,
+    recorder: PhaseRecorder | None = None,
+    timeout: float | None = None,
+    abort_on: list[str | bytes | re.Pattern] | None = None,
+):
+    """
+    Run a component that uses the docker engine (or platform) in a container of
+    'pool'. The docker image is set up like 'viash_run' does, and the component
+    is built for the native engine (using 'executable_cache', whose directory
+    must be mounted in the containers) and run inside of the container, so the
+    config must also define a native engine (or platform).
+    """
+    with record_phase(recorder, "version_probe"):
+        config, viash_version, platform_or_engine, engine_or_platform_val = (
+            _resolve_viash_run(config, engine, platform, viash_location)
+        )
+    if engine_or_platform_val != "docker":
+        raise ValueError(
+            "Only components that use the docker engine can be run in a container pool."
+        )
+    viash_config = read_viash_config_cached(config)
+    image = config_docker_image(viash_config)
+    if image is None:
+        raise ValueError(f"{config} does not define a docker {platform_or_engine}.")
+    if "native" not in config_engine_types(viash_config):
+        raise ValueError(f"{config} does not define a native {platform_or_engine}.")
+    base_command = _viash_run_base_command(
+        config, platform_or_engine, engine_or_platform_val, viash_location
+    )
+    _setup_docker_image(
+        config,
+        viash_version,
+        platform_or_engine,
+        base_command,
+        viash_location,
+        build_registry=build_registry,
+        recorder=recorder,
+        stderr=STDOUT,
+    )
+    with record_phase(recorder, "build"):
+        executable = executable_cache.get(
+            config, viash_location=viash_location, **{platform_or_engine: "native"}
+        )
+    return pool.run(
+        image,
+        _build_component_command(executable, args, cpus, memory),
+        stream=stream,
+        tee=tee,
+        max_output_bytes=max_output_bytes,
+        recorder=recorder,
+        timeout=timeout,
+        abort_on=abort_on,
+    )
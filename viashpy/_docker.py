@@ -0,0 +1,43 @@
+from __future__ import annotations
+from subprocess import check_output, CalledProcessError, DEVNULL
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def docker_image_id(image: str, docker_executable: str = "docker") -> str | None:
+    """
+    Return the ID of a local docker image, or None when the image
+    (or docker itself) is not available.
+    """
+    try:
+        return (
+            check_output(
+                [docker_executable, "image", "inspect", "--format", "{{.Id}}", image],
+                stderr=DEVNULL,
+            )
+            .decode()
+            .strip()
+        )
+    except (CalledProcessError, OSError):
+        logger.debug("Could not determine the ID of docker image %s", image)
+        return None
+
+
+def remove_labeled_containers(label: str, docker_executable: str = "docker") -> None:
+    """
+    Remove (and stop) all containers with 'label', e.g. the containers of
+    a component that did not finish in time.
+    """
+    try:
+        container_ids = check_output(
+            [docker_executable, "ps", "--all", "--quiet", "--filter", f"label={label}"],
+            stderr=DEVNULL,
+        ).split()
+        if container_ids:
+            check_output(
+                [docker_executable, "rm", "--force", *map(bytes.decode, container_ids)],
+                stderr=DEVNULL,
+            )
+    except (CalledProcessError, OSError) as e:
+        logger.warning("Could not remove the containers with label %s: %s", label, e)
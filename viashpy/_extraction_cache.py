@@ -0,0 +1,255 @@
+from __future__ import annotations
+from functools import partial
+from pathlib import Path
+from typing import Callable
+from ._cache import (
+    user_cache_dir,
+    file_lock,
+    read_json,
+    write_json_atomic,
+    hash_file,
+)
+import errno
+import hashlib
+import logging
+import os
+import shutil
+import stat
+import sys
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE_BYTES = 10 * 1024**3
+# From linux/fs.h
+_FICLONE = 0x40049409
+# Errors that indicate that a way of materializing files is not supported
+# for the destination, as opposed to an error for a single file.
+_UNSUPPORTED_ERRNOS = {
+    errno.EXDEV,
+    errno.EPERM,
+    errno.EOPNOTSUPP,
+    errno.ENOTTY,
+    errno.EINVAL,
+    errno.ENOSYS,
+}
+
+
+def _reflink(source: Path, destination: Path) -> None:
+    if fcntl is None or not sys.platform.startswith("linux"):
+        raise OSError(errno.EOPNOTSUPP, "Reflinks are not supported.")
+    try:
+        with open(source, "rb") as open_source, open(destination, "wb") as open_dest:
+            fcntl.ioctl(open_dest.fileno(), _FICLONE, open_source.fileno())
+    except OSError:
+        destination.unlink(missing_ok=True)
+        raise
+    shutil.copymode(source, destination)
+
+
+def _copy_writable(source: Path, destination: Path, copy: Callable) -> None:
+    copy(source, destination)
+    # The files in the store are read-only, independent copies do not need to be.
+    destination.chmod(destination.stat().st_mode | stat.S_IWUSR)
+
+
+def _materialize_tree(source: Path, destination: Path, hardlink: bool = False) -> None:
+    """
+    Recreate the tree at 'source' at 'destination' (which must not exist) without
+    copying the contents of files when possible: files are reflinked, or copied
+    when reflinks are not supported (e.g. by the filesystem). With 'hardlink',
+    files are hardlinked when possible, so they share their inode with 'source'.
+    """
+    strategies = [
+        partial(_copy_writable, copy=_reflink),
+        partial(_copy_writable, copy=shutil.copy2),
+    ]
+    if hardlink:
+        strategies.insert(0, os.link)
+    copy = strategies[-1]
+    destination.mkdir()
+    for directory, subdirectories, files in os.walk(source):
+        relative = Path(directory).relative_to(source)
+        for name in subdirectories:
+            source_path = Path(directory, name)
+            if source_path.is_symlink():
+                os.symlink(os.readlink(source_path), destination / relative / name)
+            else:
+                (destination / relative / name).mkdir()
+        for name in files:
+            source_path = Path(directory, name)
+            destination_path = destination / relative / name
+            if source_path.is_symlink():
+                os.symlink(os.readlink(source_path), destination_path)
+                continue
+            for strategy in list(strategies):
+                try:
+                    strategy(source_path, destination_path)
+                    break
+                except OSError as e:
+                    if strategy is copy:
+                        raise
+                    if e.errno in _UNSUPPORTED_ERRNOS:
+                        logger.debug(
+                            "Not using %r to materialize %s: %s",
+                            strategy,
+                            destination,
+                            e,
+                        )
+                        strategies.remove(strategy)
+
+
+def _make_read_only(path: Path) -> None:
+    """
+    Remove the write permissions of the files in 'path'. Files can be shared
+    with the extracted copies using hardlinks, so they must not be modified.
+    """
+    for directory, _, files in os.walk(path):
+        for name in files:
+            file_path = Path(directory, name)
+            if not file_path.is_symlink():
+                mode = file_path.stat().st_mode
+                file_path.chmod(mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+
+
+def _tree_size(path: Path) -> int:
+    return sum(
+        Path(directory, name).lstat().st_size
+        for directory, _, files in os.walk(path)
+        for name in files
+    )
+
+
+class ExtractionCache:
+    """
+    Store of extracted archives, keyed on the contents of the archive.
+
+    An archive is extracted into the store only once, which can be shared between
+    processes (e.g. pytest-xdist workers) and sessions. Extracting an archive
+    creates reflinks to the files in the store, or copies when reflinks are not
+    supported, which can be modified without affecting the store.
+
+    With 'hardlink', files are hardlinked to the store instead when possible, which
+    does not copy any data on filesystems without reflinks. Hardlinked files share
+    their contents (and permissions) with the store, so they are read-only and must
+    not be modified, not even after changing their permissions: this would change
+    the files of every later extraction. Replace a file instead of modifying it.
+
+    When the total size of the store exceeds 'max_size_bytes', the least
+    recently used archives are removed from the store.
+    """
+
+    def __init__(
+        self,
+        root: str | Path | None = None,
+        max_size_bytes: int | None = DEFAULT_MAX_SIZE_BYTES,
+        hardlink: bool = False,
+    ):
+        self.root = Path(root) if root is not None else user_cache_dir("extracted")
+        self.max_size_bytes = max_size_bytes
+        self.hardlink = hardlink
+        self._store = self.root / "store"
+        self._entries = self.root / "entries"
+        self._hashes = self.root / "hashes"
+        for directory in (self._store, self._entries, self._hashes):
+            directory.mkdir(parents=True, exist_ok=True)
+
+    def archive_key(self, archive: str | Path) -> str:
+        """
+        The hash of the contents of 'archive'. The hash is stored, keyed on the
+        location, modification time and size of the archive, so that
+        unchanged archives do not need to be read again.
+        """
+        archive = Path(archive).resolve()
+        stat_result = archive.stat()
+        identity = [str(archive), stat_result.st_mtime_ns, stat_result.st_size]
+        identity_key = hashlib.sha256(
+            "\0".join(map(str, identity)).encode()
+        ).hexdigest()
+        hash_entry_file = self._hashes / f"{identity_key}.json"
+        hash_entry = read_json(hash_entry_file)
+        if hash_entry and hash_entry.get("identity") == identity:
+            return hash_entry["sha256"]
+        content_hash = hash_file(archive)
+        write_json_atomic(
+            hash_entry_file, {"identity": identity, "sha256": content_hash}
+        )
+        return content_hash
+
+    def materialize(
+        self,
+        archive: str | Path,
+        destination: str | Path,
+        extract: Callable[[Path], None],
+    ) -> Path:
+        """
+        Create the extracted contents of 'archive' at 'destination'. When the archive
+        is not in the store yet, 'extract' is called with the (non-existing) directory
+        that the archive must be extracted to.
+        """
+        destination = Path(destination)
+        key = self.archive_key(archive)
+        entry = self._store / key
+        entry_file = self._entries / f"{key}.json"
+        added = False
+        # Eviction also takes this lock, so the entry can not be removed while in use.
+        with file_lock(self._entries / f"{key}.lock"):
+            if not entry.is_dir():
+                self._add(entry, entry_file, extract)
+                added = True
+            elif entry_file.exists():
+                # Mark as recently used
+                os.utime(entry_file)
+            else:
+                write_json_atomic(entry_file, {"size": _tree_size(entry)})
+            temp_dir = Path(
+                tempfile.mkdtemp(dir=destination.parent, prefix=f".{destination.name}.")
+            )
+            try:
+                _materialize_tree(entry, temp_dir / "materialized", self.hardlink)
+                (temp_dir / "materialized").rename(destination)
+            finally:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+        if added:
+            self._evict(keep=key)
+        return destination
+
+    def _add(self, entry: Path, entry_file: Path, extract: Callable[[Path], None]):
+        temp_dir = Path(tempfile.mkdtemp(dir=self._store, prefix=f".{entry.name}."))
+        try:
+            extract(temp_dir / "extracted")
+            _make_read_only(temp_dir / "extracted")
+            (temp_dir / "extracted").rename(entry)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        write_json_atomic(entry_file, {"size": _tree_size(entry)})
+
+    def _evict(self, keep: str) -> None:
+        if self.max_size_bytes is None:
+            return
+        with file_lock(self.root / "evict.lock"):
+            entries = sorted(
+                self._entries.glob("*.json"),
+                key=lambda entry_file: entry_file.stat().st_mtime_ns,
+            )
+            sizes = {
+                entry_file.stem: (read_json(entry_file) or {}).get("size", 0)
+                for entry_file in entries
+            }
+            total_size = sum(sizes.values())
+            for entry_file in entries:
+                if total_size <= self.max_size_bytes:
+                    break
+                key = entry_file.stem
+                if key == keep:
+                    continue
+                with file_lock(self._entries / f"{key}.lock"):
+                    logger.debug("Removing extracted archive %s from the cache", key)
+                    entry_file.unlink(missing_ok=True)
+                    shutil.rmtree(self._store / key, ignore_errors=True)
+                total_size -= sizes[key]
@@ -0,0 +1,383 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from subprocess import CalledProcessError, STDOUT
+from typing import Iterable
+from xml.etree import ElementTree
+from .config import read_viash_config_cached, _find_project_root
+from .index import ComponentInfo
+from ._build import ExecutableCache
+from ._resources import ResourcePool, host_cpus, memory_to_bytes
+from ._run import tobytesconverter, _get_viash_version
+import logging
+import math
+import re
+import shutil
+import subprocess
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+# The block of a test script that is replaced with the 'par' and 'meta' for the test run,
+# in the same way as 'viash test' does.
+_VIASH_BLOCK = re.compile(
+    r"^[ \t]*#+[ \t]*VIASH[ _]START[^\n]*\n.*?^[ \t]*#+[ \t]*VIASH[ _]END[^\n]*$",
+    re.MULTILINE | re.DOTALL,
+)
+# Only keep the end of the output of a failed build or pytest run in the report.
+_MAX_REPORTED_OUTPUT = 64 * 1024
+# pytest exit codes for which the JUnit XML file describes the result of the run:
+# all tests passed, some tests failed and no tests were collected.
+_PYTEST_RESULT_EXIT_CODES = (0, 1, 5)
+_COUNTED_ATTRIBUTES = ("tests", "failures", "errors", "skipped")
+
+
+def _config_value(config, key):
+    """
+    Look up 'key' in a viash >= 0.9 config, or in '.functionality' for viash < 0.9.
+    """
+    value = config.get(key)
+    if value is None:
+        value = (config.get("functionality") or {}).get(key)
+    return value
+
+
+@dataclass(frozen=True)
+class ComponentTests:
+    """
+    The test resources of a component and the CPUs and memory that it declares.
+    'resources' holds the location of each test resource and its destination,
+    relative to the directory in which the tests are run. 'scripts' are the
+    destinations of the python test scripts, which are run using pytest.
+    """
+
+    component: ComponentInfo
+    resources: tuple[tuple[Path, str], ...]
+    scripts: tuple[str, ...]
+    cpus: int | None
+    memory_bytes: int | None
+
+    @classmethod
+    def from_component(cls, component: ComponentInfo) -> ComponentTests:
+        config = read_viash_config_cached(component.config)
+        resources, scripts, project_root = [], [], None
+        for resource in _config_value(config, "test_resources") or []:
+            resource_path = resource.get("path")
+            if not resource_path or "://" in resource_path:
+                continue
+            if resource_path.startswith("/"):
+                if project_root is None:
+                    project_root = _find_project_root(component.config) or Path("/")
+                source = project_root / resource_path.lstrip("/")
+            else:
+                source = component.config.parent / resource_path
+            destination = resource.get("dest") or source.name
+            resources.append((source, destination))
+            if resource.get("type") == "python_script":
+                scripts.append(destination)
+        requirements = _config_value(config, "requirements") or {}
+        memory_bytes = None
+        if requirements.get("memory"):
+            try:
+                memory_bytes = memory_to_bytes(str(requirements["memory"]))
+            except ValueError as e:
+                logger.warning("Ignoring the memory of %s: %s", component.full_name, e)
+        return cls(
+            component=component,
+            resources=tuple(resources),
+            scripts=tuple(scripts),
+            cpus=requirements.get("cpus"),
+            memory_bytes=memory_bytes,
+        )
+
+
+@dataclass
+class ComponentResult:
+    """
+    The JUnit XML test suites that describe the result of testing a component.
+    """
+
+    component: ComponentInfo
+    suites: list[ElementTree.Element] = field(default_factory=list)
+    log: Path | None = None
+
+    def count(self, attribute: str) -> int:
+        return sum(int(suite.get(attribute, 0)) for suite in self.suites)
+
+    @property
+    def failed(self) -> bool:
+        return bool(self.count("failures") or self.count("errors"))
+
+
+def _error_suite(
+    component: ComponentInfo, step: str, message: str, output: str = ""
+) -> ElementTree.Element:
+    """
+    A test suite with a single erroring test case, for a step that did not produce
+    test results (e.g. building the component).
+    """
+    suite = ElementTree.Element(
+        "testsuite",
+        name=component.full_name,
+        tests="1",
+        errors="1",
+        failures="0",
+        skipped="0",
+        time="0",
+    )
+    testcase = ElementTree.SubElement(
+        suite, "testcase", classname=component.full_name, name=step
+    )
+    error = ElementTree.SubElement(testcase, "error", message=message)
+    error.text = output[-_MAX_REPORTED_OUTPUT:]
+    return suite
+
+
+def _decode_output(output: bytes | str | None) -> str:
+    if isinstance(output, bytes):
+        return output.decode("utf-8", errors="replace")
+    return output or ""
+
+
+def render_test_script(script: str, meta: dict) -> str:
+    """
+    Replace the VIASH START ... VIASH END block of a test script with the
+    'par' and 'meta' for the test run. When the script does not contain
+    such a block, they are added to the start of the script.
+    """
+    definitions = f"par = {{}}\nmeta = {meta!r}"
+    rendered, replaced = _VIASH_BLOCK.subn(lambda _: definitions, script, count=1)
+    if not replaced:
+        return f"{definitions}\n{script}"
+    return rendered
+
+
+def _test_meta(
+    tests: ComponentTests, executable: Path, resources_dir: Path, temp_dir: Path
+) -> dict:
+    built_config = executable.parent / ".config.vsh.yaml"
+    meta = {
+        "name": tests.component.name,
+        "functionality_name": tests.component.name,
+        "config": str(
+            built_config if built_config.is_file() else tests.component.config
+        ),
+        "executable": str(executable),
+        "resources_dir": str(resources_dir),
+        "temp_dir": str(temp_dir),
+        "cpus": tests.cpus,
+    }
+    # Set all memory fields, like 'viash test' does.
+    for unit in tobytesconverter.AVAILABLE_UNITS():
+        meta[f"memory_{unit.lower()}"] = (
+            math.ceil(tests.memory_bytes / tobytesconverter(1, unit))
+            if tests.memory_bytes is not None
+            else None
+        )
+    return meta
+
+
+def _copy_test_resources(
+    tests: ComponentTests, executable: Path, test_dir: Path
+) -> None:
+    temp_dir = test_dir / "tmp"
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    meta = _test_meta(tests, executable, test_dir, temp_dir)
+    for source, destination in tests.resources:
+        target = test_dir / destination
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if destination in tests.scripts:
+            target.write_text(render_test_script(source.read_text(), meta))
+        elif source.is_dir():
+            shutil.copytree(source, target, dirs_exist_ok=True)
+        else:
+            shutil.copy2(source, target)
+
+
+class NamespaceTester:
+    """
+    Tests the components of a source tree (the counterpart of 'viash ns test').
+
+    First, each component is built once using 'viash build' into an 'ExecutableCache',
+    while building 'build_workers' components at the same time. As soon as a component
+    is built, its python test scripts are run with pytest in a separate process,
+    using the built executable ('--viash-run-executable'). A component is only tested
+    when the CPUs and memory declared in its config ('.requirements') are available
+    in the 'resource_pool'; the CPUs and memory are also passed to pytest as
+    the capacity for the runs of the component in that test session.
+    """
+
+    def __init__(
+        self,
+        work_dir: str | Path,
+        *,
+        executable_cache: ExecutableCache,
+        viash_location: str | Path = "viash",
+        engine: str | None = None,
+        resource_pool: ResourcePool | None = None,
+        build_workers: int | None = None,
+        pytest_args: Iterable[str] = (),
+    ):
+        self.work_dir = Path(work_dir)
+        self.executable_cache = executable_cache
+        self.viash_location = viash_location
+        self.engine = engine
+        self.resource_pool = resource_pool or ResourcePool()
+        self.build_workers = build_workers or host_cpus()
+        self.pytest_args = list(pytest_args)
+
+    def _build(self, tests: ComponentTests) -> Path:
+        component = tests.component
+        engine = self.engine or (
+            component.engines[0] if component.engines else "native"
+        )
+        # viash < 0.9 uses platforms instead of engines
+        if _get_viash_version(self.viash_location)[:2] < (0, 9):
+            engine_kwargs = {"platform": engine}
+        else:
+            engine_kwargs = {"engine": engine}
+        return self.executable_cache.get(
+            component.config, viash_location=self.viash_location, **engine_kwargs
+        )
+
+    def _test_dir(self, component: ComponentInfo) -> Path:
+        return self.work_dir / (component.namespace or "") / component.name
+
+    def _run_tests(self, tests: ComponentTests, executable: Path) -> ComponentResult:
+        component = tests.component
+        test_dir = self._test_dir(component)
+        result = ComponentResult(component, log=test_dir / "pytest.log")
+        with self.resource_pool.reserve(tests.cpus, tests.memory_bytes):
+            try:
+                _copy_test_resources(tests, executable, test_dir)
+            except OSError as e:
+                result.suites.append(_error_suite(component, "setup", str(e)))
+                return result
+            junit_xml = test_dir / "junit.xml"
+            command = [
+                sys.executable,
+                "-m",
+                "pytest",
+                *tests.scripts,
+                f"--junitxml={junit_xml}",
+                f"--rootdir={test_dir}",
+                "-p",
+                "no:cacheprovider",
+                "--viash-run-executable",
+            ]
+            if tests.cpus:
+                command.append(f"--viash-host-cpus={tests.cpus}")
+            if tests.memory_bytes:
+                command.append(f"--viash-host-memory={tests.memory_bytes}B")
+            command += self.pytest_args
+            logger.debug("Testing %s: %s", component.full_name, " ".join(command))
+            with result.log.open("wb") as log_file:
+                returncode = subprocess.run(
+                    command, cwd=test_dir, stdout=log_file, stderr=STDOUT
+                ).returncode
+        if returncode in _PYTEST_RESULT_EXIT_CODES and junit_xml.is_file():
+            root = ElementTree.parse(junit_xml).getroot()
+            suites = [root] if root.tag == "testsuite" else root.findall("testsuite")
+            for suite in suites:
+                suite.set("name", component.full_name)
+            result.suites.extend(suites)
+        else:
+            result.suites.append(
+                _error_suite(
+                    component,
+                    "pytest",
+                    f"pytest exited with exit code {returncode}.",
+                    result.log.read_text(errors="replace"),
+                )
+            )
+        return result
+
+    def run(self, components: Iterable[ComponentInfo]) -> list[ComponentResult]:
+        """
+        Build and test 'components'. Components without python test scripts
+        are skipped. The results are sorted by the full name of the component.
+        """
+        to_test = []
+        for component in components:
+            tests = ComponentTests.from_component(component)
+            if tests.scripts:
+                to_test.append(tests)
+            else:
+                logger.info("%s: no python test scripts, skipping", component.full_name)
+        results, test_futures = [], {}
+        with (
+            ThreadPoolExecutor(max_workers=self.build_workers) as build_pool,
+            ThreadPoolExecutor(max_workers=self.resource_pool.cpus) as test_pool,
+        ):
+            builds = {build_pool.submit(self._build, tests): tests for tests in to_test}
+            for build in as_completed(builds):
+                tests = builds[build]
+                component = tests.component
+                try:
+                    executable = build.result()
+                except Exception as e:
+                    logger.info("%s: build failed", component.full_name)
+                    output = e.output if isinstance(e, CalledProcessError) else None
+                    suite = _error_suite(
+                        component, "build", str(e), _decode_output(output)
+                    )
+                    results.append(ComponentResult(component, [suite]))
+                    continue
+                logger.info("%s: built", component.full_name)
+                test_future = test_pool.submit(self._run_tests, tests, executable)
+                test_futures[test_future] = tests
+            for test_future in as_completed(test_futures):
+                try:
+                    result = test_future.result()
+                except Exception as e:
+                    # Keep the results of the other components
+                    component = test_futures[test_future].component
+                    logger.info("%s: running the tests failed", component.full_name)
+                    suite = _error_suite(component, "pytest", str(e))
+                    result = ComponentResult(component, [suite])
+                logger.info(
+                    "%s: %s",
+                    result.component.full_name,
+                    "FAILED" if result.failed else "PASSED",
+                )
+                results.append(result)
+        return sorted(results, key=lambda result: result.component.full_name)
+
+
+def write_junit_xml(
+    results: Iterable[ComponentResult], output: str | Path, duration: float = 0.0
+) -> None:
+    """
+    Combine the test suites of all components into a single JUnit XML file.
+    """
+    root = ElementTree.Element("testsuites", name="viashpy", time=f"{duration:.3f}")
+    totals = dict.fromkeys(_COUNTED_ATTRIBUTES, 0)
+    for result in results:
+        for suite in result.suites:
+            root.append(suite)
+        for attribute in _COUNTED_ATTRIBUTES:
+            totals[attribute] += result.count(attribute)
+    for attribute, total in totals.items():
+        root.set(attribute, str(total))
+    ElementTree.indent(root)
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    ElementTree.ElementTree(root).write(output, encoding="utf-8", xml_declaration=True)
+
+
+def run_namespace_tests(
+    components: Iterable[ComponentInfo],
+    work_dir: str | Path,
+    junit_xml: str | Path,
+    **tester_kwargs,
+) -> list[ComponentResult]:
+    """
+    Build and test 'components' (see 'NamespaceTester') and write
+    the combined results to 'junit_xml'.
+    """
+    start = time.monotonic()
+    results = NamespaceTester(work_dir, **tester_kwargs).run(components)
+    write_junit_xml(results, junit_xml, time.monotonic() - start)
+    return results
@@ -0,0 +1,189 @@
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from subprocess import Popen, PIPE
+from typing import BinaryIO, Callable
+from ._compression import block_compressor, compression_from_suffix, compression_tool
+import os
+import tarfile
+import tempfile
+import threading
+
+# Size of the blocks of the tar stream that are compressed independently.
+_BLOCK_SIZE = 4 * 1024 * 1024
+
+_background_executor = None
+_background_executor_lock = threading.Lock()
+
+
+class _ParallelBlockWriter:
+    """
+    File-like object that splits the data written to it into blocks, compresses
+    the blocks in a thread pool and writes the compressed blocks to 'output' in order.
+    """
+
+    def __init__(
+        self,
+        output: BinaryIO,
+        compress: Callable[[bytes], bytes],
+        executor: ThreadPoolExecutor,
+        max_pending: int,
+    ):
+        self._output = output
+        self._compress = compress
+        self._executor = executor
+        self._max_pending = max_pending
+        self._pending = deque()
+        self._buffer = bytearray()
+
+    def write(self, data) -> int:
+        self._buffer += data
+        while len(self._buffer) >= _BLOCK_SIZE:
+            self._submit(bytes(self._buffer[:_BLOCK_SIZE]))
+            del self._buffer[:_BLOCK_SIZE]
+        return len(data)
+
+    def _submit(self, block: bytes) -> None:
+        self._pending.append(self._executor.submit(self._compress, block))
+        # Limit the number of blocks in memory, and write the blocks that are done.
+        while self._pending and (
+            len(self._pending) > self._max_pending or self._pending[0].done()
+        ):
+            self._output.write(self._pending.popleft().result())
+
+    def close(self) -> None:
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        while self._pending:
+            self._output.write(self._pending.popleft().result())
+
+
+def _normalize(mtime: int | None) -> Callable:
+    def normalize(member: tarfile.TarInfo) -> tarfile.TarInfo:
+        member.uid = member.gid = 0
+        member.uname = member.gname = ""
+        member.mtime = int(member.mtime if mtime is None else mtime)
+        return member
+
+    return normalize
+
+
+def _open_tar_stream(fileobj) -> tarfile.TarFile:
+    return tarfile.open(fileobj=fileobj, mode="w|", format=tarfile.PAX_FORMAT)
+
+
+def _add_tree(open_tar: tarfile.TarFile, source: Path, mtime: int | None) -> None:
+    """
+    Add 'source' and its contents to the archive, sorted by path.
+    """
+    normalize = _normalize(mtime)
+    open_tar.add(source, arcname=source.name, recursive=False, filter=normalize)
+    for directory, subdirectories, files in os.walk(source):
+        subdirectories.sort()
+        relative = Path(directory).relative_to(source.parent)
+        for name in sorted(subdirectories + files):
+            open_tar.add(
+                Path(directory, name),
+                arcname=str(relative / name),
+                recursive=False,
+                filter=normalize,
+            )
+
+
+def _pack(
+    source: Path,
+    destination: Path,
+    compression: str | None,
+    level: int | None,
+    max_workers: int | None,
+    mtime: int | None,
+) -> Path:
+    max_workers = max_workers or os.cpu_count() or 1
+    fd, temp_path = tempfile.mkstemp(
+        dir=destination.parent, prefix=f".{destination.name}."
+    )
+    try:
+        with os.fdopen(fd, "wb") as output:
+            if compression is None:
+                with _open_tar_stream(output) as open_tar:
+                    _add_tree(open_tar, source, mtime)
+            elif (compress := block_compressor(compression, level)) is not None:
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    writer = _ParallelBlockWriter(
+                        output, compress, executor, max_workers * 2
+                    )
+                    with _open_tar_stream(writer) as open_tar:
+                        _add_tree(open_tar, source, mtime)
+                    writer.close()
+            elif (tool := compression_tool(compression, level)) is not None:
+                with Popen(tool, stdin=PIPE, stdout=output) as process:
+                    with process.stdin, _open_tar_stream(process.stdin) as open_tar:
+                        _add_tree(open_tar, source, mtime)
+                if process.returncode:
+                    raise OSError(
+                        f"Compressing {destination} failed with exit code {process.returncode}."
+                    )
+            else:
+                raise ValueError(
+                    f"Writing {compression} compressed archives requires the 'zstandard' "
+                    "python package or the 'zstd' executable."
+                )
+        os.replace(temp_path, destination)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+    return destination
+
+
+def _get_background_executor() -> ThreadPoolExecutor:
+    global _background_executor
+    with _background_executor_lock:
+        if _background_executor is None:
+            _background_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="viashpy-pack-tar"
+            )
+        return _background_executor
+
+
+def pack_tar(
+    source_dir: Path | str,
+    destination: Path | str,
+    *,
+    compression: str | None = None,
+    level: int | None = None,
+    max_workers: int | None = None,
+    mtime: int | None = None,
+    background: bool = False,
+) -> Path | Future:
+    """
+    Pack the directory 'source_dir' into a tarfile at 'destination', which can be
+    extracted again using 'extract_tar'. The compression is determined by the suffix
+    of 'destination' ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz', '.tar.zst', ...)
+    unless 'compression' ('gz', 'bz2', 'xz' or 'zst') is provided.
+
+    The archive is compressed in independent blocks using 'max_workers' threads,
+    which allows 'TarArchive' to start reading at any block. When the python
+    package for zstd is not available, the 'zstd' executable is used instead.
+
+    Entries are added in sorted order and the owner of the files is not stored, so
+    that packing the same directory results in the same archive. Pass 'mtime' to
+    also replace the modification times of the files.
+
+    With 'background=True', the archive is created in a background thread and a
+    'concurrent.futures.Future' is returned that resolves to the destination.
+    """
+    source_dir, destination = Path(source_dir), Path(destination)
+    if not source_dir.is_dir():
+        raise FileNotFoundError(
+            f"Directory {source_dir} does not exist or is not a directory."
+        )
+    if destination.exists():
+        raise FileExistsError(f"{destination} already exists.")
+    if compression is None:
+        compression = compression_from_suffix(destination)
+    args = (source_dir, destination, compression, level, max_workers, mtime)
+    if background:
+        return _get_background_executor().submit(_pack, *args)
+    return _pack(*args)
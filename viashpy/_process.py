@@ -0,0 +1,388 @@
+from __future__ import annotations
+from subprocess import Popen, STDOUT, PIPE, CalledProcessError, TimeoutExpired
+from collections import deque
+from pathlib import Path
+from typing import Callable, Iterator
+import os
+import re
+import signal
+import threading
+import time
+
+# By default, keep the last MiB of the output of a component in memory.
+DEFAULT_MAX_OUTPUT_BYTES = 1024 * 1024
+# Lines that are longer than this (e.g. progress bars that only use carriage returns)
+# are yielded in pieces, so that a single line does not need to fit in memory.
+_MAX_LINE_LENGTH = 64 * 1024
+
+
+def wait_with_rusage(process: Popen):
+    """
+    Wait for 'process' to exit and return its exit code and resource usage.
+    The resource usage is None when it is not available on this platform.
+    """
+    if not hasattr(os, "wait4") or process.returncode is not None:
+        return process.wait(), None
+    try:
+        _, status, rusage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        # Already reaped elsewhere
+        return process.wait(), None
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return process.returncode, rusage
+
+
+def _wait_for_exit(process: Popen, timeout: float) -> None:
+    """
+    Wait at most 'timeout' seconds for 'process' to exit, without reaping it
+    (so that its resource usage can still be collected).
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOHANG | os.WNOWAIT):
+                return
+        except ChildProcessError:
+            # Already reaped elsewhere
+            return
+        time.sleep(0.05)
+
+
+def kill_process_group(process: Popen, grace_period: float = 0.0) -> None:
+    """
+    Kill 'process' and, when it was started in a new session
+    ('start_new_session=True'), all other processes in its process group.
+    With a 'grace_period', the process group is sent SIGTERM first and gets that
+    many seconds to exit, e.g. to let the script of a built component stop
+    its docker container, before it is killed.
+    """
+    if hasattr(os, "killpg") and process.returncode is None:
+        try:
+            if os.getpgid(process.pid) == process.pid:
+                if grace_period and hasattr(os, "waitid"):
+                    os.killpg(process.pid, signal.SIGTERM)
+                    _wait_for_exit(process, grace_period)
+                os.killpg(process.pid, signal.SIGKILL)
+                return
+        except ProcessLookupError:
+            return
+    try:
+        process.kill()
+    except ProcessLookupError:
+        pass
+
+
+class OutputTail:
+    """
+    Keeps the last 'max_bytes' bytes of the output that was appended to it.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_OUTPUT_BYTES):
+        self.max_bytes = max_bytes
+        self._chunks = deque()
+        self._size = 0
+        self.total_bytes = 0
+
+    def append(self, chunk: bytes) -> None:
+        self.total_bytes += len(chunk)
+        self._chunks.append(chunk)
+        self._size += len(chunk)
+        while self._size - len(self._chunks[0]) >= self.max_bytes:
+            self._size -= len(self._chunks.popleft())
+
+    @property
+    def truncated(self) -> bool:
+        return self.total_bytes > self.max_bytes
+
+    def getvalue(self) -> bytes:
+        return b"".join(self._chunks)[-self.max_bytes :]
+
+
+class OutputPatternMatched(CalledProcessError):
+    """
+    A process was killed because its output matched one of the 'abort_on' patterns
+    of a StreamedProcess. 'pattern' is the pattern that matched, 'line' the matching
+    line and 'context' the lines of output up to and including the matching line.
+    """
+
+    def __init__(
+        self,
+        returncode: int,
+        cmd,
+        output: bytes,
+        pattern: str,
+        line: bytes,
+        context: list[bytes],
+    ):
+        super().__init__(returncode, cmd, output=output)
+        self.pattern = pattern
+        self.line = line
+        self.context = context
+
+    def __str__(self):
+        context = "\n".join(
+            line.decode("utf-8", errors="replace").rstrip("\r") for line in self.context
+        )
+        return (
+            f"Command '{self.cmd}' was aborted because its output matched "
+            f"'{self.pattern}':\n{context}"
+        )
+
+
+def _compile_bytes_pattern(pattern: str | bytes | re.Pattern) -> re.Pattern:
+    if isinstance(pattern, re.Pattern):
+        if isinstance(pattern.pattern, bytes):
+            return pattern
+        return re.compile(pattern.pattern.encode(), pattern.flags & ~re.UNICODE)
+    if isinstance(pattern, str):
+        pattern = pattern.encode()
+    return re.compile(pattern)
+
+
+class OutputScanner:
+    """
+    Searches output for regular expressions while it arrives, line by line.
+    Output can be fed in arbitrary pieces; a line is searched once it is complete
+    (or when 'finish' is called for the last line). The last 'context_lines'
+    lines are kept to report the context of a match.
+    """
+
+    def __init__(
+        self, patterns: list[str | bytes | re.Pattern], context_lines: int = 10
+    ):
+        self.patterns = [_compile_bytes_pattern(pattern) for pattern in patterns]
+        self.pattern = None
+        self.line = None
+        self.context = None
+        self._partial = b""
+        self._recent = deque(maxlen=context_lines)
+
+    def feed(self, chunk: bytes) -> bool:
+        """
+        Add output and return whether a complete line of it matched.
+        Only the first match is reported.
+        """
+        if self.line is not None:
+            return False
+        *lines, partial = (self._partial + chunk).split(b"\n")
+        self._partial = partial[-_MAX_LINE_LENGTH:]
+        return any(self._search(line) for line in lines)
+
+    def finish(self) -> bool:
+        """
+        Search the last line when it did not end with a newline.
+        """
+        if self.line is not None:
+            return False
+        partial, self._partial = self._partial, b""
+        return bool(partial) and self._search(partial)
+
+    def _search(self, line: bytes) -> bool:
+        self._recent.append(line)
+        for pattern in self.patterns:
+            if pattern.search(line):
+                self.pattern = pattern.pattern.decode("utf-8", errors="replace")
+                self.line = line
+                self.context = list(self._recent)
+                return True
+        return False
+
+
+class StreamedProcess:
+    """
+    Runs a command and reads its output incrementally instead of
+    keeping all of it in memory.
+
+    Iterating over this object yields the output line by line (or in pieces of
+    at most 'chunk_size' bytes when it is set) while the process is running.
+    The output is optionally written to the file at 'tee', and only the last
+    'max_output_bytes' are kept in memory. When the process exits with
+    a non-zero exit code, a CalledProcessError is raised after all the output
+    has been consumed; its 'output' attribute contains the retained tail.
+
+    After the process has exited, its resource usage is available as 'rusage'
+    and 'on_exit' (if provided) is called with it.
+
+    When 'timeout' (in seconds) is set, the process is started in a new session and
+    its whole process group is killed when it did not finish in time. A TimeoutExpired
+    is then raised after the remaining output has been consumed; its 'output'
+    attribute contains the retained tail.
+
+    When 'abort_on' (a list of regular expressions) is set, each line of output is
+    searched while it arrives, and the process group is killed as soon as a line
+    matches. An OutputPatternMatched (a CalledProcessError) is raised instead of
+    returning normally, also when the process already exited successfully.
+
+    'on_kill' (if provided) is called after the process group was killed because of
+    the timeout or a matching line, e.g. to stop containers that were started by
+    the process. With a 'kill_grace_period', the process group gets that many seconds
+    to exit after SIGTERM before it is killed (see 'kill_process_group').
+    """
+
+    def __init__(
+        self,
+        command: list,
+        *,
+        stderr=STDOUT,
+        tee: str | Path | None = None,
+        max_output_bytes: int | None = None,
+        chunk_size: int | None = None,
+        on_exit: Callable | None = None,
+        timeout: float | None = None,
+        abort_on: list[str | bytes | re.Pattern] | None = None,
+        on_kill: Callable | None = None,
+        kill_grace_period: float = 0.0,
+        **popen_kwargs,
+    ):
+        if stderr == PIPE:
+            raise ValueError(
+                "Streaming the output of a process requires stderr to be "
+                "redirected to stdout (STDOUT) or discarded (DEVNULL)."
+            )
+        self.command = command
+        self.tee = Path(tee) if tee is not None else None
+        self.chunk_size = chunk_size
+        self.tail = OutputTail(max_output_bytes or DEFAULT_MAX_OUTPUT_BYTES)
+        self.returncode = None
+        self.rusage = None
+        self._on_exit = on_exit
+        self.timeout = timeout
+        self.timed_out = False
+        self.scanner = OutputScanner(abort_on) if abort_on else None
+        self.aborted = False
+        self._on_kill = on_kill
+        self._kill_grace_period = kill_grace_period
+        self._kill_lock = threading.Lock()
+        self._timer = None
+        if timeout is not None or self.scanner is not None:
+            popen_kwargs.setdefault("start_new_session", True)
+        self._process = Popen(command, stdout=PIPE, stderr=stderr, **popen_kwargs)
+        self._consumed = False
+        if timeout is not None:
+            self._timer = threading.Timer(timeout, self._expire)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _kill(self, reason: str) -> None:
+        with self._kill_lock:
+            # Do not use 'poll', which would reap the process before its resource
+            # usage is collected.
+            if self.timed_out or self.aborted or self._process.returncode is not None:
+                return
+            setattr(self, reason, True)
+            kill_process_group(self._process, self._kill_grace_period)
+        if self._on_kill is not None:
+            self._on_kill()
+
+    def _expire(self) -> None:
+        self._kill("timed_out")
+
+    def _read_output(self) -> Iterator[bytes]:
+        stdout = self._process.stdout
+        if self.chunk_size:
+            yield from iter(lambda: stdout.read1(self.chunk_size), b"")
+        else:
+            yield from iter(lambda: stdout.readline(_MAX_LINE_LENGTH), b"")
+
+    def __iter__(self) -> Iterator[bytes]:
+        if self._consumed:
+            return
+        self._consumed = True
+        tee_file = self.tee.open("wb") if self.tee else None
+        all_output_read = False
+        try:
+            for chunk in self._read_output():
+                self.tail.append(chunk)
+                if tee_file:
+                    tee_file.write(chunk)
+                if self.scanner is not None and self.scanner.feed(chunk):
+                    self._kill("aborted")
+                yield chunk
+            if self.scanner is not None and self.scanner.finish():
+                self._kill("aborted")
+            all_output_read = True
+        finally:
+            if tee_file:
+                tee_file.close()
+            self._process.stdout.close()
+            if not all_output_read:
+                # Stopped reading early, do not leave the process running.
+                kill_process_group(self._process, self._kill_grace_period)
+            self._finish(raise_on_error=all_output_read)
+
+    def _finish(self, raise_on_error: bool = True) -> None:
+        try:
+            self.returncode, self.rusage = wait_with_rusage(self._process)
+        except BaseException:
+            kill_process_group(self._process, self._kill_grace_period)
+            self._process.wait()
+            raise
+        finally:
+            if self._timer is not None:
+                self._timer.cancel()
+                # Wait for the cleanup of an expired timeout to finish.
+                self._timer.join()
+        if self._on_exit is not None:
+            self._on_exit(self.rusage)
+        if self.aborted and raise_on_error:
+            raise OutputPatternMatched(
+                self.returncode,
+                self.command,
+                self.tail.getvalue(),
+                self.scanner.pattern,
+                self.scanner.line,
+                self.scanner.context,
+            )
+        if self.timed_out and raise_on_error:
+            raise TimeoutExpired(
+                self.command, self.timeout, output=self.tail.getvalue()
+            )
+        if self.returncode and raise_on_error:
+            raise CalledProcessError(
+                self.returncode, self.command, output=self.tail.getvalue()
+            )
+
+    def wait(self) -> bytes:
+        """
+        Consume the remaining output, wait for the process to exit
+        and return the retained tail of the output.
+        """
+        for _ in self:
+            pass
+        return self.tail.getvalue()
+
+
+class RunTimeouts:
+    """
+    The time limits for running components: 'call_timeout' seconds for each run
+    and a deadline 'session_timeout' seconds after the creation of this object
+    for all runs. Either can be None (no limit).
+    """
+
+    def __init__(
+        self, call_timeout: float | None = None, session_timeout: float | None = None
+    ):
+        self.call_timeout = call_timeout
+        self.session_timeout = session_timeout
+        self._deadline = (
+            time.monotonic() + session_timeout if session_timeout is not None else None
+        )
+
+    def remaining(self) -> float | None:
+        """
+        The time that is left of the session timeout, or None without a session timeout.
+        """
+        if self._deadline is None:
+            return None
+        return max(self._deadline - time.monotonic(), 0.0)
+
+    def timeout(self, requested: float | None = None) -> float | None:
+        """
+        The timeout for a run: 'requested' (or 'call_timeout' when it is None),
+        limited to the time that is left of the session timeout.
+        """
+        timeout = requested if requested is not None else self.call_timeout
+        remaining = self.remaining()
+        if remaining is not None:
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        return timeout
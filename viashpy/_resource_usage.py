@@ -0,0 +1,254 @@
+from __future__ import annotations
+from subprocess import check_output, CalledProcessError, DEVNULL
+from threading import Event, Thread
+from ._timing import Phase
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Units used by 'docker stats' for memory usage
+_DOCKER_MEMORY_UNITS = {
+    "B": 1,
+    "KiB": 1024,
+    "MiB": 1024**2,
+    "GiB": 1024**3,
+    "TiB": 1024**4,
+    "kB": 1000,
+    "KB": 1000,
+    "MB": 1000**2,
+    "GB": 1000**3,
+    "TB": 1000**4,
+}
+
+# CPU utilization is not meaningful for runs that are shorter than this (in seconds),
+# e.g. because most of the time is spent on starting an interpreter.
+MIN_DURATION_FOR_CPU_CHECK = 1.0
+
+
+class ResourceUsageWarning(UserWarning):
+    """
+    A component used more resources than it declared, or much less.
+    """
+
+
+class ResourceUsage:
+    """
+    The measured resource usage of a single run of a component: the peak memory
+    usage (RSS) and the CPU utilization (the average number of CPUs in use).
+    'source' describes how the usage was measured ('rusage' or 'docker stats').
+    """
+
+    def __init__(
+        self,
+        *,
+        wall_time: float | None,
+        peak_memory_bytes: int | None,
+        cpu_utilization: float | None,
+        source: str,
+    ):
+        self.wall_time = wall_time
+        self.peak_memory_bytes = peak_memory_bytes
+        self.cpu_utilization = cpu_utilization
+        self.source = source
+
+    @classmethod
+    def from_phase(cls, phase: Phase) -> ResourceUsage:
+        cpu_utilization = None
+        if phase.cpu_user is not None and phase.wall_time:
+            cpu_utilization = (phase.cpu_user + phase.cpu_system) / phase.wall_time
+        return cls(
+            wall_time=phase.wall_time,
+            peak_memory_bytes=phase.max_rss_bytes,
+            cpu_utilization=cpu_utilization,
+            source="rusage",
+        )
+
+    @classmethod
+    def not_measured(cls, wall_time: float | None) -> ResourceUsage:
+        """
+        The usage of a run that could not be measured, e.g. a docker run that was
+        shorter than the sampling interval of 'DockerStatsSampler'.
+        """
+        return cls(
+            wall_time=wall_time,
+            peak_memory_bytes=None,
+            cpu_utilization=None,
+            source="not measured",
+        )
+
+
+def _parse_docker_memory(memory: str) -> int:
+    match = re.fullmatch(r"([0-9.]+)\s*([A-Za-z]+)", memory.strip())
+    if not match or match.group(2) not in _DOCKER_MEMORY_UNITS:
+        raise ValueError(f"Could not parse memory usage '{memory}'.")
+    return int(float(match.group(1)) * _DOCKER_MEMORY_UNITS[match.group(2)])
+
+
+class DockerStatsSampler:
+    """
+    Samples the CPU and memory usage of the running containers with the label 'label'
+    (e.g. 'viashpy.run=<uuid>') using 'docker stats' in a background thread, while
+    used as a context manager. Give each run its own label, so that containers of
+    the same image that are started by other runs are not included.
+    """
+
+    def __init__(
+        self, label: str, docker_executable: str = "docker", interval: float = 0.5
+    ):
+        self.label = label
+        self.docker_executable = docker_executable
+        self.interval = interval
+        self.samples = []
+        self._stop = Event()
+        self._thread = Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except (CalledProcessError, OSError, ValueError) as e:
+                logger.debug("Could not sample the usage of %s: %s", self.label, e)
+
+    def sample(self) -> None:
+        container_ids = check_output(
+            [
+                self.docker_executable,
+                "ps",
+                "--quiet",
+                "--filter",
+                f"label={self.label}",
+            ],
+            stderr=DEVNULL,
+        ).split()
+        if not container_ids:
+            return
+        stats = check_output(
+            [
+                self.docker_executable,
+                "stats",
+                "--no-stream",
+                "--format",
+                "{{.CPUPerc}}\t{{.MemUsage}}",
+                *map(bytes.decode, container_ids),
+            ],
+            stderr=DEVNULL,
+        ).decode()
+        cpu_utilization, memory_bytes = 0.0, 0
+        for line in stats.splitlines():
+            cpu_percentage, memory_usage = line.split("\t")
+            cpu_utilization += float(cpu_percentage.strip().rstrip("%")) / 100
+            memory_bytes += _parse_docker_memory(memory_usage.split("/")[0])
+        self.samples.append((cpu_utilization, memory_bytes))
+
+    def __enter__(self) -> DockerStatsSampler:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def usage(self, wall_time: float | None) -> ResourceUsage | None:
+        """
+        The usage of the containers, or None when no samples were taken
+        (e.g. because the run was shorter than the sampling interval).
+        """
+        if not self.samples:
+            return None
+        cpu_utilizations, memory_usages = zip(*self.samples)
+        return ResourceUsage(
+            wall_time=wall_time,
+            peak_memory_bytes=max(memory_usages),
+            cpu_utilization=sum(cpu_utilizations) / len(cpu_utilizations),
+            source="docker stats",
+        )
+
+
+def _format_bytes(number_of_bytes: int) -> str:
+    return f"{number_of_bytes / 1024**2:.1f} MiB"
+
+
+def check_declared_resources(
+    usage: ResourceUsage,
+    cpus: int | None,
+    memory_bytes: int | None,
+    underuse_fraction: float,
+) -> list[str]:
+    """
+    Compare the measured usage of a run against the declared CPUs and memory.
+    Returns a message for each resource that was exceeded, or of which less than
+    'underuse_fraction' of the declared amount was used.
+    """
+    messages = []
+    if memory_bytes and usage.peak_memory_bytes is not None:
+        if usage.peak_memory_bytes > memory_bytes:
+            messages.append(
+                f"The component used {_format_bytes(usage.peak_memory_bytes)} of memory, "
+                f"more than the {_format_bytes(memory_bytes)} that it declared."
+            )
+        elif usage.peak_memory_bytes < underuse_fraction * memory_bytes:
+            messages.append(
+                f"The component used only {_format_bytes(usage.peak_memory_bytes)} of "
+                f"the {_format_bytes(memory_bytes)} of memory that it declared."
+            )
+    if (
+        cpus
+        and usage.cpu_utilization is not None
+        and (usage.wall_time or 0) >= MIN_DURATION_FOR_CPU_CHECK
+    ):
+        if usage.cpu_utilization > cpus:
+            messages.append(
+                f"The component used {usage.cpu_utilization:.2f} CPUs on average, "
+                f"more than the {cpus} that it declared."
+            )
+        elif usage.cpu_utilization < underuse_fraction * cpus:
+            messages.append(
+                f"The component used only {usage.cpu_utilization:.2f} CPUs on average "
+                f"of the {cpus} that it declared."
+            )
+    return messages
+
+
+class ResourceUsageReport:
+    """
+    Collects the resource usage of the runs of a component in a test, together
+    with the declared CPUs and memory, see the 'viash_resource_usage' fixture.
+    """
+
+    def __init__(self, underuse_fraction: float):
+        self.underuse_fraction = underuse_fraction
+        self.runs = []
+
+    def add(
+        self,
+        args: list[str],
+        usage: ResourceUsage,
+        cpus: int | None,
+        memory_bytes: int | None,
+    ) -> list[str]:
+        """
+        Add the usage of a run and return the messages about the declared resources.
+        """
+        self.runs.append((args, usage, cpus, memory_bytes))
+        return check_declared_resources(
+            usage, cpus, memory_bytes, self.underuse_fraction
+        )
+
+    def format(self) -> str:
+        def format_value(value, fmt):
+            return "-" if value is None else fmt(value)
+
+        lines = [
+            f"{'declared CPUs':>14}{'used CPUs':>11}{'declared memory':>17}"
+            f"{'peak memory':>14}  {'source':<14}arguments"
+        ]
+        for args, usage, cpus, memory_bytes in self.runs:
+            lines.append(
+                f"{format_value(cpus, str):>14}"
+                f"{format_value(usage.cpu_utilization, lambda value: f'{value:.2f}'):>11}"
+                f"{format_value(memory_bytes, _format_bytes):>17}"
+                f"{format_value(usage.peak_memory_bytes, _format_bytes):>14}"
+                f"  {usage.source:<14}{' '.join(map(str, args))}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,253 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Condition
+from typing import Callable, Iterable
+from ._cache import file_lock, read_json, write_json_atomic
+from ._run import tobytesconverter
+import asyncio
+import os
+import re
+import time
+import uuid
+
+
+def host_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover
+        return os.cpu_count() or 1
+
+
+def host_memory_bytes() -> int | None:
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):  # pragma: no cover
+        return None
+
+
+def memory_to_bytes(memory: str | None) -> int | None:
+    """
+    Convert a memory specifier with a unit suffix (e.g. '6442450944B', '6GB')
+    as passed to '---memory' to a number of bytes. The unit is case insensitive
+    and may be separated from the number by spaces (e.g. '6 gb').
+    """
+    if not memory:
+        return None
+    memory_match = re.fullmatch(
+        r"([0-9]+(?:\.[0-9]+)?)([A-Z]+)", memory.replace(" ", "").upper()
+    )
+    if (
+        not memory_match
+        or memory_match.group(2) not in tobytesconverter.AVAILABLE_UNITS()
+    ):
+        raise ValueError(f"Could not parse memory specifier '{memory}'.")
+    value, unit = memory_match.groups()
+    return int(tobytesconverter(float(value), unit))
+
+
+class ResourcePool:
+    """
+    Keeps track of the CPUs and memory that are in use by the components
+    that are running in this process. Reserving resources blocks until enough
+    of them are available. A request that is larger than the total capacity
+    is reduced to the capacity, so that it can still run (on its own).
+    """
+
+    def __init__(self, cpus: int | None = None, memory_bytes: int | None = None):
+        self.cpus = cpus or host_cpus()
+        self.memory_bytes = memory_bytes or host_memory_bytes()
+        self._cpus_in_use = 0
+        self._memory_in_use = 0
+        self._condition = Condition()
+
+    def _clamp(self, cpus: int | None, memory_bytes: int | None):
+        cpus = min(cpus or 1, self.cpus)
+        memory_bytes = memory_bytes or 0
+        if self.memory_bytes is not None:
+            memory_bytes = min(memory_bytes, self.memory_bytes)
+        return cpus, memory_bytes
+
+    def _fits(
+        self, cpus: int, memory_bytes: int, cpus_in_use: int, memory_in_use: int
+    ) -> bool:
+        if cpus_in_use + cpus > self.cpus:
+            return False
+        if self.memory_bytes is None:
+            return True
+        return memory_in_use + memory_bytes <= self.memory_bytes
+
+    @contextmanager
+    def reserve(self, cpus: int | None, memory_bytes: int | None):
+        cpus, memory_bytes = self._clamp(cpus, memory_bytes)
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._fits(
+                    cpus, memory_bytes, self._cpus_in_use, self._memory_in_use
+                )
+            )
+            self._cpus_in_use += cpus
+            self._memory_in_use += memory_bytes
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._cpus_in_use -= cpus
+                self._memory_in_use -= memory_bytes
+                self._condition.notify_all()
+
+
+def _pid_is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # pragma: no cover
+        return True
+    return True
+
+
+class FileResourcePool(ResourcePool):
+    """
+    A 'ResourcePool' that is shared between processes (e.g. pytest-xdist workers).
+    The reservations are stored as json in 'state_dir', which is only accessed while
+    holding a lock file. Reservations of processes that are no longer running
+    (e.g. a worker that crashed) are removed, so their resources become available again.
+
+    Waiting for resources polls the state, with an interval that grows up to
+    'max_poll_interval' seconds.
+    """
+
+    def __init__(
+        self,
+        state_dir: str | Path,
+        cpus: int | None = None,
+        memory_bytes: int | None = None,
+        max_poll_interval: float = 0.5,
+    ):
+        super().__init__(cpus, memory_bytes)
+        state_dir = Path(state_dir)
+        state_dir.mkdir(parents=True, exist_ok=True)
+        self._state_file = state_dir / "reservations.json"
+        self._lock_file = state_dir / "reservations.lock"
+        self.max_poll_interval = max_poll_interval
+
+    def _live_reservations(self) -> dict:
+        reservations = read_json(self._state_file) or {}
+        return {
+            reservation_id: reservation
+            for reservation_id, reservation in reservations.items()
+            if _pid_is_alive(reservation["pid"])
+        }
+
+    def reservations(self) -> dict:
+        """
+        The current reservations of all processes, keyed on their ID.
+        """
+        with file_lock(self._lock_file):
+            return self._live_reservations()
+
+    def try_acquire(self, cpus: int | None, memory_bytes: int | None) -> str | None:
+        """
+        Reserve resources when they are available, without waiting.
+        Returns the ID of the reservation (to pass to 'release') or None.
+        """
+        cpus, memory_bytes = self._clamp(cpus, memory_bytes)
+        with file_lock(self._lock_file):
+            reservations = self._live_reservations()
+            cpus_in_use = sum(r["cpus"] for r in reservations.values())
+            memory_in_use = sum(r["memory_bytes"] for r in reservations.values())
+            if not self._fits(cpus, memory_bytes, cpus_in_use, memory_in_use):
+                return None
+            reservation_id = uuid.uuid4().hex
+            reservations[reservation_id] = {
+                "pid": os.getpid(),
+                "cpus": cpus,
+                "memory_bytes": memory_bytes,
+            }
+            write_json_atomic(self._state_file, reservations)
+            return reservation_id
+
+    def acquire(self, cpus: int | None, memory_bytes: int | None) -> str:
+        """
+        Wait until the resources are available and reserve them.
+        Returns the ID of the reservation, to pass to 'release'.
+        """
+        poll_interval = 0.01
+        while (reservation_id := self.try_acquire(cpus, memory_bytes)) is None:
+            time.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, self.max_poll_interval)
+        return reservation_id
+
+    async def acquire_async(self, cpus: int | None, memory_bytes: int | None) -> str:
+        """
+        Like 'acquire', but waits with 'asyncio.sleep', so that waiting
+        does not occupy a thread of the executor of the event loop.
+        """
+        poll_interval = 0.01
+        while (reservation_id := self.try_acquire(cpus, memory_bytes)) is None:
+            await asyncio.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, self.max_poll_interval)
+        return reservation_id
+
+    def release(self, reservation_id: str) -> None:
+        with file_lock(self._lock_file):
+            reservations = self._live_reservations()
+            reservations.pop(reservation_id, None)
+            write_json_atomic(self._state_file, reservations)
+
+    @contextmanager
+    def reserve(self, cpus: int | None, memory_bytes: int | None):
+        reservation_id = self.acquire(cpus, memory_bytes)
+        try:
+            yield
+        finally:
+            self.release(reservation_id)
+
+
+def run_batch(
+    run: Callable,
+    arg_lists: Iterable[list[str]],
+    *,
+    cpus: int | None = None,
+    memory_bytes: int | None = None,
+    max_workers: int | None = None,
+    resource_pool: ResourcePool | None = None,
+    return_exceptions: bool = False,
+    **run_kwargs,
+) -> list:
+    """
+    Call 'run' for each of the argument lists concurrently, while making sure that
+    the sum of the declared CPUs and memory of the running components does not exceed
+    the capacity of the 'resource_pool' (the whole host by default).
+
+    The results are returned in the order of 'arg_lists'. If 'return_exceptions' is
+    set, the exception raised by a failed run is returned in place of its result
+    (a CalledProcessError holds the output of that run). Otherwise, the first
+    exception (in input order) is raised after all runs have finished.
+    """
+    arg_lists = list(arg_lists)
+    if not arg_lists:
+        return []
+    resource_pool = resource_pool or ResourcePool()
+    max_workers = min(max_workers or resource_pool.cpus, len(arg_lists))
+
+    def run_one(args):
+        with resource_pool.reserve(cpus, memory_bytes):
+            return run(args, **run_kwargs)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_one, args) for args in arg_lists]
+        wait(futures)
+
+    results = []
+    for future in futures:
+        exception = future.exception()
+        if exception is None:
+            results.append(future.result())
+        elif return_exceptions:
+            results.append(exception)
+        else:
+            raise exception
+    return results
@@ -0,0 +1,275 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Iterable
+from ._cache import file_lock, read_json, write_json_atomic, hash_file
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+_CHUNK_SIZE = 1 << 20
+
+
+def _split_arg(arg: str) -> tuple[str, str]:
+    """
+    Split an argument specified as '--name=value' into '--name=' and the value.
+    Other arguments are returned as the value, with an empty prefix.
+    """
+    if arg.startswith("-") and "=" in arg:
+        prefix, value = arg.split("=", 1)
+        return prefix + "=", value
+    return "", arg
+
+
+def _path_args(args: Iterable[str], cwd: Path) -> dict[int, Path]:
+    """
+    The arguments of a component that could be paths, keyed on their position:
+    the arguments themselves, or their values when specified as '--name=value'.
+    """
+    paths = {}
+    for index, arg in enumerate(map(str, args)):
+        _, value = _split_arg(arg)
+        if value:
+            paths[index] = cwd / value
+    return paths
+
+
+def _files_in(path: Path) -> list[Path]:
+    if path.is_file():
+        return [path]
+    return sorted(member for member in path.rglob("*") if member.is_file())
+
+
+def _fingerprint(path: Path) -> str:
+    """
+    Hash of the contents of a file, or of the names and contents
+    of the files in a directory.
+    """
+    hasher = hashlib.sha256(b"file" if path.is_file() else b"directory")
+    for file_path in _files_in(path):
+        hasher.update(
+            b"\0"
+            + str(file_path.relative_to(path)).encode()
+            + b"\0"
+            + hash_file(file_path).encode()
+        )
+    return hasher.hexdigest()
+
+
+def _normalize_path(value: str, roots: Iterable[Path]) -> str:
+    """
+    Replace an absolute path in one of 'roots' (e.g. the temporary directory
+    of the session, which changes every session) by a path relative to that root.
+    The most specific root is used.
+    """
+    path = Path(value)
+    if not path.is_absolute():
+        return value
+    for index, root in sorted(
+        enumerate(roots), key=lambda item: len(item[1].parts), reverse=True
+    ):
+        if path.is_relative_to(root):
+            return f"<root {index}>/{path.relative_to(root)}"
+    return value
+
+
+class ResultCache:
+    """
+    Content-addressed cache for the results of running a component.
+
+    A result is keyed on the identity of the component (e.g. the hash of
+    its config and the ID of its docker image), the arguments and the contents
+    of the input files that are passed as arguments. Input files are keyed on their
+    contents only, not their location. Absolute paths in the arguments are made
+    relative to the directories in 'roots' (e.g. the temporary directory of the
+    session), so that results can be replayed in later sessions.
+
+    The captured output and the output files of the component (arguments that point
+    to a path that was created or changed by the component) are stored in
+    a content-addressed store ('blobs'), so that identical files are only stored once.
+    Which arguments are outputs is remembered for the next runs with the same
+    arguments, so that the outputs of an earlier run are not mistaken for inputs.
+
+    When the total size of the stored files exceeds 'max_size_bytes', the least
+    recently used results are removed.
+    """
+
+    def __init__(self, root: str | Path, max_size_bytes: int | None = None):
+        self.root = Path(root)
+        self.max_size_bytes = max_size_bytes
+        self._blobs = self.root / "blobs"
+        self._entries = self.root / "entries"
+        self._outputs = self.root / "outputs"
+        self._blobs.mkdir(parents=True, exist_ok=True)
+        self._entries.mkdir(parents=True, exist_ok=True)
+        self._outputs.mkdir(parents=True, exist_ok=True)
+
+    def snapshot(self, args: list[str], cwd: str | Path) -> dict[int, str]:
+        """
+        The fingerprints of the arguments that point to an existing path, keyed
+        on their position. Take a snapshot before running the component and pass it
+        to 'key' and 'store'.
+        """
+        return {
+            index: _fingerprint(path)
+            for index, path in _path_args(args, Path(cwd)).items()
+            if path.exists()
+        }
+
+    def _normalized_args(
+        self, identity: Iterable, args: list[str], roots: list[Path]
+    ) -> list[str]:
+        normalized = [f"identity:{part}" for part in identity]
+        for arg in map(str, args):
+            prefix, value = _split_arg(arg)
+            normalized.append(f"arg:{prefix}{_normalize_path(value, roots)}")
+        return normalized
+
+    def _outputs_file(self, normalized_args: list[str]) -> Path:
+        digest = hashlib.sha256("\0".join(normalized_args).encode()).hexdigest()
+        return self._outputs / f"{digest}.json"
+
+    def key(
+        self,
+        identity: Iterable,
+        args: list[str],
+        cwd: str | Path,
+        roots: Iterable[str | Path] = (),
+        snapshot: dict[int, str] | None = None,
+    ) -> str:
+        """
+        The key of the result of running the component identified by 'identity'
+        with 'args' in 'cwd'. 'snapshot' defaults to the current state of the inputs.
+        """
+        roots = [Path(root) for root in roots] or [Path(cwd)]
+        if snapshot is None:
+            snapshot = self.snapshot(args, cwd)
+        identity = list(identity)
+        normalized_args = self._normalized_args(identity, args, roots)
+        outputs = set(read_json(self._outputs_file(normalized_args)) or [])
+        hasher = hashlib.sha256()
+        for part in normalized_args[: len(identity)]:
+            hasher.update(b"\0" + part.encode())
+        for index, part in enumerate(normalized_args[len(identity) :]):
+            if index in snapshot and index not in outputs:
+                # Key inputs on their contents, not on their location.
+                prefix, _ = _split_arg(str(args[index]))
+                part = f"input:{prefix}{snapshot[index]}"
+            hasher.update(b"\0" + part.encode())
+        return hasher.hexdigest()
+
+    def _store_blob(self, source: Path | bytes) -> str:
+        with tempfile.NamedTemporaryFile(dir=self._blobs, delete=False) as temp_file:
+            if isinstance(source, bytes):
+                temp_file.write(source)
+            else:
+                with source.open("rb") as open_source:
+                    shutil.copyfileobj(open_source, temp_file, _CHUNK_SIZE)
+        digest = hash_file(Path(temp_file.name))
+        os.replace(temp_file.name, self._blobs / digest)
+        return digest
+
+    def store(
+        self,
+        identity: Iterable,
+        args: list[str],
+        cwd: str | Path,
+        output: bytes,
+        snapshot: dict[int, str],
+        roots: Iterable[str | Path] = (),
+    ) -> str:
+        """
+        Store the output of a run and the files that it created or changed,
+        and return the key of the result. 'snapshot' is the result of 'snapshot'
+        before the run.
+        """
+        cwd = Path(cwd)
+        roots = [Path(root) for root in roots] or [cwd]
+        identity = list(identity)
+        outputs = {
+            index: path
+            for index, path in _path_args(args, cwd).items()
+            if path.exists() and _fingerprint(path) != snapshot.get(index)
+        }
+        files = []
+        with file_lock(self.root / "lock"):
+            write_json_atomic(
+                self._outputs_file(self._normalized_args(identity, args, roots)),
+                sorted(outputs),
+            )
+            key = self.key(identity, args, cwd, roots, snapshot)
+            for index, path in outputs.items():
+                for file_path in _files_in(path):
+                    files.append(
+                        {
+                            "arg": index,
+                            "path": str(file_path.relative_to(path)),
+                            "blob": self._store_blob(file_path),
+                            "mode": file_path.stat().st_mode & 0o777,
+                        }
+                    )
+            entry = {"output": self._store_blob(output or b""), "files": files}
+            write_json_atomic(self._entries / f"{key}.json", entry)
+            self._evict()
+        return key
+
+    def replay(self, key: str, args: list[str], cwd: str | Path) -> bytes | None:
+        """
+        Recreate the output files of a stored result at the locations given by
+        'args' and return the captured output, or return None when there is no
+        stored result for 'key'.
+        """
+        entry_file = self._entries / f"{key}.json"
+        entry = read_json(entry_file)
+        if entry is None:
+            return None
+        paths = _path_args(args, Path(cwd))
+        try:
+            output = (self._blobs / entry["output"]).read_bytes()
+            for stored_file in entry["files"]:
+                destination = paths[stored_file["arg"]] / stored_file["path"]
+                destination.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(self._blobs / stored_file["blob"], destination)
+                destination.chmod(stored_file["mode"])
+            # Mark as recently used
+            os.utime(entry_file)
+        except FileNotFoundError:
+            # The entry was evicted by another process while replaying it
+            return None
+        logger.debug("Replayed result %s from the cache", key)
+        return output
+
+    def _evict(self) -> None:
+        if self.max_size_bytes is None:
+            return
+        blob_sizes = {blob.name: blob.stat().st_size for blob in self._blobs.iterdir()}
+        if sum(blob_sizes.values()) <= self.max_size_bytes:
+            return
+        entries = sorted(
+            self._entries.glob("*.json"), key=lambda entry: entry.stat().st_mtime_ns
+        )
+        referenced = {}
+        for entry_file in entries:
+            entry = read_json(entry_file) or {"files": []}
+            referenced[entry_file] = {entry.get("output")} | {
+                stored_file["blob"] for stored_file in entry["files"]
+            }
+        total_size = sum(
+            blob_sizes.get(blob, 0) for blob in set().union(*referenced.values())
+        )
+        while entries and total_size > self.max_size_bytes:
+            entry_file = entries.pop(0)
+            logger.debug("Evicting result %s from the cache", entry_file.stem)
+            entry_file.unlink()
+            removed_blobs = referenced.pop(entry_file)
+            still_referenced = set().union(*referenced.values())
+            total_size -= sum(
+                blob_sizes.get(blob, 0) for blob in removed_blobs - still_referenced
+            )
+        still_referenced = set().union(*referenced.values())
+        for blob in blob_sizes:
+            if blob not in still_referenced:
+                (self._blobs / blob).unlink(missing_ok=True)
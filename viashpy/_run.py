@@ -1,13 +1,40 @@
 from __future__ import annotations
-from subprocess import check_output, STDOUT, DEVNULL, PIPE, CalledProcessError
+from subprocess import (
+    check_output,
+    STDOUT,
+    DEVNULL,
+    PIPE,
+    CalledProcessError,
+    TimeoutExpired,
+)
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, TYPE_CHECKING
 from .types import Engine, Platform
+from ._docker import remove_labeled_containers
+from ._process import StreamedProcess
+from ._timing import PhaseRecorder, record_phase
+from ._cache import user_cache_dir, file_lock, read_json, write_json_atomic
+from functools import partial
+import asyncio
+import hashlib
 import logging
+import os
 import re
+import shutil
+import signal
+import sys
+import uuid
+
+if TYPE_CHECKING:
+    from ._build import DockerBuildRegistry
 
 logger = logging.getLogger(__name__)
 
+# Seconds that a built component gets to exit after SIGTERM when it is killed
+# (e.g. because of a timeout). The script of a built component forwards the
+# signal to its docker container, which is not stopped by SIGKILL.
+BUILT_COMPONENT_KILL_GRACE_PERIOD = 10.0
+
 
 class ToBytesConverter:
     # These need to be defined in order from smallest to largest!
@@ -50,7 +77,70 @@ def _format_cpu_and_memory(cpus, memory, arg_prefix="---"):
     return result
 
 
+# In-process memo for the viash version, keyed on the identity of the executable.
+_viash_version_cache: dict[tuple, tuple[int, int, int]] = {}
+
+
+def _viash_executable_identity(viash_executable):
+    """
+    Identify a viash executable by its resolved location, modification time
+    and size. Returns None when the executable can not be found, in which
+    case the version can not be cached safely.
+    """
+    resolved = shutil.which(str(viash_executable))
+    if resolved is None:
+        return None
+    resolved = Path(resolved).resolve()
+    try:
+        stat_result = resolved.stat()
+    except OSError:
+        return None
+    return (
+        str(viash_executable),
+        str(resolved),
+        stat_result.st_mtime_ns,
+        stat_result.st_size,
+    )
+
+
 def _get_viash_version(viash_executable):
+    """
+    Return the version of viash as a tuple of integers.
+
+    Running 'viash --version' starts a JVM, so the result is memoized in-process
+    and stored on disk (see 'user_cache_dir'), keyed on the identity of the executable.
+    This way, other processes (e.g. pytest-xdist workers) and later sessions reuse the result.
+    """
+    identity = _viash_executable_identity(viash_executable)
+    if identity is None:
+        return _probe_viash_version(viash_executable)
+    try:
+        return _viash_version_cache[identity]
+    except KeyError:
+        pass
+    try:
+        cache_dir = user_cache_dir("viash_version")
+    except OSError:
+        logger.debug("Could not create the viash version cache, not caching.")
+        version = _probe_viash_version(viash_executable)
+    else:
+        key = hashlib.sha256("\0".join(map(str, identity)).encode()).hexdigest()
+        cache_file = cache_dir / f"{key}.json"
+        # Only one process runs 'viash --version', the others wait and read the result.
+        with file_lock(cache_dir / f"{key}.lock"):
+            cached = read_json(cache_file)
+            if cached and cached.get("identity") == list(identity):
+                version = tuple(cached["version"])
+            else:
+                version = _probe_viash_version(viash_executable)
+                write_json_atomic(
+                    cache_file, {"identity": list(identity), "version": list(version)}
+                )
+    _viash_version_cache[identity] = version
+    return version
+
+
+def _probe_viash_version(viash_executable):
     try:
         version_string = check_output([viash_executable, "--version"]).decode().strip()
         version_pattern = re.compile(
@@ -102,6 +192,87 @@ def _check_platform_or_engine(
         return "engine", engine
 
 
+def _run_command(
+    command: list,
+    *,
+    stderr: STDOUT | PIPE | DEVNULL | -1 | -2 | -3 = STDOUT,
+    stream: bool = False,
+    tee: str | Path | None = None,
+    max_output_bytes: int | None = None,
+    recorder: PhaseRecorder | None = None,
+    phase: str = "run",
+    timeout: float | None = None,
+    abort_on: list[str | bytes | re.Pattern] | None = None,
+    on_kill: Callable | None = None,
+    kill_grace_period: float = 0.0,
+    **popen_kwargs,
+):
+    """
+    Run a command and return its output. By default, all output is captured
+    in memory. When 'stream' is set, a StreamedProcess is returned that yields
+    the output line by line while the command runs. When 'tee' or 'max_output_bytes'
+    is set, the output is written to the 'tee' file (if provided) and only the last
+    'max_output_bytes' bytes are kept in memory and returned.
+
+    When a 'recorder' is provided, the wall time and resource usage of
+    the command are recorded as a phase named 'phase'.
+
+    When the command did not finish within 'timeout' seconds, its whole process
+    group is killed and 'subprocess.TimeoutExpired' is raised with the output up to
+    that point. When a line of output matches one of the regular expressions in
+    'abort_on', the process group is killed right away and 'OutputPatternMatched'
+    is raised. In both cases, 'on_kill' is called after killing the process group,
+    which first gets 'kill_grace_period' seconds to exit after SIGTERM
+    (see 'StreamedProcess').
+    """
+    logger.debug("Running '%s'", " ".join(map(str, command)))
+    limit_output = stream or tee or max_output_bytes
+    # Resource usage is only available when waiting for the process ourselves,
+    # which requires reading its output from a single pipe.
+    measure_usage = recorder is not None and stderr != PIPE
+    supervise = timeout is not None or bool(abort_on)
+    if supervise and stderr == PIPE:
+        raise ValueError(
+            "A timeout or 'abort_on' requires stderr to be redirected to stdout "
+            "(STDOUT) or discarded (DEVNULL)."
+        )
+    if not (limit_output or measure_usage or supervise):
+        with record_phase(recorder, phase):
+            return check_output(command, stderr=stderr, **popen_kwargs)
+    if not limit_output:
+        # Keep all output in memory, like check_output does.
+        max_output_bytes = sys.maxsize
+    process = StreamedProcess(
+        command,
+        stderr=stderr,
+        tee=tee,
+        max_output_bytes=max_output_bytes,
+        on_exit=recorder.start(phase).finish if recorder is not None else None,
+        timeout=timeout,
+        abort_on=abort_on,
+        on_kill=on_kill,
+        kill_grace_period=kill_grace_period,
+        **popen_kwargs,
+    )
+    if stream:
+        return process
+    return process.wait()
+
+
+def _build_component_command(
+    executable_location: str | Path,
+    args: list[str],
+    cpus: int | None,
+    memory: str | None,
+) -> list:
+    executable_location = Path(executable_location)
+    if not executable_location.is_file():
+        raise FileNotFoundError(
+            f"{executable_location} does not exist or is not a file."
+        )
+    return [executable_location] + args + _format_cpu_and_memory(cpus, memory)
+
+
 def run_build_component(
     executable_location: str | Path,
     args: list[str],
@@ -109,16 +280,110 @@ def run_build_component(
     cpus: int | None = None,
     memory: str | None,
     stderr: STDOUT | PIPE | DEVNULL | -1 | -2 | -3 = STDOUT,
+    stream: bool = False,
+    tee: str | Path | None = None,
+    max_output_bytes: int | None = None,
+    recorder: PhaseRecorder | None = None,
+    timeout: float | None = None,
+    abort_on: list[str | bytes | re.Pattern] | None = None,
     **popen_kwargs,
 ):
-    executable_location = Path(executable_location)
-    if not executable_location.is_file():
-        raise FileNotFoundError(
-            f"{executable_location} does not exist or is not a file."
+    """
+    Run a component that was built with 'viash build'.
+    See '_run_command' for the 'stream', 'tee', 'max_output_bytes', 'recorder',
+    'timeout' and 'abort_on' arguments. When the component is killed, it first
+    gets 'BUILT_COMPONENT_KILL_GRACE_PERIOD' seconds to stop its docker container.
+    """
+    full_command = _build_component_command(executable_location, args, cpus, memory)
+    return _run_command(
+        full_command,
+        stderr=stderr,
+        stream=stream,
+        tee=tee,
+        max_output_bytes=max_output_bytes,
+        recorder=recorder,
+        timeout=timeout,
+        abort_on=abort_on,
+        kill_grace_period=BUILT_COMPONENT_KILL_GRACE_PERIOD,
+        **popen_kwargs,
+    )
+
+
+def _resolve_viash_run(
+    config: str | Path,
+    engine: Engine | None,
+    platform: Platform | None,
+    viash_location: str | Path,
+):
+    """
+    Check the config and determine which of 'engine' or 'platform' must be
+    passed to 'viash run' (and its value), based on the version of viash.
+    """
+    config = Path(config)
+    if not config.is_file():
+        raise FileNotFoundError(f"{config} does not exist or is not a file.")
+    viash_version = _get_viash_version(viash_location)
+    platform_or_engine, engine_or_platform_val = _check_platform_or_engine(
+        viash_version, engine=engine, platform=platform
+    )
+    return config, viash_version, platform_or_engine, engine_or_platform_val
+
+
+def _viash_run_base_command(
+    config: Path,
+    platform_or_engine: str,
+    engine_or_platform_val: str,
+    viash_location: str | Path,
+) -> list:
+    return [
+        viash_location,
+        "run",
+        config,
+        f"--{platform_or_engine}",
+        engine_or_platform_val,
+        "-c",
+        f".{platform_or_engine}s[.type == 'docker'].target_tag := 'test'",
+    ]
+
+
+def _setup_docker_image(
+    config: Path,
+    viash_version: tuple[int, int, int],
+    platform_or_engine: str,
+    base_command: list,
+    viash_location: str | Path,
+    *,
+    build_registry: DockerBuildRegistry | None,
+    recorder: PhaseRecorder | None,
+    stderr: STDOUT | PIPE | DEVNULL | -1 | -2 | -3,
+    **popen_kwargs,
+):
+    """
+    Build the docker image of a component using the 'cachedbuild' setup strategy,
+    only once per session when a 'build_registry' is provided.
+    """
+    build_args = base_command + ["--", "---setup", "cachedbuild"]
+
+    def build_docker_image():
+        logger.debug("Building docker image: %s", " ".join(map(str, build_args)))
+        # CalledProcessError should be handled by caller
+        if recorder is None:
+            return check_output(build_args, stderr=stderr, **popen_kwargs)
+        return _run_command(
+            build_args,
+            stderr=stderr,
+            recorder=recorder,
+            phase="setup",
+            **popen_kwargs,
         )
-    full_command = [executable_location] + args + _format_cpu_and_memory(cpus, memory)
-    logger.debug("Running '%s'", " ".join(map(str, full_command)))
-    return check_output(full_command, stderr=stderr, **popen_kwargs)
+
+    if build_registry is None:
+        build_docker_image()
+    else:
+        build_key = build_registry.key(
+            config, viash_location, viash_version, platform_or_engine
+        )
+        build_registry.ensure_built(build_key, build_docker_image)
 
 
 def viash_run(
@@ -131,46 +396,291 @@ def viash_run(
     platform: Platform | None = None,
     viash_location: str | Path = "viash",
     stderr: STDOUT | PIPE | DEVNULL | -1 | -2 | -3 = STDOUT,
+    build_registry: DockerBuildRegistry | None = None,
+    stream: bool = False,
+    tee: str | Path | None = None,
+    max_output_bytes: int | None = None,
+    recorder: PhaseRecorder | None = None,
+    timeout: float | None = None,
+    abort_on: list[str | bytes | re.Pattern] | None = None,
+    container_label: str | None = None,
     **popen_kwargs,
 ):
-    config = Path(config)
-    if not config.is_file():
-        raise FileNotFoundError(f"{config} does not exist or is not a file.")
-    args = ["--"] + args
+    """
+    Run a component from its source config using 'viash run'.
+    When using the docker engine (or platform), the docker image is built
+    first using the 'cachedbuild' setup strategy. If a 'build_registry' is
+    provided, this only happens for the first run of the config
+    (and its resources) in the session.
 
-    viash_version = _get_viash_version(viash_location)
-    platform_or_engine, engine_or_platform_val = _check_platform_or_engine(
-        viash_version, engine=engine, platform=platform
+    See '_run_command' for the 'stream', 'tee' and 'max_output_bytes' arguments,
+    which only apply to running the component (not to building the image).
+
+    When a 'recorder' is provided, the time spent on determining the viash version
+    ('version_probe'), building the docker image ('setup', only recorded when the
+    image was built by this call) and running the component ('run', which includes
+    starting the JVM and the container) is recorded.
+
+    The 'timeout' (in seconds) and 'abort_on' (see '_run_command') only apply to
+    running the component. When the timeout expires or the output matches, 'viash run'
+    and all of its child processes are killed and the docker container of the
+    component (which is labeled for this purpose) is removed.
+
+    With the docker engine, 'container_label' (e.g. 'viashpy.run=<uuid>') is added
+    to the container of the component, to be able to find the container of this run.
+    """
+    with record_phase(recorder, "version_probe"):
+        config, viash_version, platform_or_engine, engine_or_platform_val = (
+            _resolve_viash_run(config, engine, platform, viash_location)
+        )
+    base_command = _viash_run_base_command(
+        config, platform_or_engine, engine_or_platform_val, viash_location
     )
+    run_command = base_command
+    on_kill = None
     if engine_or_platform_val == "docker":
-        build_args = [
-            viash_location,
-            "run",
+        _setup_docker_image(
             config,
-            f"--{platform_or_engine}",
-            engine_or_platform_val,
-            "-c",
-            f".{platform_or_engine}s[.type == 'docker'].target_tag := 'test'",
-            "--",
-            "---setup",
-            "cachedbuild",
-        ]
-        logger.debug("Building docker image: %s", " ".join(map(str, build_args)))
-        check_output(
-            build_args, stderr=stderr, **popen_kwargs
-        )  # CalledProcessError should be handled by caller
-    full_command = (
-        [
+            viash_version,
+            platform_or_engine,
+            base_command,
             viash_location,
-            "run",
-            config,
-            f"--{platform_or_engine}",
-            engine_or_platform_val,
+            build_registry=build_registry,
+            recorder=recorder,
+            stderr=stderr,
+            **popen_kwargs,
+        )
+        label = container_label
+        if label is None and (timeout is not None or abort_on):
+            # Killing the docker client does not stop the container, so label
+            # the container to be able to find it when the component is killed.
+            label = f"viashpy.run={uuid.uuid4().hex}"
+        if label is not None:
+            run_command = base_command + [
+                "-c",
+                f".{platform_or_engine}s[.type == 'docker'].run_args += "
+                f"'--label {label}'",
+            ]
+        if timeout is not None or abort_on:
+            on_kill = partial(remove_labeled_containers, label)
+    full_command = (
+        run_command + _format_cpu_and_memory(cpus, memory, "--") + ["--"] + args
+    )
+    return _run_command(
+        full_command,
+        stderr=stderr,
+        stream=stream,
+        tee=tee,
+        max_output_bytes=max_output_bytes,
+        recorder=recorder,
+        timeout=timeout,
+        abort_on=abort_on,
+        on_kill=on_kill,
+        **popen_kwargs,
+    )
+
+
+def viash_build(
+    config: str | Path,
+    output_dir: str | Path,
+    *,
+    engine: Engine | None = None,
+    platform: Platform | None = None,
+    viash_location: str | Path = "viash",
+    stderr: STDOUT | PIPE | DEVNULL | -1 | -2 | -3 = STDOUT,
+    **popen_kwargs,
+):
+    """
+    Build a component from its source config into 'output_dir' using 'viash build'.
+    When using the docker engine (or platform), the docker image for the
+    component is set up as well.
+    """
+    config, _, platform_or_engine, engine_or_platform_val = _resolve_viash_run(
+        config, engine, platform, viash_location
+    )
+    build_command = [
+        viash_location,
+        "build",
+        config,
+        f"--{platform_or_engine}",
+        engine_or_platform_val,
+        "-c",
+        f".{platform_or_engine}s[.type == 'docker'].target_tag := 'test'",
+        "-o",
+        output_dir,
+    ]
+    if engine_or_platform_val == "docker":
+        build_command.append("--setup")
+        build_command.append("cachedbuild")
+    logger.debug("Building component: %s", " ".join(map(str, build_command)))
+    return check_output(build_command, stderr=stderr, **popen_kwargs)
+
+
+async def _run_command_async(
+    command: list,
+    *,
+    stderr: STDOUT | PIPE | DEVNULL | -1 | -2 | -3 = STDOUT,
+    timeout: float | None = None,
+    on_kill: Callable | None = None,
+    kill_grace_period: float = 0.0,
+    **subprocess_kwargs,
+) -> bytes:
+    """
+    Asynchronous counterpart of '_run_command'. The process is started in a new
+    session; when the timeout expires or the task is cancelled, its whole process
+    group is killed (after 'kill_grace_period' seconds to exit after SIGTERM) and
+    'on_kill' is called before the exception propagates. The 'output' of the
+    TimeoutExpired contains the output up to that point.
+    """
+    logger.debug("Running '%s'", " ".join(map(str, command)))
+    subprocess_kwargs.setdefault("start_new_session", True)
+    process = await asyncio.create_subprocess_exec(
+        *command, stdout=PIPE, stderr=stderr, **subprocess_kwargs
+    )
+    output = bytearray()
+
+    async def read_output():
+        async def drain(reader, buffer):
+            while chunk := await reader.read(64 * 1024):
+                buffer += chunk
+
+        readers = [drain(process.stdout, output)]
+        if process.stderr is not None:
+            readers.append(drain(process.stderr, bytearray()))
+        await asyncio.gather(*readers)
+        await process.wait()
+
+    try:
+        await asyncio.wait_for(read_output(), timeout)
+    except asyncio.TimeoutError:
+        await _kill_async_process(process, kill_grace_period, on_kill)
+        raise TimeoutExpired(command, timeout, output=bytes(output)) from None
+    except asyncio.CancelledError:
+        await _kill_async_process(process, kill_grace_period, on_kill)
+        raise
+    if process.returncode:
+        raise CalledProcessError(process.returncode, command, output=bytes(output))
+    return bytes(output)
+
+
+async def _kill_async_process(
+    process: asyncio.subprocess.Process,
+    grace_period: float = 0.0,
+    on_kill: Callable | None = None,
+) -> None:
+    if process.returncode is None:
+        try:
+            if hasattr(os, "killpg"):
+                if grace_period:
+                    os.killpg(process.pid, signal.SIGTERM)
+                    try:
+                        await asyncio.wait_for(process.wait(), grace_period)
+                    except asyncio.TimeoutError:
+                        pass
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
+    await process.wait()
+    if on_kill is not None:
+        on_kill()
+
+
+async def run_build_component_async(
+    executable_location: str | Path,
+    args: list[str],
+    *,
+    cpus: int | None = None,
+    memory: str | None = None,
+    stderr: STDOUT | PIPE | DEVNULL | -1 | -2 | -3 = STDOUT,
+    timeout: float | None = None,
+    **subprocess_kwargs,
+) -> bytes:
+    """
+    Asynchronous counterpart of 'run_build_component'. Raises 'subprocess.TimeoutExpired'
+    when the component did not finish within 'timeout' seconds.
+    """
+    full_command = _build_component_command(executable_location, args, cpus, memory)
+    return await _run_command_async(
+        full_command,
+        stderr=stderr,
+        timeout=timeout,
+        kill_grace_period=BUILT_COMPONENT_KILL_GRACE_PERIOD,
+        **subprocess_kwargs,
+    )
+
+
+async def viash_run_async(
+    config: str | Path,
+    args: list[str],
+    *,
+    cpus: int | None = None,
+    memory: str | None = None,
+    engine: Engine | None = None,
+    platform: Platform | None = None,
+    viash_location: str | Path = "viash",
+    stderr: STDOUT | PIPE | DEVNULL | -1 | -2 | -3 = STDOUT,
+    build_registry: DockerBuildRegistry | None = None,
+    timeout: float | None = None,
+    **subprocess_kwargs,
+) -> bytes:
+    """
+    Asynchronous counterpart of 'viash_run'. The 'timeout' only applies to running
+    the component, not to building the docker image. When the run times out or is
+    cancelled, the docker container of the component is removed as well.
+    """
+    config, viash_version, platform_or_engine, engine_or_platform_val = (
+        await asyncio.to_thread(
+            _resolve_viash_run, config, engine, platform, viash_location
+        )
+    )
+    base_command = _viash_run_base_command(
+        config, platform_or_engine, engine_or_platform_val, viash_location
+    )
+    if engine_or_platform_val == "docker":
+        build_args = base_command + ["--", "---setup", "cachedbuild"]
+
+        if build_registry is None:
+            logger.debug("Building docker image: %s", " ".join(map(str, build_args)))
+            await _run_command_async(build_args, stderr=stderr, **subprocess_kwargs)
+        else:
+            build_key = await asyncio.to_thread(
+                build_registry.key,
+                config,
+                viash_location,
+                viash_version,
+                platform_or_engine,
+            )
+
+            def build_docker_image():
+                logger.debug(
+                    "Building docker image: %s", " ".join(map(str, build_args))
+                )
+                return check_output(build_args, stderr=stderr, **subprocess_kwargs)
+
+            # The registry uses blocking file locks to coordinate with other processes.
+            await asyncio.to_thread(
+                build_registry.ensure_built, build_key, build_docker_image
+            )
+    run_command, on_kill = base_command, None
+    if engine_or_platform_val == "docker":
+        # Killing the docker client does not stop the container, so label
+        # the container to be able to find it when the component is killed.
+        label = f"viashpy.run={uuid.uuid4().hex}"
+        run_command = base_command + [
             "-c",
-            f".{platform_or_engine}s[.type == 'docker'].target_tag := 'test'",
+            f".{platform_or_engine}s[.type == 'docker'].run_args += "
+            f"'--label {label}'",
         ]
-        + _format_cpu_and_memory(cpus, memory, "--")
-        + args
+        on_kill = partial(remove_labeled_containers, label)
+    full_command = (
+        run_command + _format_cpu_and_memory(cpus, memory, "--") + ["--"] + args
+    )
+    return await _run_command_async(
+        full_command,
+        stderr=stderr,
+        timeout=timeout,
+        on_kill=on_kill,
+        **subprocess_kwargs,
     )
-    logger.debug("Running '%s'", " ".join(map(str, full_command)))
-    return check_output(full_command, stderr=stderr, **popen_kwargs)
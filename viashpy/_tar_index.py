@@ -0,0 +1,392 @@
+from __future__ import annotations
+from bisect import bisect_right
+from fnmatch import fnmatchcase
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Callable, Iterable, Iterator
+from ._cache import user_cache_dir, read_json, write_json_atomic
+from ._compression import detect_compression, decompressor_factory
+import hashlib
+import io
+import logging
+import os
+import tarfile
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# Increase when the layout of the index file changes
+_INDEX_FORMAT_VERSION = 1
+_READ_SIZE = 16 * 1024
+_COPY_SIZE = 1024 * 1024
+
+
+def _extraction_filter() -> dict:
+    if hasattr(tarfile, "data_filter"):
+        return {"filter": "data"}
+    return {}
+
+
+def _safe_member(member: tarfile.TarInfo, destination: Path) -> tarfile.TarInfo:
+    data_filter = getattr(tarfile, "data_filter", None)
+    if data_filter is not None:
+        return data_filter(member, str(destination))
+    # Python versions without extraction filters
+    member_path = PurePosixPath(member.name)
+    if member_path.is_absolute() or ".." in member_path.parts:
+        raise tarfile.TarError(
+            f"Member {member.name} would be extracted outside of the destination."
+        )
+    return member
+
+
+def _set_attributes(destination: Path, mode: int | None, mtime) -> None:
+    if mode is not None:
+        os.chmod(destination, mode)
+    if mtime is not None:
+        os.utime(destination, (mtime, mtime))
+
+
+class _DecompressedStream(io.RawIOBase):
+    """
+    Reads the decompressed contents of 'raw_file', starting at 'compressed_offset'
+    (which must be the start of a compressed member). Compressed files can consist of
+    several concatenated members (e.g. as written by 'bgzip'); the decompression
+    of each member can be started independently of the previous ones. When provided,
+    'on_member_start' is called with the compressed and decompressed offset of
+    each member, so that these can be used as seek points.
+    """
+
+    def __init__(
+        self,
+        raw_file: BinaryIO,
+        compression: str,
+        compressed_offset: int = 0,
+        uncompressed_offset: int = 0,
+        on_member_start: Callable[[int, int], None] | None = None,
+    ):
+        self._raw = raw_file
+        self._raw.seek(compressed_offset)
+        self._compression = compression
+        self._on_member_start = on_member_start
+        # Offset in 'raw_file' of the first byte that was not fed to a decompressor yet
+        self._compressed_position = compressed_offset
+        self._pending_input = b""
+        self._buffer = b""
+        self._decompressor = None
+        self._new_decompressor = decompressor_factory(compression)
+        if self._new_decompressor is None:
+            raise ValueError(
+                f"Reading {compression} compressed archives requires an additional python package."
+            )
+        self.position = uncompressed_offset
+
+    def readable(self) -> bool:
+        return True
+
+    def _next_input(self) -> bytes:
+        if self._pending_input:
+            data, self._pending_input = self._pending_input, b""
+        else:
+            data = self._raw.read(_READ_SIZE)
+        self._compressed_position += len(data)
+        return data
+
+    def _fill_buffer(self) -> None:
+        while not self._buffer:
+            if self._decompressor is not None and self._decompressor.eof:
+                self._pending_input = self._decompressor.unused_data
+                self._compressed_position -= len(self._pending_input)
+                self._decompressor = None
+            data = self._next_input()
+            if not data:
+                if self._decompressor is not None:
+                    raise EOFError("Compressed file ended before the end of a member.")
+                return
+            if self._decompressor is None:
+                if self._compression == "gz" and not data.strip(b"\0"):
+                    # Zero padding after the last member
+                    continue
+                member_start = self._compressed_position - len(data)
+                if self._on_member_start is not None:
+                    self._on_member_start(member_start, self.position)
+                self._decompressor = self._new_decompressor()
+            self._buffer = self._decompressor.decompress(data)
+
+    def readinto(self, buffer) -> int:
+        self._fill_buffer()
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        self.position += size
+        return size
+
+    def skip(self, number_of_bytes: int) -> None:
+        while number_of_bytes > 0:
+            skipped = len(self.read(min(number_of_bytes, _COPY_SIZE)))
+            if not skipped:
+                raise EOFError("Unexpected end of the archive.")
+            number_of_bytes -= skipped
+
+
+def _build_index(path: Path, compression: str | None) -> dict:
+    seek_points = []
+    members = []
+    with path.open("rb") as raw_file:
+        if compression is None:
+            fileobj = raw_file
+        else:
+            fileobj = io.BufferedReader(
+                _DecompressedStream(
+                    raw_file,
+                    compression,
+                    on_member_start=lambda c, u: seek_points.append([c, u]),
+                ),
+                _COPY_SIZE,
+            )
+        with tarfile.open(fileobj=fileobj, mode="r|") as open_tar:
+            for member in open_tar:
+                members.append(
+                    [
+                        member.name,
+                        member.type.decode(),
+                        member.offset_data,
+                        member.size,
+                        member.mode,
+                        member.mtime,
+                        member.linkname,
+                        member.issparse(),
+                    ]
+                )
+    return {"compression": compression, "seek_points": seek_points, "members": members}
+
+
+def _member_from_index(entry: list) -> tarfile.TarInfo:
+    name, member_type, offset_data, size, mode, mtime, linkname, sparse = entry
+    member = tarfile.TarInfo(name)
+    member.type = member_type.encode()
+    member.offset_data = offset_data
+    member.size = size
+    member.mode = mode
+    member.mtime = mtime
+    member.linkname = linkname
+    if sparse:
+        # Reading sparse members requires the sparse map, which is not indexed.
+        member.sparse = []
+    return member
+
+
+class TarArchive:
+    """
+    Read-only view of a (compressed) tarfile that allows reading and extracting
+    members on demand, instead of extracting the whole archive.
+
+    When the archive is opened for the first time, its members are listed in an
+    index that is stored in the viashpy cache (see 'viashpy._cache.user_cache_dir'),
+    together with the offsets at which decompression can be started. Opening an
+    archive that was indexed before only requires reading the index.
+
+    Uncompressed archives allow reading any member directly. Compressed archives
+    can only be decompressed from the start of a compressed member: archives that
+    consist of many concatenated members (e.g. written by 'bgzip' or 'pack_tar')
+    can be read at any member, while single-member archives are decompressed from
+    the start (but only up to the members that are requested).
+    """
+
+    def __init__(self, path: str | Path, *, index_dir: str | Path | None = None):
+        self.path = Path(path)
+        if not self.path.is_file():
+            raise FileNotFoundError(f"{self.path} does not exist or is not a file.")
+        if index_dir is None:
+            index_dir = user_cache_dir("tar_index")
+        else:
+            index_dir = Path(index_dir)
+            index_dir.mkdir(parents=True, exist_ok=True)
+        index = self._load_or_build_index(index_dir)
+        self.compression = index["compression"]
+        self._seek_points = [tuple(seek_point) for seek_point in index["seek_points"]]
+        self._seek_starts = [start for _, start in self._seek_points]
+        self._members = [_member_from_index(entry) for entry in index["members"]]
+        self._by_name = {member.name: member for member in self._members}
+
+    def _load_or_build_index(self, index_dir: Path) -> dict:
+        resolved = self.path.resolve()
+        stat_result = resolved.stat()
+        identity = [str(resolved), stat_result.st_mtime_ns, stat_result.st_size]
+        index_key = hashlib.sha256("\0".join(map(str, identity)).encode()).hexdigest()
+        index_file = index_dir / f"{index_key}.json"
+        index = read_json(index_file)
+        if (
+            index
+            and index.get("format") == _INDEX_FORMAT_VERSION
+            and index.get("identity") == identity
+        ):
+            return index
+        logger.debug("Indexing %s", self.path)
+        try:
+            index = _build_index(self.path, detect_compression(self.path))
+        except (tarfile.TarError, EOFError, OSError, zlib.error) as e:
+            raise ValueError(f"{self.path} is not a tarfile.") from e
+        index.update({"format": _INDEX_FORMAT_VERSION, "identity": identity})
+        try:
+            write_json_atomic(index_file, index)
+        except OSError as e:
+            logger.warning("Could not write the index of %s: %s", self.path, e)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def __iter__(self) -> Iterator[tarfile.TarInfo]:
+        return iter(self._members)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name
+
+    def getnames(self) -> list[str]:
+        return [member.name for member in self._members]
+
+    def getmember(self, name: str) -> tarfile.TarInfo:
+        try:
+            return self._by_name[name]
+        except KeyError:
+            raise KeyError(f"{name} is not a member of {self.path}.") from None
+
+    def _open_at(self, raw_file: BinaryIO, uncompressed_offset: int):
+        if self.compression is None:
+            raw_file.seek(uncompressed_offset)
+            return raw_file
+        # Start at the last seek point before the requested offset.
+        seek_point_index = bisect_right(self._seek_starts, uncompressed_offset) - 1
+        compressed_offset, start = self._seek_points[max(seek_point_index, 0)]
+        stream = _DecompressedStream(
+            raw_file, self.compression, compressed_offset, start
+        )
+        stream.skip(uncompressed_offset - start)
+        return stream
+
+    def _members_data(
+        self, members: Iterable[tarfile.TarInfo]
+    ) -> Iterator[tuple[tarfile.TarInfo, Iterator[bytes]]]:
+        """
+        Yield the members (in order of their position in the archive) with an iterator
+        over their data. Consecutive members are read without starting over.
+        """
+        members = sorted(members, key=lambda member: member.offset_data)
+        with self.path.open("rb") as raw_file:
+            stream = None
+            for member in members:
+                if member.issparse():
+                    raise ValueError(
+                        f"Reading sparse member {member.name} is not supported."
+                    )
+                if stream is None or not self._can_continue(stream, member.offset_data):
+                    stream = self._open_at(raw_file, member.offset_data)
+                elif self.compression is not None:
+                    stream.skip(member.offset_data - stream.position)
+                yield member, self._read_data(stream, member.size)
+
+    def _can_continue(self, stream, uncompressed_offset: int) -> bool:
+        if self.compression is None:
+            return False
+        if uncompressed_offset < stream.position:
+            return False
+        # Starting again is cheaper when there is a seek point in between.
+        next_seek_point = bisect_right(self._seek_starts, stream.position)
+        return (
+            next_seek_point == len(self._seek_starts)
+            or self._seek_starts[next_seek_point] > uncompressed_offset
+        )
+
+    @staticmethod
+    def _read_data(stream, size: int) -> Iterator[bytes]:
+        while size > 0:
+            chunk = stream.read(min(size, _COPY_SIZE))
+            if not chunk:
+                raise EOFError("Unexpected end of the archive.")
+            size -= len(chunk)
+            yield chunk
+
+    def read(self, name: str) -> bytes:
+        """
+        Return the contents of the member named 'name'.
+        """
+        member = self.getmember(name)
+        if member.islnk():
+            member = self.getmember(member.linkname)
+        if not member.isreg():
+            raise ValueError(f"{name} is not a regular file.")
+        for _, data in self._members_data([member]):
+            return b"".join(data)
+
+    def select(
+        self,
+        include: Iterable[str] | str | None = None,
+        exclude: Iterable[str] | str | None = None,
+    ) -> list[tarfile.TarInfo]:
+        """
+        Return the members whose name matches any of the 'include' glob patterns
+        (all members by default) and none of the 'exclude' patterns.
+        """
+        include = [include] if isinstance(include, str) else include
+        exclude = [exclude] if isinstance(exclude, str) else (exclude or [])
+        return [
+            member
+            for member in self._members
+            if (include is None or any(fnmatchcase(member.name, p) for p in include))
+            and not any(fnmatchcase(member.name, p) for p in exclude)
+        ]
+
+    def extract(
+        self,
+        output_dir: str | Path,
+        *,
+        include: Iterable[str] | str | None = None,
+        exclude: Iterable[str] | str | None = None,
+    ) -> list[Path]:
+        """
+        Extract the members that match the 'include' and 'exclude' glob patterns
+        (see 'select') into 'output_dir', keeping their path in the archive.
+        Returns the paths of the extracted members.
+        """
+        output_dir = Path(output_dir)
+        if not output_dir.is_dir():
+            raise FileNotFoundError(
+                f"Directory {output_dir} does not exist or is not a directory."
+            )
+        selected = [
+            _safe_member(member, output_dir) for member in self.select(include, exclude)
+        ]
+        extracted = {}
+        directories = []
+        regular_files = []
+        links = []
+        for member in selected:
+            destination = output_dir.joinpath(*PurePosixPath(member.name).parts)
+            extracted[member.name] = destination
+            if member.isdir():
+                destination.mkdir(parents=True, exist_ok=True)
+                directories.append(member)
+            elif member.isreg():
+                regular_files.append(member)
+            elif member.issym() or member.islnk():
+                links.append(member)
+        for member, data in self._members_data(regular_files):
+            destination = extracted[member.name]
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            with destination.open("wb") as open_destination:
+                for chunk in data:
+                    open_destination.write(chunk)
+            _set_attributes(destination, member.mode, member.mtime)
+        for member in links:
+            destination = extracted[member.name]
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            if member.issym():
+                os.symlink(member.linkname, destination)
+            elif member.linkname in extracted:
+                os.link(extracted[member.linkname], destination)
+            else:
+                destination.write_bytes(self.read(member.linkname))
+                _set_attributes(destination, member.mode, member.mtime)
+        for member in reversed(directories):
+            _set_attributes(extracted[member.name], member.mode, member.mtime)
+        return [extracted[member.name] for member in selected]
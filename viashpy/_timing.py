@@ -0,0 +1,115 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from threading import Lock
+from time import perf_counter
+import sys
+
+
+def _max_rss_bytes(rusage) -> int:
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere.
+    if sys.platform == "darwin":
+        return rusage.ru_maxrss
+    return rusage.ru_maxrss * 1024
+
+
+class Phase:
+    """
+    A timed phase of running a component (e.g. 'version_probe', 'setup' or 'run').
+    Besides the wall time, the CPU time and peak memory usage (RSS) of the
+    processes that were started during the phase are recorded, when available.
+    """
+
+    def __init__(self, recorder: PhaseRecorder, name: str):
+        self.name = name
+        self.wall_time = None
+        self.cpu_user = None
+        self.cpu_system = None
+        self.max_rss_bytes = None
+        self._recorder = recorder
+        self._start = perf_counter()
+
+    def add_rusage(self, rusage) -> None:
+        if rusage is None:
+            return
+        self.cpu_user = (self.cpu_user or 0.0) + rusage.ru_utime
+        self.cpu_system = (self.cpu_system or 0.0) + rusage.ru_stime
+        self.max_rss_bytes = max(self.max_rss_bytes or 0, _max_rss_bytes(rusage))
+
+    def finish(self, rusage=None) -> None:
+        self.add_rusage(rusage)
+        if self.wall_time is None:
+            self.wall_time = perf_counter() - self._start
+            self._recorder._add(self)
+
+    def to_json(self) -> dict:
+        return {
+            "phase": self.name,
+            "wall_time": self.wall_time,
+            "cpu_user": self.cpu_user,
+            "cpu_system": self.cpu_system,
+            "max_rss_bytes": self.max_rss_bytes,
+        }
+
+
+class PhaseRecorder:
+    """
+    Collects the phases of the components that were run, in the order in which they finished.
+    The resource usage of a process is only available for processes that were started
+    directly; for components that run in a docker container it describes the
+    'viash' or 'docker' client process, not the container.
+    """
+
+    def __init__(self):
+        self.phases = []
+        self._lock = Lock()
+
+    def _add(self, phase: Phase) -> None:
+        with self._lock:
+            self.phases.append(phase)
+
+    def start(self, name: str) -> Phase:
+        """
+        Start a phase. The phase is recorded when 'finish' is called on the result.
+        """
+        return Phase(self, name)
+
+    @contextmanager
+    def phase(self, name: str):
+        phase = self.start(name)
+        try:
+            yield phase
+        finally:
+            phase.finish()
+
+    def to_json(self) -> list[dict]:
+        return [phase.to_json() for phase in self.phases]
+
+    def format(self) -> str:
+        def format_number(value, fmt):
+            return "-" if value is None else format(value, fmt)
+
+        lines = [
+            f"{'phase':<16}{'wall (s)':>10}{'user (s)':>10}{'sys (s)':>10}{'max RSS (MiB)':>15}"
+        ]
+        for phase in self.phases:
+            max_rss = phase.max_rss_bytes
+            lines.append(
+                f"{phase.name:<16}"
+                f"{format_number(phase.wall_time, '.3f'):>10}"
+                f"{format_number(phase.cpu_user, '.3f'):>10}"
+                f"{format_number(phase.cpu_system, '.3f'):>10}"
+                f"{format_number(max_rss and max_rss / 1024**2, '.1f'):>15}"
+            )
+        return "\n".join(lines)
+
+
+@contextmanager
+def record_phase(recorder: PhaseRecorder | None, name: str):
+    """
+    Record a phase on 'recorder', or do nothing when no recorder is given.
+    """
+    if recorder is None:
+        yield None
+        return
+    with recorder.phase(name) as phase:
+        yield phase
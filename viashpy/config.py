@@ -1,11 +1,30 @@
 from __future__ import annotations
 import yaml
+import hashlib
+import os
+import time
+from functools import lru_cache
 from pathlib import Path
+from types import MappingProxyType
+from typing import Mapping
+
+try:
+    # Use the libyaml bindings when they are available, which are much faster
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader as _SafeLoader
+
+# Maximum number of parsed configs to keep in memory
+_CONFIG_CACHE_SIZE = 128
+
+
+def _load_yaml(stream):
+    return yaml.load(stream, Loader=_SafeLoader)
 
 
 def read_viash_config(config_path: str | Path) -> dict:
     with open(config_path, "r") as open_config_file:
-        config = yaml.safe_load(open_config_file)
+        config = _load_yaml(open_config_file)
     if not config:
         raise ValueError("The config file was empty.")
     if not isinstance(config, dict):
@@ -15,3 +34,186 @@ def read_viash_config(config_path: str | Path) -> dict:
             "viash config yaml."
         )
     return config
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(val) for key, val in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(val) for val in value)
+    return value
+
+
+@lru_cache(maxsize=_CONFIG_CACHE_SIZE)
+def _read_frozen_viash_config(config_path: str, mtime_ns: int, size: int):
+    return _freeze(read_viash_config(config_path))
+
+
+def read_viash_config_cached(config_path: str | Path) -> Mapping:
+    """
+    Like 'read_viash_config', but the parsed config is cached (keyed on the path,
+    modification time and size of the file) and shared between callers. To make sure
+    that the shared copy can not be changed, a read-only view is returned: maps are
+    returned as 'types.MappingProxyType' and lists as tuples. Use 'read_viash_config'
+    to get a copy that can be modified.
+    """
+    config_path = Path(config_path).resolve()
+    stat_result = os.stat(config_path)
+    return _read_frozen_viash_config(
+        str(config_path), stat_result.st_mtime_ns, stat_result.st_size
+    )
+
+
+def config_component_name(config: Mapping) -> str:
+    """
+    Return the name of the component, for both viash < 0.9 (.functionality.name)
+    and viash >= 0.9 (.name) configs.
+    """
+    try:
+        return config["name"]
+    except KeyError:
+        try:
+            return config["functionality"]["name"]
+        except KeyError:
+            raise ValueError("Could not find the name of the component in the config.")
+
+
+def config_engine_types(config: Mapping) -> tuple[str, ...]:
+    """
+    Return the types of the engines (or platforms, for viash < 0.9) of a component.
+    """
+    engines = config.get("engines") or config.get("platforms") or []
+    return tuple(engine.get("type") for engine in engines)
+
+
+def config_docker_image(config: Mapping, tag: str = "test") -> str | None:
+    """
+    Return the name of the docker image for a component, as it is named by viash
+    when the 'target_tag' is set to 'tag'. Returns None when the config
+    does not define a docker engine (or platform).
+    """
+    engines = config.get("engines") or config.get("platforms") or []
+    docker_engine = next(
+        (engine for engine in engines if engine.get("type") == "docker"), None
+    )
+    if docker_engine is None:
+        return None
+    namespace = config.get("namespace") or (config.get("functionality") or {}).get(
+        "namespace"
+    )
+    name = config_component_name(config)
+    image = docker_engine.get("target_image") or (
+        f"{namespace}/{name}" if namespace else name
+    )
+    image_parts = [
+        docker_engine.get("target_registry"),
+        docker_engine.get("target_organization"),
+        image,
+    ]
+    return "/".join(filter(None, image_parts)) + f":{tag}"
+
+
+def _find_project_root(config_path: Path) -> Path | None:
+    for directory in config_path.resolve().parents:
+        if (directory / "_viash.yaml").is_file():
+            return directory
+    return None
+
+
+def config_resource_paths(config_path: str | Path, config: Mapping | None = None):
+    """
+    Yield the paths of the resources that are defined in a viash config.
+    Both the viash < 0.9 (.functionality.resources) and >= 0.9 (.resources)
+    layouts are supported. Paths starting with a '/' are resolved relative to
+    the root of the project (the directory that contains '_viash.yaml').
+    Resources that are defined inline (using 'text') or point to a URL are skipped.
+    """
+    config_path = Path(config_path)
+    if config is None:
+        config = read_viash_config_cached(config_path)
+    resources = config.get("resources") or (config.get("functionality") or {}).get(
+        "resources", []
+    )
+    project_root = None
+    for resource in resources or []:
+        resource_path = resource.get("path")
+        if not resource_path or "://" in resource_path:
+            continue
+        if resource_path.startswith("/"):
+            if project_root is None:
+                project_root = _find_project_root(config_path) or Path("/")
+            yield project_root / resource_path.lstrip("/")
+        else:
+            yield config_path.parent / resource_path
+
+
+# In-process memo for 'config_content_hash', keyed on the resolved config path.
+_content_hash_cache: dict[str, tuple[tuple, str]] = {}
+# Files that were modified more recently than this (in nanoseconds) could be
+# modified again without changing their modification time, so their hash is not memoized.
+_RACY_MTIME_NS = 2 * 10**9
+
+
+def _resource_files(resource_path: Path) -> list[Path] | None:
+    if resource_path.is_dir():
+        return sorted(path for path in resource_path.rglob("*") if path.is_file())
+    if resource_path.is_file():
+        return [resource_path]
+    return None
+
+
+def _file_identity(path: Path) -> tuple:
+    stat_result = path.stat()
+    return (str(path), stat_result.st_mtime_ns, stat_result.st_size)
+
+
+def config_content_hash(config_path: str | Path) -> str:
+    """
+    Calculate a hash from the contents of a viash config and its resources.
+    The hash changes when the config or any of the (files from) resources changes.
+    The hash is memoized, keyed on the location, modification time and size of
+    the config and the files of its resources, so that unchanged files are not
+    read again.
+    """
+    config_path = Path(config_path)
+    try:
+        config = read_viash_config_cached(config_path)
+    except ValueError:
+        config = {}
+    resources = [
+        (resource_path, _resource_files(resource_path))
+        for resource_path in config_resource_paths(config_path, config)
+    ]
+    identity = (_file_identity(config_path),) + tuple(
+        (str(resource_path), files and tuple(map(_file_identity, files)))
+        for resource_path, files in resources
+    )
+    memo_key = str(config_path.resolve())
+    memoized = _content_hash_cache.get(memo_key)
+    if memoized is not None and memoized[0] == identity:
+        return memoized[1]
+    hasher = hashlib.sha256()
+    hasher.update(config_path.read_bytes())
+    for resource_path, files in resources:
+        hasher.update(b"\0resource\0" + str(resource_path).encode())
+        if files is None:
+            hasher.update(b"\0missing")
+            continue
+        for file_path in files:
+            hasher.update(
+                b"\0file\0" + str(file_path.relative_to(resource_path.parent)).encode()
+            )
+            with file_path.open("rb") as open_file:
+                for chunk in iter(lambda: open_file.read(1 << 20), b""):
+                    hasher.update(chunk)
+    content_hash = hasher.hexdigest()
+    newest_mtime_ns = max(
+        mtime_ns
+        for _, mtime_ns, _ in (
+            identity[0],
+            *(file for _, files in identity[1:] for file in files or ()),
+        )
+    )
+    if time.time_ns() - newest_mtime_ns > _RACY_MTIME_NS:
+        _content_hash_cache[memo_key] = (identity, content_hash)
+    return content_hash
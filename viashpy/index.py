@@ -0,0 +1,238 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+from .config import read_viash_config, config_component_name, config_resource_paths
+from ._cache import user_cache_dir, read_json, write_json_atomic
+import hashlib
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Increase when the layout of the sidecar file changes
+_INDEX_FORMAT_VERSION = 1
+# Parsing configs in other processes is only worth it for larger trees
+_MIN_CONFIGS_FOR_PARALLEL_PARSING = 32
+
+
+@dataclass(frozen=True)
+class ComponentInfo:
+    name: str
+    namespace: str | None
+    config: Path
+    engines: tuple[str, ...]
+    resources: tuple[Path, ...]
+
+    @property
+    def full_name(self) -> str:
+        if self.namespace:
+            return f"{self.namespace}/{self.name}"
+        return self.name
+
+    def to_json(self) -> dict:
+        return {
+            "name": self.name,
+            "namespace": self.namespace,
+            "config": str(self.config),
+            "engines": list(self.engines),
+            "resources": list(map(str, self.resources)),
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> ComponentInfo:
+        return cls(
+            name=data["name"],
+            namespace=data["namespace"],
+            config=Path(data["config"]),
+            engines=tuple(data["engines"]),
+            resources=tuple(map(Path, data["resources"])),
+        )
+
+
+def _read_component_info(config_path: str) -> dict | None:
+    """
+    Parse a single config. Returns None for files that are not a source config
+    (e.g. parsed configs that were written by 'viash build').
+    """
+    try:
+        config = read_viash_config(config_path)
+        functionality = config.get("functionality") or {}
+        if "build_info" in config or "config" in (config.get("info") or {}):
+            return None
+        engines = config.get("engines") or config.get("platforms") or []
+        info = ComponentInfo(
+            name=config_component_name(config),
+            namespace=config.get("namespace") or functionality.get("namespace"),
+            config=Path(config_path),
+            engines=tuple(engine.get("type") for engine in engines),
+            resources=tuple(config_resource_paths(config_path, config)),
+        )
+    except Exception as e:
+        logger.warning("Could not index %s: %s", config_path, e)
+        return None
+    return info.to_json()
+
+
+def _scan_tree(root: Path) -> tuple[dict[str, int], dict[str, tuple[int, int]]]:
+    """
+    Find all viash configs in 'root'. Hidden files and directories are skipped.
+    Returns the modification times of all directories that were visited and
+    the modification time and size of each config.
+    """
+    directories, configs = {}, {}
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories[:] = [
+            subdir for subdir in subdirectories if not subdir.startswith(".")
+        ]
+        directories[directory] = os.stat(directory).st_mtime_ns
+        for file_name in files:
+            if file_name.endswith(".vsh.yaml") and not file_name.startswith("."):
+                file_path = os.path.join(directory, file_name)
+                stat_result = os.stat(file_path)
+                configs[file_path] = (stat_result.st_mtime_ns, stat_result.st_size)
+    return directories, configs
+
+
+def _directories_unchanged(directories: dict[str, int]) -> bool:
+    for directory, mtime_ns in directories.items():
+        try:
+            if os.stat(directory).st_mtime_ns != mtime_ns:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+class ConfigIndex:
+    """
+    An index of the viash components in a source tree, which allows looking up
+    a component by its name (or 'namespace/name') or by the location of its config.
+
+    Use 'ConfigIndex.build' to create an index. The result is stored in a sidecar
+    file, which is reused as long as the directories in the tree and the configs
+    themselves are not modified. Only the configs that were added or changed
+    since the sidecar file was written are parsed again.
+    """
+
+    def __init__(self, components: list[ComponentInfo]):
+        self._components = list(components)
+        self._by_name = {}
+        self._by_config = {}
+        for component in self._components:
+            self._by_name.setdefault(component.name, []).append(component)
+            if component.namespace:
+                self._by_name.setdefault(component.full_name, []).append(component)
+            self._by_config[component.config.resolve()] = component
+
+    def __len__(self) -> int:
+        return len(self._components)
+
+    def __iter__(self) -> Iterator[ComponentInfo]:
+        return iter(self._components)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name
+
+    def __getitem__(self, name: str) -> ComponentInfo:
+        """
+        Look up a component by name or 'namespace/name'. When multiple
+        namespaces contain a component with the same name, the name must
+        be prefixed with the namespace.
+        """
+        try:
+            components = self._by_name[name]
+        except KeyError:
+            raise KeyError(f"Could not find a component named '{name}'.") from None
+        if len(components) > 1:
+            raise KeyError(
+                f"Multiple components are named '{name}': "
+                f"{', '.join(sorted(comp.full_name for comp in components))}. "
+                "Please prefix the name of the component with its namespace."
+            )
+        return components[0]
+
+    def by_config(self, config_path: str | Path) -> ComponentInfo:
+        return self._by_config[Path(config_path).resolve()]
+
+    @staticmethod
+    def default_sidecar(root: str | Path) -> Path:
+        root_hash = hashlib.sha256(str(Path(root).resolve()).encode()).hexdigest()
+        return user_cache_dir("config_index") / f"{root_hash}.json"
+
+    @classmethod
+    def build(
+        cls,
+        root: str | Path,
+        *,
+        sidecar: str | Path | None = None,
+        max_workers: int | None = None,
+    ) -> ConfigIndex:
+        """
+        Create an index of the configs in 'root'. The sidecar file is stored in the
+        viashpy cache directory by default, see 'viashpy._cache.user_cache_dir'.
+        """
+        root = Path(root).resolve()
+        sidecar = Path(sidecar) if sidecar else cls.default_sidecar(root)
+        stored = read_json(sidecar)
+        if not stored or stored.get("format") != _INDEX_FORMAT_VERSION:
+            stored = {"directories": {}, "configs": {}}
+        elif _directories_unchanged(stored["directories"]) and all(
+            cls._config_unchanged(path, entry)
+            for path, entry in stored["configs"].items()
+        ):
+            logger.debug("Reusing config index from %s", sidecar)
+            return cls._from_stored(stored)
+
+        directories, configs = _scan_tree(root)
+        new_entries, to_parse = {}, []
+        for config_path, (mtime_ns, size) in configs.items():
+            previous = stored["configs"].get(config_path)
+            if previous and previous[:2] == [mtime_ns, size]:
+                new_entries[config_path] = previous
+            else:
+                to_parse.append(config_path)
+        logger.debug(
+            "Indexing %d configs (%d reused) in %s",
+            len(to_parse),
+            len(new_entries),
+            root,
+        )
+        for config_path, info in zip(to_parse, cls._parse(to_parse, max_workers)):
+            new_entries[config_path] = list(configs[config_path]) + [info]
+        stored = {
+            "format": _INDEX_FORMAT_VERSION,
+            "directories": directories,
+            "configs": dict(sorted(new_entries.items())),
+        }
+        try:
+            write_json_atomic(sidecar, stored)
+        except OSError as e:
+            logger.warning("Could not write config index to %s: %s", sidecar, e)
+        return cls._from_stored(stored)
+
+    @staticmethod
+    def _config_unchanged(config_path: str, entry: list) -> bool:
+        try:
+            stat_result = os.stat(config_path)
+        except OSError:
+            return False
+        return [stat_result.st_mtime_ns, stat_result.st_size] == entry[:2]
+
+    @staticmethod
+    def _parse(config_paths: list[str], max_workers: int | None) -> list:
+        if len(config_paths) < _MIN_CONFIGS_FOR_PARALLEL_PARSING:
+            return list(map(_read_component_info, config_paths))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(_read_component_info, config_paths, chunksize=16))
+
+    @classmethod
+    def _from_stored(cls, stored: dict) -> ConfigIndex:
+        return cls(
+            [
+                ComponentInfo.from_json(info)
+                for *_, info in stored["configs"].values()
+                if info is not None
+            ]
+        )
@@ -1,17 +1,309 @@
 from __future__ import annotations
 import pytest
 import logging
-from ._run import run_build_component, viash_run, tobytesconverter
-from .types import Engine, Platform
-from .config import read_viash_config
 from pathlib import Path
 from functools import wraps
-from subprocess import CalledProcessError
+from contextlib import ExitStack
+from typing import TYPE_CHECKING
+import importlib
+import inspect
 import warnings
 
+# This module is loaded by pytest in every session where viashpy is installed,
+# also when no viash fixtures are used. Keep it cheap to import: the other modules
+# of viashpy (and yaml, asyncio, tarfile, ...) are imported by the fixtures that
+# use them. See 'tests/unittests/test_import_time.py'.
+if TYPE_CHECKING:
+    from .types import Engine, Platform
+    from ._run import (
+        run_build_component,
+        run_build_component_async,
+        viash_run,
+        viash_run_async,
+        tobytesconverter,
+    )
+    from .config import (
+        read_viash_config_cached,
+        config_content_hash,
+        config_docker_image,
+        config_engine_types,
+    )
+
+# Attributes of this module that are imported on first use. They are looked up as
+# module attributes when they are used, so that they can be patched in tests.
+_LAZY_ATTRIBUTES = {
+    "run_build_component": "._run",
+    "run_build_component_async": "._run",
+    "viash_run": "._run",
+    "viash_run_async": "._run",
+    "tobytesconverter": "._run",
+    "read_viash_config_cached": ".config",
+    "config_content_hash": ".config",
+    "config_docker_image": ".config",
+    "config_engine_types": ".config",
+}
+
+
+def __getattr__(name):
+    try:
+        module_name = _LAZY_ATTRIBUTES[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(importlib.import_module(module_name, __package__), name)
+    globals()[name] = value
+    return value
+
+
+def _import_lazy_attributes():
+    """
+    Import the attributes in '_LAZY_ATTRIBUTES' that were not imported (or patched) yet.
+    """
+    for name in _LAZY_ATTRIBUTES:
+        if name not in globals():
+            __getattr__(name)
+
+
 logger = logging.getLogger(__name__)
 
 
+def pytest_addoption(parser):
+    group = parser.getgroup("viashpy")
+    group.addoption(
+        "--viash-build-cache",
+        action="store_true",
+        default=None,
+        help="Build components once using 'viash build' and run the resulting "
+        "executable instead of using 'viash run' for every call to 'run_component'.",
+    )
+    parser.addini(
+        "viash_build_cache",
+        type="bool",
+        default=False,
+        help="Default value for --viash-build-cache.",
+    )
+    group.addoption(
+        "--viash-run-executable",
+        action="store_true",
+        default=None,
+        help="Run the built component from meta['executable'] in 'run_component', "
+        "even when the source config of the component is available.",
+    )
+    parser.addini(
+        "viash_run_executable",
+        type="bool",
+        default=False,
+        help="Default value for --viash-run-executable.",
+    )
+    group.addoption(
+        "--viash-result-cache",
+        action="store_true",
+        default=None,
+        help="Replay the output (and output files) of 'run_component' from a cache "
+        "when the component, its arguments and its input files did not change.",
+    )
+    parser.addini(
+        "viash_result_cache",
+        type="bool",
+        default=False,
+        help="Default value for --viash-result-cache.",
+    )
+    parser.addini(
+        "viash_result_cache_size",
+        default="10GB",
+        help="Maximum size of the result cache (e.g. '500MB', '10GB').",
+    )
+    group.addoption(
+        "--viash-timings",
+        metavar="PATH",
+        default=None,
+        help="Record the time and resources spent in each phase of running a "
+        "component, add them to the report of each test and write them to PATH as json.",
+    )
+    parser.addini(
+        "viash_timings",
+        default="",
+        help="Default value for --viash-timings.",
+    )
+    group.addoption(
+        "--viash-docker-pool",
+        action="store_true",
+        default=None,
+        help="Keep one container per docker image running for the session and run "
+        "components in it using 'docker exec', instead of starting a container for "
+        "every call to 'run_component'.",
+    )
+    parser.addini(
+        "viash_docker_pool",
+        type="bool",
+        default=False,
+        help="Default value for --viash-docker-pool.",
+    )
+    group.addoption(
+        "--viash-benchmark-update",
+        action="store_true",
+        default=None,
+        help="Store the results of 'benchmark_component' as the new baseline "
+        "instead of comparing them against the baseline.",
+    )
+    parser.addini(
+        "viash_benchmark_update",
+        type="bool",
+        default=False,
+        help="Default value for --viash-benchmark-update.",
+    )
+    group.addoption(
+        "--viash-benchmark-threshold",
+        type=float,
+        default=None,
+        help="Fail a benchmark when the median of a measurement exceeds the baseline "
+        "by more than this fraction (default: 0.2).",
+    )
+    parser.addini(
+        "viash_benchmark_threshold",
+        default="0.2",
+        help="Default value for --viash-benchmark-threshold.",
+    )
+    parser.addini(
+        "viash_benchmark_rounds",
+        default="5",
+        help="Number of measured runs of a component for 'benchmark_component'.",
+    )
+    parser.addini(
+        "viash_benchmark_warmup",
+        default="1",
+        help="Number of runs of a component before measuring in 'benchmark_component'.",
+    )
+    group.addoption(
+        "--viash-resource-report",
+        action="store_true",
+        default=None,
+        help="Measure the peak memory usage and CPU utilization of the components "
+        "that are run, and warn when they differ from the declared CPUs and memory.",
+    )
+    parser.addini(
+        "viash_resource_report",
+        type="bool",
+        default=False,
+        help="Default value for --viash-resource-report.",
+    )
+    parser.addini(
+        "viash_resource_underuse",
+        default="0.25",
+        help="Warn when a component uses less than this fraction of its declared "
+        "CPUs or memory (default: 0.25).",
+    )
+    group.addoption(
+        "--viash-timeout",
+        type=float,
+        default=None,
+        help="Kill a component (and all of its child processes and containers) "
+        "when a single run takes longer than this number of seconds.",
+    )
+    parser.addini(
+        "viash_timeout",
+        default="",
+        help="Default value for --viash-timeout.",
+    )
+    group.addoption(
+        "--viash-session-timeout",
+        type=float,
+        default=None,
+        help="Number of seconds after the first test that runs a component after which "
+        "runs of components are stopped and no new ones are started. This is a deadline "
+        "for the session (or a pytest-xdist worker), which includes the time spent "
+        "outside of runs.",
+    )
+    parser.addini(
+        "viash_session_timeout",
+        default="",
+        help="Default value for --viash-session-timeout.",
+    )
+    parser.addini(
+        "viash_abort_on",
+        type="linelist",
+        default=[],
+        help="Regular expressions (one per line) that abort a component as soon as "
+        "a line of its output matches, e.g. 'Traceback'.",
+    )
+    group.addoption(
+        "--viash-host-cpus",
+        type=int,
+        default=None,
+        help="Number of CPUs that the components that are run by all pytest-xdist "
+        "workers may use at the same time (default: the CPUs of the host).",
+    )
+    parser.addini(
+        "viash_host_cpus",
+        default="",
+        help="Default value for --viash-host-cpus.",
+    )
+    group.addoption(
+        "--viash-host-memory",
+        default=None,
+        help="Amount of memory (e.g. '16GB') that the components that are run by all "
+        "pytest-xdist workers may use at the same time (default: the memory of the host).",
+    )
+    parser.addini(
+        "viash_host_memory",
+        default="",
+        help="Default value for --viash-host-memory.",
+    )
+
+
+class _TimingsCollector:
+    """
+    Collects the timings that were recorded by 'viash_phase_recorder' for all tests
+    and writes them to a json file at the end of the session. With pytest-xdist,
+    the reports of the workers are passed to the controller, which writes the file.
+    """
+
+    def __init__(self, timings_file: Path):
+        self.timings_file = timings_file
+        self.timings = {}
+
+    def pytest_runtest_logreport(self, report):
+        if report.when != "teardown":
+            return
+        for name, value in report.user_properties:
+            if name == "viash_timings":
+                self.timings.setdefault(report.nodeid, []).extend(value)
+
+    def pytest_sessionfinish(self, session):
+        if hasattr(session.config, "workerinput"):
+            return
+        from ._cache import write_json_atomic
+
+        tests = [
+            {"nodeid": nodeid, "phases": phases}
+            for nodeid, phases in self.timings.items()
+        ]
+        write_json_atomic(self.timings_file, {"tests": tests})
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "viash_no_result_cache: always run the component, "
+        "even when the result cache is enabled.",
+    )
+    timings_file = config.getoption("viash_timings")
+    if timings_file:
+        timings_file = config.invocation_params.dir / timings_file
+    elif config.getini("viash_timings"):
+        timings_file = config.rootpath / config.getini("viash_timings")
+    if timings_file:
+        config.pluginmanager.register(
+            _TimingsCollector(timings_file), "viashpy-timings"
+        )
+
+
+def _get_flag(config, name):
+    value = config.getoption(name)
+    if value is None:
+        value = config.getini(name)
+    return value
+
+
 @pytest.fixture
 def test_module(request):
     return request.node.parent.obj
@@ -22,8 +314,219 @@ def viash_executable():
     return "viash"
 
 
+def _session_shared_dir(tmp_path_factory, config, name):
+    """
+    Return a directory that is shared by all processes of a test session.
+    When running with pytest-xdist, each worker gets its own basetemp
+    inside of a directory that is unique for the session.
+    """
+    basetemp = tmp_path_factory.getbasetemp()
+    if hasattr(config, "workerinput"):
+        basetemp = basetemp.parent
+    shared_dir = basetemp / name
+    shared_dir.mkdir(parents=True, exist_ok=True)
+    return shared_dir
+
+
+@pytest.fixture(scope="session")
+def viash_build_registry(tmp_path_factory, pytestconfig):
+    """
+    Registry of the docker images that have been built in this test session,
+    shared between pytest-xdist workers. Makes sure that the docker image for a
+    config is only built once per session, and that a failed build is not retried.
+    """
+    from ._build import DockerBuildRegistry
+
+    return DockerBuildRegistry(
+        _session_shared_dir(tmp_path_factory, pytestconfig, "viashpy_docker_builds")
+    )
+
+
+@pytest.fixture(scope="session")
+def viash_executable_cache(pytestconfig):
+    """
+    Cache of components built with 'viash build'. When enabled using the
+    '--viash-build-cache' option or the 'viash_build_cache' ini option,
+    'run_component' runs the built executable instead of using 'viash run'
+    when the test is executed inline. Returns None when the cache is disabled.
+    """
+    if not _get_flag(pytestconfig, "viash_build_cache"):
+        return None
+    from ._build import ExecutableCache
+    from ._cache import user_cache_dir
+
+    return ExecutableCache(user_cache_dir("executables"))
+
+
+@pytest.fixture(scope="session")
+def viash_result_cache(pytestconfig):
+    """
+    Cache of the results of 'run_component'. When enabled using the
+    '--viash-result-cache' option or the 'viash_result_cache' ini option,
+    the output and the output files of a component are replayed from the cache
+    instead of running the component when the component, its arguments and
+    the contents of its input files did not change. Paths in the temporary directories
+    of the test and the session are compared relative to those directories, so that
+    results are also replayed in later sessions. Returns None when the cache is disabled.
+    """
+    if not _get_flag(pytestconfig, "viash_result_cache"):
+        return None
+    from ._cache import user_cache_dir
+    from ._resources import memory_to_bytes
+    from ._result_cache import ResultCache
+
+    return ResultCache(
+        user_cache_dir("results"),
+        max_size_bytes=memory_to_bytes(pytestconfig.getini("viash_result_cache_size")),
+    )
+
+
 @pytest.fixture
-def meta(test_module):
+def viash_phase_recorder(request):
+    """
+    Records the wall time, CPU time and peak memory usage of each phase of running
+    a component with 'run_component' (determining the viash version, building
+    the docker image and running the component). Enabled using the
+    '--viash-timings' option or the 'viash_timings' ini option, returns None otherwise.
+    The recorded phases are added as a section to the report of the test and
+    written to the json file passed to the option at the end of the session.
+    """
+    if not _get_flag(request.config, "viash_timings"):
+        yield None
+        return
+    from ._timing import PhaseRecorder
+
+    recorder = PhaseRecorder()
+    yield recorder
+    if recorder.phases:
+        request.node.add_report_section("teardown", "viash timings", recorder.format())
+        request.node.user_properties.append(("viash_timings", recorder.to_json()))
+
+
+@pytest.fixture(scope="session")
+def viash_docker_pool(tmp_path_factory, pytestconfig):
+    """
+    Pool of long-lived docker containers, one per image. When enabled using the
+    '--viash-docker-pool' option or the 'viash_docker_pool' ini option,
+    'run_component' builds components that use the docker engine for the native
+    engine and runs them in the container for their image using 'docker exec',
+    when the test is executed inline. Components without a native engine are run
+    with 'viash run' instead. The commands run as the current user. The temporary
+    directories of pytest, the rootdir and the cache of built components are mounted
+    into the containers.
+    The containers are removed at the end of the session.
+    Returns None when the pool is disabled.
+    """
+    if not _get_flag(pytestconfig, "viash_docker_pool"):
+        yield None
+        return
+    from ._cache import user_cache_dir
+    from ._container_pool import DockerContainerPool
+
+    basetemp = tmp_path_factory.getbasetemp()
+    pool = DockerContainerPool(
+        mounts=[basetemp, pytestconfig.rootpath, user_cache_dir("executables")],
+        work_dir=basetemp / "viashpy_docker_pool",
+    )
+    yield pool
+    pool.close()
+
+
+@pytest.fixture(scope="session")
+def viash_resource_pool(tmp_path_factory, pytestconfig):
+    """
+    Pool of the CPUs and memory of the host, shared between pytest-xdist workers.
+    'run_component' waits until the CPUs and memory that are declared for the
+    component (see the 'cpus' and 'memory_bytes' fixtures) are available in
+    the pool before running it, so that the workers together do not oversubscribe
+    the host. The capacity can be set with the '--viash-host-cpus' and
+    '--viash-host-memory' options (or the 'viash_host_cpus' and 'viash_host_memory'
+    ini options), and defaults to the CPUs and memory of the host.
+    """
+    from ._resources import FileResourcePool, memory_to_bytes
+
+    host_cpus = _get_flag(pytestconfig, "viash_host_cpus")
+    host_memory = _get_flag(pytestconfig, "viash_host_memory")
+    return FileResourcePool(
+        _session_shared_dir(tmp_path_factory, pytestconfig, "viashpy_resources"),
+        cpus=int(host_cpus) if host_cpus else None,
+        memory_bytes=memory_to_bytes(host_memory),
+    )
+
+
+@pytest.fixture(scope="session")
+def viash_run_timeouts(pytestconfig):
+    """
+    The time limits for running components with 'run_component': the
+    '--viash-timeout' option (or 'viash_timeout' ini option) limits each run
+    and the '--viash-session-timeout' option (or 'viash_session_timeout' ini option)
+    sets a deadline for all runs in the session, counted from the first test that
+    runs a component. The deadline is wall-clock time, so the time spent in test code and
+    between runs counts as well. With pytest-xdist, each worker has its own deadline.
+    """
+    from ._process import RunTimeouts
+
+    call_timeout = _get_flag(pytestconfig, "viash_timeout")
+    session_timeout = _get_flag(pytestconfig, "viash_session_timeout")
+    return RunTimeouts(
+        float(call_timeout) if call_timeout else None,
+        float(session_timeout) if session_timeout else None,
+    )
+
+
+@pytest.fixture
+def viash_resource_usage(request):
+    """
+    Collects the measured resource usage of the components that are run with
+    'run_component', when enabled using the '--viash-resource-report' option or
+    the 'viash_resource_report' ini option; returns None otherwise.
+    The peak memory usage and the CPU utilization of each run are added to the report
+    of the test next to the declared CPUs and memory (see the 'cpus' and 'memory_bytes'
+    fixtures). A 'ResourceUsageWarning' is issued when a run uses more than it declared,
+    or less than the fraction set by the 'viash_resource_underuse' ini option.
+
+    For native runs, the usage of the process is measured when it exits. Native
+    components are run from a build (see the 'build' argument of 'run_component'),
+    because the usage of 'viash run' would include its JVM; with 'build=False' the
+    usage is reported as not measured. Components that run in docker using 'viash run'
+    are measured by sampling 'docker stats' for the container of the run. The usage of
+    docker runs that are too short to be sampled, or that are run in another way
+    (e.g. a built executable or the docker pool), is reported as not measured.
+    """
+    if not _get_flag(request.config, "viash_resource_report"):
+        yield None
+        return
+    from ._resource_usage import ResourceUsageReport
+
+    report = ResourceUsageReport(
+        float(request.config.getini("viash_resource_underuse"))
+    )
+    yield report
+    if report.runs:
+        request.node.add_report_section(
+            "teardown", "viash resource usage", report.format()
+        )
+
+
+@pytest.fixture(scope="session")
+def viash_config_index(pytestconfig):
+    """
+    Index of all the viash components in the project (the directory containing
+    '_viash.yaml', or the pytest rootdir), built once per session.
+    Components can be looked up by (namespace and) name, e.g.
+    'viash_config_index["my_namespace/my_component"].config'.
+    """
+    from .index import ConfigIndex
+
+    root = pytestconfig.rootpath
+    for directory in [root, *root.parents]:
+        if (directory / "_viash.yaml").is_file():
+            root = directory
+            break
+    return ConfigIndex.build(root)
+
+
+def _get_meta(test_module):
     try:
         return test_module.meta
     except AttributeError as e:
@@ -32,34 +535,35 @@ def meta(test_module):
         ) from e
 
 
-@pytest.fixture
-def executable(meta_attribute_getter):
-    return meta_attribute_getter("executable")
+def _meta_attribute_getter(meta, test_module):
+    def get_meta_attribute(attr):
+        try:
+            return meta[attr]
+        except KeyError as e:
+            raise KeyError(
+                f"Could not find '{attr}' key in 'meta' variable of test module {test_module}. "
+                "Please make sure it is defined."
+            ) from e
 
+    return get_meta_attribute
 
-@pytest.fixture
-def cpus(meta_attribute_getter):
+
+def _cpus_from_meta(get_meta_attribute):
     try:
-        return meta_attribute_getter("cpus")
+        return get_meta_attribute("cpus")
     except KeyError:
         return None
 
 
-@pytest.fixture
-def memory_bytes(meta_attribute_getter):
+def _memory_bytes_from_meta(get_meta_attribute):
     """
-    Cover the different scenarios that can occur when memory requirements are set.
-
-    1. All memory fields set to 'None' (i.e. viash (ns) test without `--memory` or all fields manually set to None in test script): return None
-    2. All memory fields not defined (i.e. KeyError, only when not set in test script and not using viash (ns) test): return None
-    3. All memory fields set (either by running viash (ns) test or setting them manually): return the bytes
-    4. Multiple values set, but not all (manually in test script): return the value for the smallest unit, converted to bytes.
-    5. 1 value set: return the value (manually in test script), converted to bytes.
+    Reconcile the memory fields of 'meta', see the 'memory_bytes' fixture.
     """
+    _import_lazy_attributes()
     all_memory_attributes = {}
     for suffix in tobytesconverter.AVAILABLE_UNITS():
         try:
-            memory_value = meta_attribute_getter(f"memory_{suffix.lower()}")
+            memory_value = get_meta_attribute(f"memory_{suffix.lower()}")
             if memory_value is not None:
                 assert isinstance(memory_value, int) or isinstance(
                     memory_value, float
@@ -91,24 +595,9 @@ def memory_bytes(meta_attribute_getter):
     return f"{int(unit_value)}B"
 
 
-@pytest.fixture
-def meta_attribute_getter(meta, test_module):
-    def get_meta_attribute(attr):
-        try:
-            return meta[attr]
-        except KeyError as e:
-            raise KeyError(
-                f"Could not find '{attr}' key in 'meta' variable of test module {test_module}. "
-                "Please make sure it is defined."
-            ) from e
-
-    return get_meta_attribute
-
-
-@pytest.fixture
-def meta_config_path(meta_attribute_getter, test_module):
+def _meta_config_path(get_meta_attribute, test_module):
     try:
-        config_path = meta_attribute_getter("config")
+        config_path = get_meta_attribute("config")
     except KeyError:
         raise KeyError(
             f"The 'config' value was not set in the 'meta' dictionary of the test module {test_module}."
@@ -119,9 +608,148 @@ def meta_config_path(meta_attribute_getter, test_module):
     return Path(config_path)
 
 
+def _viash_source_config_path(meta_config_path, meta_config):
+    try:
+        # meta_config is a parsed viash config, retreive the location of the source
+        return Path(meta_config["build_info"]["config"])
+    except KeyError:
+        # viash < 0.9 defines info instead of build_info
+        try:
+            return Path(meta_config["info"]["config"])
+        except KeyError:
+            # If .['info']['config'] or .['build_info']['config'] is not defined,
+            # assume that the config is a source config
+            return meta_config_path
+
+
+def _shared_property(method):
+    """
+    Like 'functools.cached_property', but stores the value in the '_values' dictionary
+    of the instance, which can be shared between instances.
+    """
+    name = method.__name__
+
+    @wraps(method)
+    def getter(self):
+        try:
+            return self._values[name]
+        except KeyError:
+            value = self._values[name] = method(self)
+            return value
+
+    return property(getter)
+
+
+class ResolvedMeta:
+    """
+    The values that the meta fixtures derive from the 'meta' variable of a test module
+    ('cpus', 'memory_bytes', 'meta_config_path', 'meta_config', 'viash_source_config_path'
+    and 'viash_source_config'), each computed once when it is first used.
+    Instances created with the same 'values' dictionary share the computed values.
+    """
+
+    def __init__(self, meta: dict, test_module, values: dict | None = None):
+        self.meta = meta
+        self.test_module = test_module
+        self.get_meta_attribute = _meta_attribute_getter(meta, test_module)
+        self._values = {} if values is None else values
+
+    @_shared_property
+    def cpus(self):
+        return _cpus_from_meta(self.get_meta_attribute)
+
+    @_shared_property
+    def memory_bytes(self):
+        return _memory_bytes_from_meta(self.get_meta_attribute)
+
+    @_shared_property
+    def meta_config_path(self):
+        return _meta_config_path(self.get_meta_attribute, self.test_module)
+
+    @_shared_property
+    def meta_config(self):
+        _import_lazy_attributes()
+        return read_viash_config_cached(self.meta_config_path)
+
+    @_shared_property
+    def viash_source_config_path(self):
+        return _viash_source_config_path(self.meta_config_path, self.meta_config)
+
+    @_shared_property
+    def viash_source_config(self):
+        _import_lazy_attributes()
+        return read_viash_config_cached(self.viash_source_config_path)
+
+
+class MetaResolver:
+    """
+    Resolves the 'meta' variable of test modules into a 'ResolvedMeta'. The values
+    derived from the 'meta' are computed once per distinct 'meta': test modules with
+    equal 'meta' dictionaries share them, but each module gets its own 'ResolvedMeta'
+    so that errors refer to the right module.
+    """
+
+    def __init__(self):
+        self._values = {}
+
+    def resolve(self, test_module) -> ResolvedMeta:
+        meta = _get_meta(test_module)
+        try:
+            key = frozenset(meta.items())
+        except TypeError:
+            # Unhashable values, do not share with other modules.
+            key = id(test_module)
+        values = self._values.setdefault(key, {})
+        return ResolvedMeta(meta, test_module, values)
+
+
+@pytest.fixture
+def meta(test_module):
+    return _get_meta(test_module)
+
+
+@pytest.fixture
+def executable(meta_attribute_getter):
+    return meta_attribute_getter("executable")
+
+
+@pytest.fixture
+def cpus(meta_attribute_getter):
+    return _cpus_from_meta(meta_attribute_getter)
+
+
+@pytest.fixture
+def memory_bytes(meta_attribute_getter):
+    """
+    Cover the different scenarios that can occur when memory requirements are set.
+
+    1. All memory fields set to 'None' (i.e. viash (ns) test without `--memory` or all fields manually set to None in test script): return None
+    2. All memory fields not defined (i.e. KeyError, only when not set in test script and not using viash (ns) test): return None
+    3. All memory fields set (either by running viash (ns) test or setting them manually): return the bytes
+    4. Multiple values set, but not all (manually in test script): return the value for the smallest unit, converted to bytes.
+    5. 1 value set: return the value (manually in test script), converted to bytes.
+    """
+    return _memory_bytes_from_meta(meta_attribute_getter)
+
+
+@pytest.fixture
+def meta_attribute_getter(meta, test_module):
+    return _meta_attribute_getter(meta, test_module)
+
+
+@pytest.fixture
+def meta_config_path(meta_attribute_getter, test_module):
+    return _meta_config_path(meta_attribute_getter, test_module)
+
+
 @pytest.fixture
 def meta_config(meta_config_path):
-    return read_viash_config(meta_config_path)
+    """
+    The parsed config from meta['config'], as a read-only view that is
+    shared between tests (see 'viashpy.config.read_viash_config_cached').
+    """
+    _import_lazy_attributes()
+    return read_viash_config_cached(meta_config_path)
 
 
 @pytest.fixture
@@ -133,27 +761,94 @@ def viash_source_config_path(meta_config_path, meta_config):
     From a parsed config, the path to the original config source can be
     retreived from .['info']['config'] keys.
     """
-    try:
-        # meta_config is a parsed viash config, retreive the location of the source
-        return Path(meta_config["build_info"]["config"])
-    except KeyError:
-        # viash < 0.9 defines info instead of build_info
-        try:
-            return Path(meta_config["info"]["config"])
-        except KeyError:
-            # If .['info']['config'] or .['build_info']['config'] is not defined,
-            # assume that the config is a source config
-            return meta_config_path
+    return _viash_source_config_path(meta_config_path, meta_config)
 
 
 @pytest.fixture
 def viash_source_config(viash_source_config_path):
-    return read_viash_config(viash_source_config_path)
+    _import_lazy_attributes()
+    return read_viash_config_cached(viash_source_config_path)
+
+
+@pytest.fixture(scope="session")
+def viash_meta_resolver():
+    """
+    Resolves the 'meta' variable of a test module once per session and shares the
+    result between test modules with the same 'meta' (see 'MetaResolver'). Use
+    'viash_meta_resolver.resolve(module)' in session-scoped fixtures of your own.
+    """
+    return MetaResolver()
+
+
+@pytest.fixture(scope="module")
+def module_resolved_meta(request, viash_meta_resolver):
+    """
+    The 'ResolvedMeta' of the current test module. The 'module_*' fixtures
+    ('module_meta', 'module_cpus', 'module_memory_bytes', 'module_meta_config_path',
+    'module_meta_config', 'module_viash_source_config_path' and
+    'module_viash_source_config') are module-scoped counterparts of the meta fixtures
+    that are resolved once and shared by all tests in the module, e.g. to avoid
+    rebuilding the fixtures for each of thousands of parametrized tests.
+    They do not use the function-scoped fixtures, so overriding those
+    (e.g. 'meta' or 'memory_bytes') does not affect them.
+    """
+    return viash_meta_resolver.resolve(request.module)
+
+
+@pytest.fixture(scope="module")
+def module_meta(module_resolved_meta):
+    return module_resolved_meta.meta
+
+
+@pytest.fixture(scope="module")
+def module_cpus(module_resolved_meta):
+    return module_resolved_meta.cpus
+
+
+@pytest.fixture(scope="module")
+def module_memory_bytes(module_resolved_meta):
+    return module_resolved_meta.memory_bytes
+
+
+@pytest.fixture(scope="module")
+def module_meta_config_path(module_resolved_meta):
+    return module_resolved_meta.meta_config_path
+
+
+@pytest.fixture(scope="module")
+def module_meta_config(module_resolved_meta):
+    return module_resolved_meta.meta_config
+
+
+@pytest.fixture(scope="module")
+def module_viash_source_config_path(module_resolved_meta):
+    return module_resolved_meta.viash_source_config_path
+
+
+@pytest.fixture(scope="module")
+def module_viash_source_config(module_resolved_meta):
+    return module_resolved_meta.viash_source_config
 
 
 @pytest.fixture
 def run_component(
-    caplog, executable, viash_source_config_path, viash_executable, cpus, memory_bytes
+    request,
+    caplog,
+    tmp_path_factory,
+    executable,
+    meta_config,
+    viash_source_config_path,
+    viash_executable,
+    cpus,
+    memory_bytes,
+    viash_build_registry,
+    viash_executable_cache,
+    viash_result_cache,
+    viash_phase_recorder,
+    viash_resource_pool,
+    viash_docker_pool,
+    viash_resource_usage,
+    viash_run_timeouts,
 ):
     """
     Returns a function that allows the user to run a viash component.
@@ -167,32 +862,453 @@ def run_component(
     the function will use 'viash run' to run the component. In contrast,
     if meta['config'] is a parsed config (as a result of executing
     tests using 'viash test'), the build component executable will be used
-    instead.
+    instead. With the '--viash-run-executable' option (or the 'viash_run_executable'
+    ini option), the executable is always used, also when the source config exists
+    (e.g. when the tests are run by 'python -m viashpy test').
+
+    When using the docker engine inline, the docker image is built only once
+    per session for each version of the config and its resources
+    (see the 'viash_build_registry' fixture). When the '--viash-build-cache' option
+    is used (or the 'viash_build_cache' ini option is set), the component is
+    built once with 'viash build' and the resulting executable is run instead of
+    using 'viash run' (see the 'viash_executable_cache' fixture). With the
+    '--viash-docker-pool' option, components that use the docker engine are run
+    in a long-lived container instead (see the 'viash_docker_pool' fixture).
+    To choose for a single call, pass 'build=True' (run a build from the cache)
+    or 'build=False' (use 'viash run').
+
+    By default, all output of the component is kept in memory and returned.
+    For components that produce a lot of output, use 'stream=True' to get an iterator
+    over the lines of output while the component is running, or 'tee' (a path) to
+    write the output to a file while only keeping the last 'max_output_bytes'
+    (1 MiB by default) in memory.
+
+    The returned function has a 'run_async' attribute, an awaitable variant
+    that can be used to run many components concurrently (e.g. using
+    'asyncio.gather'). It accepts a 'timeout' (in seconds) for the component.
+
+    To run the component for many argument lists concurrently, use the 'map'
+    attribute: 'run_component.map(list_of_arg_lists, max_workers=...)'. Runs are
+    only started when the CPUs and memory requested for the component (see the
+    'cpus' and 'memory_bytes' fixtures) are available on the host. The outputs are
+    returned in input order; with 'return_exceptions=True' the error of a failed run
+    (which holds its own captured output) is returned instead of being raised.
+
+    With the '--viash-resource-report' option, the resource usage of each run is
+    compared against the declared CPUs and memory (see the 'viash_resource_usage' fixture).
+
+    A run is killed when it takes longer than 'timeout' seconds (or the time set with
+    the '--viash-timeout' and '--viash-session-timeout' options, see the
+    'viash_run_timeouts' fixture). All processes started by the component are killed
+    and its docker container is removed; the test fails with a 'subprocess.TimeoutExpired'
+    and the output up to that point is logged.
+
+    To fail early, pass 'abort_on', a list of regular expressions (e.g. ['Traceback',
+    'MemoryError']); patterns from the 'viash_abort_on' ini option are always used.
+    The output is searched line by line while the component runs, and the component
+    is killed as soon as a line matches. The test then fails with an
+    'OutputPatternMatched' (a 'subprocess.CalledProcessError') that shows the pattern
+    and the lines of output leading up to the match.
+
+    A component only starts when the CPUs and memory requested for it are not in
+    use by other components, including those that are started by other pytest-xdist
+    workers (see the 'viash_resource_pool' fixture).
+
+    With the '--viash-timings' option, the time spent in each phase of running
+    the component is recorded (see the 'viash_phase_recorder' fixture). To record
+    the phases of a single call instead, pass a 'recorder' (a 'PhaseRecorder').
     """
     __tracebackhide__ = True
+    from subprocess import CalledProcessError, TimeoutExpired
+    from ._build import ExecutableCache
+    from ._cache import hash_file, user_cache_dir
+    from ._container_pool import viash_run_in_container
+    from ._docker import docker_image_id
+    from ._process import StreamedProcess
+    from ._resource_usage import (
+        DockerStatsSampler,
+        ResourceUsage,
+        ResourceUsageWarning,
+    )
+    from ._resources import ResourcePool, memory_to_bytes, run_batch
+    from ._timing import PhaseRecorder, record_phase
+    import asyncio
+    import uuid
+
+    _import_lazy_attributes()
+
+    def log_and_raise(e, tee):
+        __tracebackhide__ = True
+        with caplog.at_level(logging.DEBUG):
+            output = (e.stdout or b"").decode("utf-8", errors="replace")
+            if tee:
+                logger.info(
+                    f"Full component output was written to {tee}, last part was:\n{output}"
+                )
+            else:
+                logger.info(f"Captured component output was:\n{output}")
+            # Create a new CalledProcessError object. This removes verbosity from the original object
+            raise e.with_traceback(None) from None
+
+    def handle_stream_errors(streamed_process, tee):
+        __tracebackhide__ = True
+        try:
+            yield from streamed_process
+        except (CalledProcessError, TimeoutExpired) as e:
+            log_and_raise(e, tee)
+
+    def release_after_stream(lines, resources):
+        with resources:
+            yield from lines
+
+    def reserve_resources(function_to_run):
+        """
+        Hold the declared CPUs and memory of the component in the resource pool while
+        it runs. For streamed output, the resources are released when the stream ends.
+        """
 
-    def run_and_handle_errors(function_to_run):
         @wraps(function_to_run)
         def wrapper(*args, **kwargs):
             __tracebackhide__ = True
+            with ExitStack() as resources:
+                resources.enter_context(
+                    viash_resource_pool.reserve(cpus, memory_to_bytes(memory_bytes))
+                )
+                result = function_to_run(*args, **kwargs)
+                if inspect.isgenerator(result):
+                    return release_after_stream(result, resources.pop_all())
+                return result
+
+        return wrapper
+
+    def reserve_resources_async(function_to_run):
+        @wraps(function_to_run)
+        async def wrapper(*args, **kwargs):
+            reservation_id = await viash_resource_pool.acquire_async(
+                cpus, memory_to_bytes(memory_bytes)
+            )
             try:
-                return function_to_run(*args, **kwargs)
-            except CalledProcessError as e:
-                with caplog.at_level(logging.DEBUG):
-                    logger.info(
-                        f"Captured component output was:\n{e.stdout.decode('utf-8')}"
+                return await function_to_run(*args, **kwargs)
+            finally:
+                viash_resource_pool.release(reservation_id)
+
+        return wrapper
+
+    def report_resource_usage(
+        args_as_list, recorder, own_recorder, sampler, measured=True
+    ):
+        run_phases = [phase for phase in recorder.phases if phase.name == "run"]
+        if own_recorder and viash_phase_recorder is not None:
+            for phase in recorder.phases:
+                viash_phase_recorder._add(phase)
+        if not run_phases:
+            return
+        run_phase = run_phases[-1]
+        if not measured:
+            usage = ResourceUsage.not_measured(run_phase.wall_time)
+        elif sampler is None:
+            usage = ResourceUsage.from_phase(run_phase)
+        else:
+            # The usage of the docker client says nothing about the container.
+            usage = sampler.usage(run_phase.wall_time) or ResourceUsage.not_measured(
+                run_phase.wall_time
+            )
+        for message in viash_resource_usage.add(
+            args_as_list, usage, cpus, memory_to_bytes(memory_bytes)
+        ):
+            warnings.warn(ResourceUsageWarning(message))
+
+    def measure_resources(docker_image, build_native: bool = False):
+        """
+        Measure the resource usage of a run when 'viash_resource_usage' is enabled.
+        'docker_image' is called with the keyword arguments of the run and returns
+        the image of the containers to sample, or None for native runs.
+        With 'build_native', native runs use a built executable (see the 'build'
+        argument of 'run_component'), because the usage of 'viash run' includes its JVM.
+        """
+
+        def decorator(function_to_run):
+            @wraps(function_to_run)
+            def wrapper(args_as_list, *args, **kwargs):
+                __tracebackhide__ = True
+                if viash_resource_usage is None:
+                    return function_to_run(args_as_list, *args, **kwargs)
+                # Use a separate recorder to find the phases of this run, also when
+                # other runs are recording phases concurrently.
+                own_recorder = kwargs.get("recorder") is None
+                if own_recorder:
+                    kwargs["recorder"] = PhaseRecorder()
+                image = docker_image(*args, **kwargs)
+                measured = True
+                if build_native and not image:
+                    measured = kwargs.setdefault("build", True) is not False
+                with ExitStack() as measuring:
+                    sampler = None
+                    if image:
+                        # Only sample the container of this run, not those of other
+                        # runs of the same component.
+                        kwargs["container_label"] = f"viashpy.run={uuid.uuid4().hex}"
+                        sampler = measuring.enter_context(
+                            DockerStatsSampler(kwargs["container_label"])
+                        )
+                    measuring.callback(
+                        report_resource_usage,
+                        args_as_list,
+                        kwargs["recorder"],
+                        own_recorder,
+                        sampler,
+                        measured,
                     )
-                    # Create a new CalledProcessError object. This removes verbosity from the original object
-                    raise e.with_traceback(None) from None
+                    result = function_to_run(args_as_list, *args, **kwargs)
+                    if inspect.isgenerator(result):
+                        return release_after_stream(result, measuring.pop_all())
+                    return result
+
+            return wrapper
+
+        return decorator
+
+    def run_and_handle_errors(function_to_run):
+        @wraps(function_to_run)
+        def wrapper(*args, **kwargs):
+            __tracebackhide__ = True
+            try:
+                result = function_to_run(*args, **kwargs)
+            except (CalledProcessError, TimeoutExpired) as e:
+                log_and_raise(e, kwargs.get("tee"))
+            if isinstance(result, StreamedProcess) or inspect.isgenerator(result):
+                return handle_stream_errors(result, kwargs.get("tee"))
+            return result
+
+        return wrapper
+
+    def run_async_and_handle_errors(function_to_run):
+        @wraps(function_to_run)
+        async def wrapper(*args, **kwargs):
+            __tracebackhide__ = True
+            try:
+                return await function_to_run(*args, **kwargs)
+            except (CalledProcessError, TimeoutExpired) as e:
+                log_and_raise(e, None)
+
+        return wrapper
+
+    def run_timeout(timeout):
+        __tracebackhide__ = True
+        timeout = viash_run_timeouts.timeout(timeout)
+        if timeout is not None and timeout <= 0:
+            pytest.fail(
+                "The session timeout of "
+                f"{viash_run_timeouts.session_timeout} seconds for running "
+                "components has expired.",
+                pytrace=False,
+            )
+        return timeout
+
+    def limit_run_time(function_to_run):
+        @wraps(function_to_run)
+        def wrapper(*args, timeout: float | None = None, **kwargs):
+            __tracebackhide__ = True
+            return function_to_run(*args, timeout=run_timeout(timeout), **kwargs)
+
+        return wrapper
+
+    default_abort_on = request.config.getini("viash_abort_on")
+
+    def add_abort_patterns(function_to_run):
+        @wraps(function_to_run)
+        def wrapper(*args, abort_on: list | None = None, **kwargs):
+            __tracebackhide__ = True
+            patterns = [*default_abort_on, *(abort_on or [])]
+            return function_to_run(*args, abort_on=patterns or None, **kwargs)
+
+        return wrapper
+
+    def limit_run_time_async(function_to_run):
+        @wraps(function_to_run)
+        async def wrapper(*args, timeout: float | None = None, **kwargs):
+            __tracebackhide__ = True
+            return await function_to_run(*args, timeout=run_timeout(timeout), **kwargs)
 
         return wrapper
 
-    if viash_source_config_path.is_file():
+    def add_run_variants(wrapper, run_async):
+        def run_many(arg_lists, max_workers=None, *, return_exceptions=False, **kwargs):
+            __tracebackhide__ = True
+            # Limits the number of runs that wait for 'viash_resource_pool' at once.
+            local_pool = ResourcePool(
+                viash_resource_pool.cpus, viash_resource_pool.memory_bytes
+            )
+            return run_batch(
+                wrapper,
+                arg_lists,
+                cpus=cpus,
+                memory_bytes=memory_to_bytes(memory_bytes),
+                max_workers=max_workers,
+                resource_pool=local_pool,
+                return_exceptions=return_exceptions,
+                **kwargs,
+            )
 
+        wrapper.run_async = run_async
+        wrapper.map = run_many
+        return wrapper
+
+    result_cache = viash_result_cache
+    if request.node.get_closest_marker("viash_no_result_cache"):
+        result_cache = None
+
+    def use_result_cache(component_identity):
+        """
+        Replay the result of running the component from the result cache when possible.
+        'component_identity' is called with the keyword arguments of the run and
+        must return what identifies the component that is being run.
+        """
+
+        def decorator(function_to_run):
+            @wraps(function_to_run)
+            def wrapper(args_as_list, *args, use_cache: bool = True, **kwargs):
+                __tracebackhide__ = True
+                if (
+                    result_cache is None
+                    or not use_cache
+                    or kwargs.get("stream")
+                    or kwargs.get("tee")
+                ):
+                    return function_to_run(args_as_list, *args, **kwargs)
+                cwd = Path.cwd()
+                # The temporary directories of the test and the session change every
+                # session, so paths in them are hashed relative to them.
+                roots = [
+                    cwd,
+                    request.getfixturevalue("tmp_path"),
+                    tmp_path_factory.getbasetemp(),
+                ]
+                identity = component_identity(*args, **kwargs) + [
+                    cpus,
+                    memory_bytes,
+                ]
+                snapshot = result_cache.snapshot(args_as_list, cwd)
+                key = result_cache.key(identity, args_as_list, cwd, roots, snapshot)
+                cached_output = result_cache.replay(key, args_as_list, cwd)
+                if cached_output is not None:
+                    return cached_output
+                output = function_to_run(args_as_list, *args, **kwargs)
+                result_cache.store(identity, args_as_list, cwd, output, snapshot, roots)
+                return output
+
+            return wrapper
+
+        return decorator
+
+    def docker_identity(config):
+        image = config_docker_image(config)
+        return docker_image_id(image) if image else None
+
+    if viash_source_config_path.is_file() and not _get_flag(
+        request.config, "viash_run_executable"
+    ):
+
+        def source_config_identity(
+            engine: Engine | None = None, platform: Platform | None = None, **kwargs
+        ):
+            engine_or_platform = engine or platform
+            identity = [
+                config_content_hash(viash_source_config_path),
+                engine_or_platform,
+            ]
+            if engine_or_platform in (None, "docker"):
+                identity.append(
+                    docker_identity(read_viash_config_cached(viash_source_config_path))
+                )
+            return identity
+
+        def uses_docker(engine, platform):
+            return (engine or platform) in (None, "docker") and bool(
+                config_docker_image(read_viash_config_cached(viash_source_config_path))
+            )
+
+        def runs_in_docker_pool(engine, platform):
+            # The component is built for the native engine to run it in the pool.
+            return uses_docker(engine, platform) and "native" in config_engine_types(
+                read_viash_config_cached(viash_source_config_path)
+            )
+
+        def source_config_docker_image(
+            engine: Engine | None = None, platform: Platform | None = None, **kwargs
+        ):
+            if not uses_docker(engine, platform):
+                return None
+            return config_docker_image(
+                read_viash_config_cached(viash_source_config_path)
+            )
+
+        @use_result_cache(source_config_identity)
+        @reserve_resources
+        @measure_resources(source_config_docker_image, build_native=True)
+        @limit_run_time
+        @add_abort_patterns
         @run_and_handle_errors
         def wrapper(
-            args_as_list, engine: Engine | None = None, platform: Platform | None = None
+            args_as_list,
+            engine: Engine | None = None,
+            platform: Platform | None = None,
+            *,
+            stream: bool = False,
+            tee: str | Path | None = None,
+            max_output_bytes: int | None = None,
+            recorder: PhaseRecorder | None = None,
+            timeout: float | None = None,
+            abort_on: list | None = None,
+            container_label: str | None = None,
+            build: bool | None = None,
         ):
+            recorder = recorder or viash_phase_recorder
+            executable_cache = viash_executable_cache
+            if build is False:
+                executable_cache = None
+            elif build and executable_cache is None:
+                executable_cache = ExecutableCache(user_cache_dir("executables"))
+            if viash_docker_pool is not None and runs_in_docker_pool(engine, platform):
+                return viash_run_in_container(
+                    viash_source_config_path,
+                    args_as_list,
+                    pool=viash_docker_pool,
+                    executable_cache=viash_executable_cache
+                    or ExecutableCache(user_cache_dir("executables")),
+                    cpus=cpus,
+                    memory=memory_bytes,
+                    engine=engine,
+                    platform=platform,
+                    viash_location=viash_executable,
+                    build_registry=viash_build_registry,
+                    stream=stream,
+                    tee=tee,
+                    max_output_bytes=max_output_bytes,
+                    recorder=recorder,
+                    timeout=timeout,
+                    abort_on=abort_on,
+                )
+            if executable_cache is not None:
+                with record_phase(recorder, "build"):
+                    built_executable = executable_cache.get(
+                        viash_source_config_path,
+                        engine=engine,
+                        platform=platform,
+                        viash_location=viash_executable,
+                    )
+                return run_build_component(
+                    built_executable,
+                    args_as_list,
+                    cpus=cpus,
+                    memory=memory_bytes,
+                    stream=stream,
+                    tee=tee,
+                    max_output_bytes=max_output_bytes,
+                    recorder=recorder,
+                    timeout=timeout,
+                    abort_on=abort_on,
+                )
             return viash_run(
                 viash_source_config_path,
                 args_as_list,
@@ -201,19 +1317,188 @@ def run_component(
                 memory=memory_bytes,
                 engine=engine,
                 platform=platform,
+                build_registry=viash_build_registry,
+                stream=stream,
+                tee=tee,
+                max_output_bytes=max_output_bytes,
+                recorder=recorder,
+                timeout=timeout,
+                abort_on=abort_on,
+                container_label=container_label,
             )
 
-        return wrapper
+        @run_async_and_handle_errors
+        @reserve_resources_async
+        @limit_run_time_async
+        async def run_async(
+            args_as_list,
+            engine: Engine | None = None,
+            platform: Platform | None = None,
+            *,
+            timeout: float | None = None,
+        ):
+            if viash_executable_cache is not None:
+                built_executable = await asyncio.to_thread(
+                    viash_executable_cache.get,
+                    viash_source_config_path,
+                    engine=engine,
+                    platform=platform,
+                    viash_location=viash_executable,
+                )
+                return await run_build_component_async(
+                    built_executable,
+                    args_as_list,
+                    cpus=cpus,
+                    memory=memory_bytes,
+                    timeout=timeout,
+                )
+            return await viash_run_async(
+                viash_source_config_path,
+                args_as_list,
+                viash_location=viash_executable,
+                cpus=cpus,
+                memory=memory_bytes,
+                engine=engine,
+                platform=platform,
+                build_registry=viash_build_registry,
+                timeout=timeout,
+            )
+
+        return add_run_variants(wrapper, run_async)
 
     logger.debug(
         "Could not find the original viash config source. "
         "Assuming test script is run from 'viash test' or 'viash_test'."
     )
 
+    def build_component_identity(**kwargs):
+        return [hash_file(executable), docker_identity(meta_config)]
+
+    def build_component_docker_image(**kwargs):
+        engine = (meta_config.get("build_info") or {}).get("engine")
+        if engine not in (None, "docker"):
+            return None
+        return config_docker_image(meta_config)
+
+    @use_result_cache(build_component_identity)
+    @reserve_resources
+    @measure_resources(build_component_docker_image)
+    @limit_run_time
+    @add_abort_patterns
     @run_and_handle_errors
-    def wrapper(args_as_list):
+    def wrapper(
+        args_as_list,
+        *,
+        stream: bool = False,
+        tee: str | Path | None = None,
+        max_output_bytes: int | None = None,
+        recorder: PhaseRecorder | None = None,
+        timeout: float | None = None,
+        abort_on: list | None = None,
+        container_label: str | None = None,
+        build: bool | None = None,
+    ):
         return run_build_component(
-            executable, args_as_list, cpus=cpus, memory=memory_bytes
+            executable,
+            args_as_list,
+            cpus=cpus,
+            memory=memory_bytes,
+            stream=stream,
+            tee=tee,
+            max_output_bytes=max_output_bytes,
+            recorder=recorder or viash_phase_recorder,
+            timeout=timeout,
+            abort_on=abort_on,
+        )
+
+    @run_async_and_handle_errors
+    @reserve_resources_async
+    @limit_run_time_async
+    async def run_async(args_as_list, *, timeout: float | None = None):
+        return await run_build_component_async(
+            executable, args_as_list, cpus=cpus, memory=memory_bytes, timeout=timeout
+        )
+
+    return add_run_variants(wrapper, run_async)
+
+
+@pytest.fixture
+def benchmark_component(request, run_component, viash_source_config_path):
+    """
+    Returns a function that runs a component repeatedly using 'run_component'
+    and measures the wall time, the CPU time and the peak memory usage (RSS) of each run.
+    It accepts the same arguments as 'run_component', and 'rounds' (the number of
+    measured runs, the 'viash_benchmark_rounds' ini option by default), 'warmup'
+    (the number of runs before measuring, 'viash_benchmark_warmup') and 'name'
+    (the name of the benchmark, the name of the test by default).
+    Runs are never replayed from the result cache. A 'BenchmarkResult' is returned,
+    which holds the median and the interquartile range of the measurements.
+
+    The results are compared against the baseline for the benchmark, which is stored in
+    'benchmark_baseline.json' next to the (source) config of the component. The test fails
+    when the median of a measurement exceeds the median of the baseline by more than
+    the threshold (set by '--viash-benchmark-threshold' or the 'viash_benchmark_threshold'
+    ini option, 0.2 by default) and by more than the interquartile range of the baseline.
+    With the '--viash-benchmark-update' option, the baseline is replaced by the results instead.
+
+    When the component is run from its source config, it is built once (see the
+    'build' argument of 'run_component') and the built executable is benchmarked.
+    Running 'viash run' starts a JVM, which would dominate the wall and CPU time, and its
+    memory usage would hide the peak memory usage of the component. Pass 'build=False'
+    to benchmark 'viash run' instead. For components that run in a docker container,
+    the CPU time and memory usage describe the 'docker' client process, not the container.
+    """
+    from ._benchmark import BenchmarkBaseline, BenchmarkResult, measurements_from_phase
+    from ._timing import PhaseRecorder
+
+    config = request.config
+    threshold = float(_get_flag(config, "viash_benchmark_threshold"))
+    update_baseline = _get_flag(config, "viash_benchmark_update")
+    baseline = BenchmarkBaseline(
+        viash_source_config_path.parent / "benchmark_baseline.json"
+    )
+
+    def benchmark(
+        args_as_list,
+        *args,
+        rounds: int | None = None,
+        warmup: int | None = None,
+        name: str | None = None,
+        **kwargs,
+    ) -> BenchmarkResult:
+        __tracebackhide__ = True
+        if rounds is None:
+            rounds = int(config.getini("viash_benchmark_rounds"))
+        if warmup is None:
+            warmup = int(config.getini("viash_benchmark_warmup"))
+        kwargs.setdefault("build", True)
+        runs = []
+        for round_number in range(warmup + rounds):
+            recorder = PhaseRecorder()
+            run_component(
+                args_as_list, *args, use_cache=False, recorder=recorder, **kwargs
+            )
+            if round_number >= warmup:
+                *_, run_phase = (
+                    phase for phase in recorder.phases if phase.name == "run"
+                )
+                runs.append(measurements_from_phase(run_phase))
+        result = BenchmarkResult(name or request.node.name, runs)
+        request.node.add_report_section(
+            "call", f"viash benchmark {result.name}", result.format()
         )
+        if update_baseline:
+            baseline.update(result)
+            return result
+        stored = baseline.get(result.name)
+        if stored is not None:
+            regressions = result.regressions(stored, threshold)
+            if regressions:
+                pytest.fail(
+                    f"Benchmark '{result.name}' regressed compared to {baseline.path}:\n"
+                    + "\n".join(regressions),
+                    pytrace=False,
+                )
+        return result
 
-    return wrapper
+    return benchmark
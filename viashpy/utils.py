@@ -1,7 +1,29 @@
 from __future__ import annotations
-from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+from threading import BoundedSemaphore
+import os
+import shutil
 import tarfile
+import tempfile
 import logging
+from ._extraction_cache import ExtractionCache
+from ._compression import (
+    TAR_SHORT_SUFFIXES,
+    detect_compression,
+    open_decompressed,
+    tarfile_supports,
+)
+from ._pack import pack_tar
+from ._tar_index import (
+    TarArchive,
+    _extraction_filter,
+    _safe_member,
+    _set_attributes,
+)
+
+__all__ = ["extract_tar", "pack_tar", "ExtractionCache", "TarArchive"]
 
 logger = logging.Logger(__name__)
 
@@ -14,13 +36,51 @@ def _recursive_stem(path: Path):
     return path
 
 
-def extract_tar(pathname: Path | str, output_dir: Path | str):
+# Files up to this size are read into memory and written by a thread pool,
+# larger files are copied directly from the archive.
+_MAX_BUFFERED_FILE_SIZE = 1024 * 1024
+
+
+def extract_tar(
+    pathname: Path | str,
+    output_dir: Path | str,
+    *,
+    stream: bool = False,
+    max_workers: int | None = None,
+    cache: ExtractionCache | bool = False,
+):
+    """
+    Extract a (compressed) tarfile into a new directory in 'output_dir', named after
+    the tarfile without the '.tar' suffixes. When the tarfile contains a single
+    root directory, its contents are extracted instead.
+
+    By default, the list of members is read before extracting, which
+    decompresses the archive twice. With 'stream=True', the archive is decompressed
+    once and files are written while reading it, using a pool of 'max_workers' threads.
+    The result is moved into place when the extraction is complete.
+
+    With 'cache=True' (or an 'ExtractionCache'), the archive is extracted only once
+    into a store that is shared between processes and sessions (see 'ExtractionCache').
+    The extracted files are reflinks to (or copies of) the files in the store; pass
+    'ExtractionCache(hardlink=True)' to use read-only hardlinks instead.
+
+    Besides the compression formats that 'tarfile' supports, zstd and lz4 compressed
+    archives can be extracted when the 'zstandard' (not needed for python 3.14 and newer)
+    or 'lz4' package or the 'zstd' or 'lz4' executable is available. These archives are
+    always extracted in streaming mode. In streaming mode, archives are decompressed
+    by an external tool when available ('pigz', 'lbzip2', 'pbzip2', 'xz', 'zstd' or 'lz4'),
+    which uses multiple threads and runs in parallel with writing the files.
+    """
     pathname, output_dir = Path(pathname), Path(output_dir)
 
     if not pathname.is_file():
         raise FileNotFoundError(f"{pathname} does not exist or is not a file.")
 
-    if not tarfile.is_tarfile(pathname):
+    if not tarfile_supports(detect_compression(pathname)):
+        stream = True
+
+    # When streaming, an invalid tarfile is detected when opening it.
+    if not (stream or cache) and not tarfile.is_tarfile(pathname):
         raise ValueError(f"{pathname} is not a tarfile.")
 
     if not output_dir.is_dir():
@@ -37,6 +97,8 @@ def extract_tar(pathname: Path | str, output_dir: Path | str):
             suffixes[: -len(last_two_suffixes)]
             + last_two_suffixes[: last_two_suffixes.index(".tar")]
         )
+    elif suffixes and suffixes[-1].lower() in TAR_SHORT_SUFFIXES:
+        new_suffixes = suffixes[:-1]
 
     unpacked_path = _recursive_stem(output_dir / pathname.name)
     for suffix in new_suffixes:
@@ -47,19 +109,140 @@ def extract_tar(pathname: Path | str, output_dir: Path | str):
             f"Tarfile would have been unpacked to {unpacked_path}, but a file or directory already exists at this location."
         )
 
+    if cache:
+        if cache is True:
+            cache = ExtractionCache()
+        return cache.materialize(
+            pathname,
+            unpacked_path,
+            lambda destination: _extract_tar_streaming(
+                pathname, destination, max_workers
+            ),
+        )
+
+    if stream:
+        _extract_tar_streaming(pathname, unpacked_path, max_workers)
+        return unpacked_path
+
     with tarfile.open(pathname, "r") as open_tar:
         members = open_tar.getmembers()
-        root_dirs = [
-            member
+        root_dir = _single_root_dir(
+            (member.name, member.isdir())
             for member in members
-            if member.isdir() and member.name != "." and "/" not in member.name
-        ]
+            if len(PurePosixPath(member.name).parts) == 1
+        )
         # if there is only one root_dir (and there are files in that directory)
         # strip that directory name from the destination folder
-        if len(root_dirs) == 1:
-            root_dir = root_dirs[0].name
+        if root_dir is not None:
             for mem in members:
                 mem.path = str(Path(mem.path).relative_to(root_dir))
         members_to_move = [mem for mem in members if Path(mem.path) != Path(".")]
         open_tar.extractall(unpacked_path, members=members_to_move)
     return unpacked_path
+
+
+def _single_root_dir(root_entries) -> str | None:
+    """
+    Given the name and whether it is a directory of each member at the root of an
+    archive, return the name of its single root directory, or None when the archive
+    contains other entries at its root. Only names without a '/' count as a root
+    directory, so the contents of archives that were created from '.'
+    (e.g. './data/x.txt') are never stripped.
+    """
+    root_entries = list(root_entries)
+    root_dirs = {name for name, is_dir in root_entries if is_dir and "/" not in name}
+    if len(root_dirs) == 1 and all(name in root_dirs for name, _ in root_entries):
+        return root_dirs.pop()
+    return None
+
+
+def _write_file(destination: Path, data: bytes, mode: int | None, mtime) -> None:
+    with destination.open("wb") as open_destination:
+        open_destination.write(data)
+    _set_attributes(destination, mode, mtime)
+
+
+def _extract_tar_streaming(
+    pathname: Path, unpacked_path: Path, max_workers: int | None
+) -> None:
+    max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+    temp_dir = Path(
+        tempfile.mkdtemp(dir=unpacked_path.parent, prefix=f".{unpacked_path.name}.")
+    )
+    # Limit the number of files that are kept in memory while waiting to be written.
+    pending_slots = BoundedSemaphore(max_workers * 4)
+    pending_writes = deque()
+    directories = []
+    root_entries = []
+
+    def wait_for_pending_writes(only_finished=False):
+        # Calling 'result' raises the errors that occured while writing.
+        while pending_writes and (not only_finished or pending_writes[0].done()):
+            pending_writes.popleft().result()
+
+    def release_slot(_):
+        pending_slots.release()
+
+    try:
+        with (
+            ThreadPoolExecutor(max_workers=max_workers) as executor,
+            open_decompressed(pathname) as decompressed,
+            tarfile.open(fileobj=decompressed, mode="r|") as open_tar,
+        ):
+            for member in open_tar:
+                name = member.name
+                member = _safe_member(member, temp_dir)
+                member_path = PurePosixPath(member.name)
+                if member_path == PurePosixPath("."):
+                    continue
+                if len(member_path.parts) == 1:
+                    root_entries.append((name, member.isdir()))
+                destination = temp_dir.joinpath(*member_path.parts)
+                if member.isdir():
+                    destination.mkdir(parents=True, exist_ok=True)
+                    directories.append(member)
+                elif member.isreg():
+                    destination.parent.mkdir(parents=True, exist_ok=True)
+                    member_file = open_tar.extractfile(member)
+                    if member.size > _MAX_BUFFERED_FILE_SIZE:
+                        with destination.open("wb") as open_destination:
+                            shutil.copyfileobj(member_file, open_destination)
+                        _set_attributes(destination, member.mode, member.mtime)
+                        continue
+                    # The data must be read before moving on to the next member.
+                    data = member_file.read()
+                    pending_slots.acquire()
+                    pending_write = executor.submit(
+                        _write_file, destination, data, member.mode, member.mtime
+                    )
+                    pending_write.add_done_callback(release_slot)
+                    pending_writes.append(pending_write)
+                    wait_for_pending_writes(only_finished=True)
+                else:
+                    # Links may point to files that are still being written.
+                    wait_for_pending_writes()
+                    open_tar.extract(
+                        member, temp_dir, set_attrs=False, **_extraction_filter()
+                    )
+            wait_for_pending_writes()
+        # Set the attributes of directories last, like 'TarFile.extractall' does,
+        # because adding files changes their modification time.
+        for directory in reversed(directories):
+            _set_attributes(
+                temp_dir.joinpath(*PurePosixPath(directory.name).parts),
+                directory.mode,
+                directory.mtime,
+            )
+        # If there is only one root dir, strip that directory from the destination.
+        root_dir = _single_root_dir(root_entries)
+        if root_dir is not None:
+            (temp_dir / root_dir).rename(unpacked_path)
+            temp_dir.rmdir()
+        else:
+            temp_dir.rename(unpacked_path)
+    except (tarfile.ReadError, EOFError) as e:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise ValueError(f"{pathname} is not a tarfile.") from e
+    except BaseException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise